@@ -0,0 +1,114 @@
+"""
+In-process free spot allocator.
+
+Keeps a min-heap of free (spot_number, spot_id) pairs per lot so book_spot
+can pick the lowest free spot in O(log n) instead of running
+SELECT ... ORDER BY spot_number LIMIT 1 FOR UPDATE on every booking.
+
+The heap is only a hint. Every worker process has its own copy, so the
+booking itself is still decided by a conditional write
+(UPDATE parking_spots SET status='O' WHERE id=? AND status='A'); a
+candidate that loses that race is simply dropped and the next one tried.
+All the heaps start at the same lowest free spot, so concurrent bookings
+in different workers still contend on one row and all but one retry.
+"""
+import heapq
+import threading
+
+from models import db, ParkingSpot
+
+
+class SpotAllocator:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heaps = {}   # lot_id -> heap of (spot_number, spot_id)
+        self._free = {}    # lot_id -> {spot_id} currently in the heap
+
+    def reset(self):
+        """Drop every lot, they are reloaded from the DB on next use"""
+        with self._lock:
+            self._heaps.clear()
+            self._free.clear()
+
+    def forget(self, lot_id):
+        """Drop one lot (spots added/removed), it is reloaded on next use"""
+        with self._lock:
+            self._heaps.pop(lot_id, None)
+            self._free.pop(lot_id, None)
+
+    def load(self, lot_id):
+        """(Re)build a lot's heap from the free spots in the database"""
+        rows = db.session.query(ParkingSpot.spot_number, ParkingSpot.id).filter(
+            ParkingSpot.lot_id == lot_id,
+            ParkingSpot.status == "A"
+        ).all()
+        heap = [(row.spot_number, row.id) for row in rows]
+        heapq.heapify(heap)
+        with self._lock:
+            self._heaps[lot_id] = heap
+            self._free[lot_id] = {spot_id for _, spot_id in heap}
+
+    def acquire(self, lot_id):
+        """
+        Pop the lowest free spot of a lot as (spot_number, spot_id), or None.
+        The caller must confirm it with claim() and release() it if the
+        transaction does not commit.
+        """
+        with self._lock:
+            heap = self._heaps.get(lot_id)
+            if heap is None:
+                return None
+            free = self._free[lot_id]
+            while heap:
+                spot_number, spot_id = heapq.heappop(heap)
+                if spot_id in free:
+                    free.discard(spot_id)
+                    return spot_number, spot_id
+            return None
+
+    def release(self, lot_id, spot_number, spot_id):
+        """Put a spot back after leave_spot or a failed booking"""
+        with self._lock:
+            heap = self._heaps.get(lot_id)
+            if heap is None:
+                return
+            free = self._free[lot_id]
+            if spot_id not in free:
+                free.add(spot_id)
+                heapq.heappush(heap, (spot_number, spot_id))
+
+    def is_loaded(self, lot_id):
+        with self._lock:
+            return lot_id in self._heaps
+
+    @staticmethod
+    def claim(spot_id):
+        """Conditional write that decides the booking, True if this caller won the spot"""
+        updated = ParkingSpot.query.filter_by(id=spot_id, status="A").update(
+            {ParkingSpot.status: "O"}, synchronize_session=False
+        )
+        return updated == 1
+
+    def allocate(self, lot_id):
+        """
+        Claim the lowest free spot of a lot inside the current transaction.
+        Returns (spot_number, spot_id) or None if the lot is full. Stale
+        candidates (taken by another worker) are discarded; the heap is
+        rebuilt from the DB once when it runs dry.
+        """
+        if not self.is_loaded(lot_id):
+            self.load(lot_id)
+
+        reloaded = False
+        while True:
+            candidate = self.acquire(lot_id)
+            if candidate is None:
+                if reloaded:
+                    return None
+                # other workers may have freed spots this process never saw
+                self.load(lot_id)
+                reloaded = True
+                continue
+
+            if self.claim(candidate[1]):
+                return candidate
@@ -1,4 +1,6 @@
 import os
+import click
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from flask import Flask, jsonify
 from flask_cors import CORS
@@ -7,8 +9,16 @@ from flask_caching import Cache
 
 load_dotenv()
 
-from models import db, User
+from models import db, User, ensure_schema, upgrade_schema, reconcile_lot_counters, archive_reservations, backfill_revenue_daily
 from flask_jwt_extended import JWTManager
+from allocator import SpotAllocator
+from engine_profile import engine_options, apply_sqlite_pragmas
+from db_routing import REPLICA_PREFIX, replica_uris, register_replica_routing
+from compression import register_compression
+from cache_metrics import instrument_cache, backend_of
+from cache_warmup import register_cache_warmup, warm_cache
+from invalidation import register_invalidation_flush
+from circuit_breaker import cache_breaker
 
 # Initialize extensions globally
 mail = Mail()
@@ -19,6 +29,14 @@ def create_app():
     CORS(app)
 
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI", "sqlite:///./parking.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    # Read replicas, used by GET handlers and reporting tasks (see db_routing.py)
+    replica_binds = {
+        f"{REPLICA_PREFIX}{i}": {"url": uri, **engine_options(uri)}
+        for i, uri in enumerate(replica_uris())
+    }
+    if replica_binds:
+        app.config["SQLALCHEMY_BINDS"] = replica_binds
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "change-me")
     app.config["PROPAGATE_EXCEPTIONS"] = True
@@ -40,18 +58,69 @@ def create_app():
         app.config["CACHE_REDIS_URL"] = os.getenv("REDIS_URL", "redis://localhost:6379/1")
         app.config["CACHE_DEFAULT_TIMEOUT"] = 300
         app.config["CACHE_KEY_PREFIX"] = "parking_cache:"
+        # Optional per-worker LRU in front of Redis (see two_tier_cache.py)
+        if os.getenv("CACHE_LOCAL_TIER", "False").lower() == "true":
+            app.config["CACHE_TYPE"] = "two_tier_cache.TwoTierCache"
+            app.config["CACHE_LOCAL_MAX_ITEMS"] = int(os.getenv("CACHE_LOCAL_MAX_ITEMS", 1024))
+            app.config["CACHE_LOCAL_TTL"] = int(os.getenv("CACHE_LOCAL_TTL", 30))
+        # Short per-call timeout and a circuit breaker with a local fallback (see circuit_breaker.py)
+        app.config["CACHE_REDIS_SOCKET_TIMEOUT"] = float(os.getenv("CACHE_REDIS_SOCKET_TIMEOUT", 0.1))
+        if os.getenv("CACHE_BREAKER", "True").lower() == "true":
+            app.config["CACHE_BREAKER_BACKEND"] = (
+                "two_tier_cache.TwoTierCache" if app.config["CACHE_TYPE"] == "two_tier_cache.TwoTierCache"
+                else "flask_caching.backends.rediscache.RedisCache"
+            )
+            app.config["CACHE_TYPE"] = "circuit_breaker.CircuitBreakerCache"
+            app.config["CACHE_BREAKER_FAILURES"] = int(os.getenv("CACHE_BREAKER_FAILURES", 3))
+            app.config["CACHE_BREAKER_PROBE_INTERVAL"] = float(os.getenv("CACHE_BREAKER_PROBE_INTERVAL", 1.0))
+            app.config["CACHE_FALLBACK_MAX_ITEMS"] = int(os.getenv("CACHE_FALLBACK_MAX_ITEMS", 500))
+    elif cache_type == "SQLiteCache":
+        # One cache file shared by all workers on the host (see sqlite_cache.py)
+        app.config["CACHE_TYPE"] = "sqlite_cache.SQLiteCache"
+        app.config["CACHE_SQLITE_PATH"] = os.getenv("CACHE_SQLITE_PATH", "./parking_cache.db")
+        app.config["CACHE_THRESHOLD"] = int(os.getenv("CACHE_THRESHOLD", 10000))
+        app.config["CACHE_DEFAULT_TIMEOUT"] = 300
     else:
         app.config["CACHE_TYPE"] = "SimpleCache"
         app.config["CACHE_DEFAULT_TIMEOUT"] = 300
 
+    # Per key family hit/miss/size/latency counters, see cache_metrics.py
+    app.config["CACHE_METRICS"] = os.getenv("CACHE_METRICS", "True").lower() == "true"
+    # measure the pickled size of one in N writes per family
+    app.config["CACHE_METRICS_SIZE_SAMPLE"] = int(os.getenv("CACHE_METRICS_SIZE_SAMPLE", 10))
+
+    # Precompute shared cache entries on boot and after /cache/clear (see cache_warmup.py)
+    app.config["CACHE_WARMUP"] = os.getenv("CACHE_WARMUP", "False").lower() == "true"
+    app.config["CACHE_WARMUP_SPOT_GRIDS"] = os.getenv("CACHE_WARMUP_SPOT_GRIDS", "False").lower() == "true"
+
+    # Cached response bodies above this many bytes are stored gzip-compressed (see json_cache.py)
+    app.config["CACHE_COMPRESS_THRESHOLD"] = int(os.getenv("CACHE_COMPRESS_THRESHOLD", 1024))
+
+    # Negotiated gzip/br/deflate for responses of at least COMPRESS_MIN_SIZE bytes (see compression.py)
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+    app.config["COMPRESS_LEVEL"] = int(os.getenv("COMPRESS_LEVEL", 6))
+    app.config["COMPRESS_BROTLI_LEVEL"] = int(os.getenv("COMPRESS_BROTLI_LEVEL", 4))
+
+    # Admin listings above this many rows are streamed, not built in memory (see streaming.py)
+    app.config["STREAM_JSON_THRESHOLD"] = int(os.getenv("STREAM_JSON_THRESHOLD", 5000))
+    app.config["STREAM_JSON_BATCH_SIZE"] = int(os.getenv("STREAM_JSON_BATCH_SIZE", 1000))
+
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine)
     jwt = JWTManager(app)
     mail.init_app(app)
     cache.init_app(app)
+    if app.config["CACHE_METRICS"]:
+        instrument_cache(app, cache)
     
     # Store cache in app config for easy access
     app.cache = cache
 
+    # Per-process free spot heaps, filled from the DB lazily per lot
+    app.spot_allocator = SpotAllocator()
+
     # Import routes AFTER cache is initialized
     from routes.auth_routes import auth_bp
     from routes.admin_routes import admin_bp
@@ -61,18 +130,76 @@ def create_app():
     app.register_blueprint(admin_bp, url_prefix="/api/admin")
     app.register_blueprint(user_bp, url_prefix="/api/user")
 
+    register_replica_routing(app, db)
+    register_compression(app)
+    register_invalidation_flush(app)
+    register_cache_warmup(app)
+
     @app.route("/health", methods=["GET"])
     def health():
-        return jsonify({"status": "ok"}), 200
+        """503 while the cache is warming, so the load balancer holds traffic back"""
+        status = {}
+        breaker = cache_breaker(cache)
+        if breaker is not None:
+            # an open breaker degrades the cache, the worker still serves
+            status["cache_backend"] = breaker.status()
+        if app.cache_warmup is None:
+            return jsonify({"status": "ok", **status}), 200
+        status.update(app.cache_warmup.status())
+        if not status["cache_ready"]:
+            return jsonify({"status": "warming", **status}), 503
+        return jsonify({"status": "ok", **status}), 200
 
     @app.route("/cache/clear", methods=["POST"])
     def clear_cache():
         """Admin endpoint to manually clear cache"""
         cache.clear()
+        if app.cache_warmup is not None:
+            app.cache_warmup.start()
         return jsonify({"msg": "Cache cleared successfully"}), 200
 
+    @app.route("/cache/stats", methods=["GET"])
+    def cache_stats():
+        """Hit ratio per cache tier (only tracked when the local tier is enabled)"""
+        backend = backend_of(cache)
+        if not hasattr(backend, "stats"):
+            return jsonify({"local_tier": False}), 200
+        return jsonify({"local_tier": True, **backend.stats()}), 200
+
+    @app.cli.command("reconcile-counters")
+    def reconcile_counters():
+        """Recompute every lot's occupied/available counters from parking_spots"""
+        updated = reconcile_lot_counters()
+        print(f"Reconciled occupancy counters for {updated} lots")
+
+    @app.cli.command("warm-cache")
+    @click.option("--spot-grids", is_flag=True, help="Also build the first page of every lot's spot grid")
+    def warm_cache_command(spot_grids):
+        """Precompute the shared cache entries (lot listing, dashboard stats)"""
+        grids = warm_cache(cache, spot_grids=spot_grids)
+        print(f"Cache warmed ({grids} spot grids built)")
+
+    @app.cli.command("archive-reservations")
+    @click.option("--days", default=90, show_default=True, help="Archive reservations completed more than this many days ago")
+    def archive_reservations_command(days):
+        """Move old completed reservations into reservations_archive"""
+        moved = archive_reservations(datetime.utcnow() - timedelta(days=days))
+        print(f"Archived {moved} reservations")
+
+    @app.cli.command("backfill-revenue")
+    def backfill_revenue():
+        """Rebuild the revenue_daily rollup from reservation history"""
+        written = backfill_revenue_daily()
+        print(f"Wrote {written} revenue_daily rows")
+
+    @app.cli.command("upgrade-schema")
+    def upgrade_schema_command():
+        """Add missing tables, columns and indexes even if the schema version says they are there"""
+        added = upgrade_schema()
+        print(f"Schema upgraded ({len(added)} columns added)")
+
     with app.app_context():
-        db.create_all()
+        ensure_schema()
         create_admin_if_missing()
 
     return app
@@ -0,0 +1,96 @@
+"""
+Cached spot grid benchmark: the old format (the page as Python objects,
+pickled into Redis and jsonify'd on every hit) vs pre-serialized JSON
+bytes, gzip-compressed above CACHE_COMPRESS_THRESHOLD (json_cache.py).
+
+For admin_spots_{lot_id}?limit=all on one lot, reports the bytes stored
+per entry (the pickled value RedisCache would SET) and the hit latency:
+unpickle plus building the response, for a client with and without
+Accept-Encoding: gzip.
+
+Usage:
+    python benchmark_cache_serialization.py --spots 10000 --repeat 200
+"""
+import argparse
+import atexit
+import os
+import pickle
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_page(app, spots):
+    """Create a lot of `spots` spots, return its ?limit=all page as Python objects"""
+    client = app.test_client()
+    token = client.post("/api/auth/login", json={
+        "username": os.getenv("ADMIN_USERNAME", "admin"), "password": os.getenv("ADMIN_PASSWORD", "admin123")
+    }).get_json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    lot_id = client.post("/api/admin/lots", headers=headers, json={
+        "name": f"bench-{spots}", "price_per_hour": 10, "number_of_spots": spots
+    }).get_json()["lot_id"]
+    return client.get(f"/api/admin/lots/{lot_id}/spots?limit=all", headers=headers).get_json()
+
+
+def time_hits(app, stored, respond, accept_encoding, repeat):
+    """Median ms of unpickling `stored` and turning it into a response body"""
+    from flask import jsonify
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {}
+    samples = []
+    with app.test_request_context(headers=headers):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = respond(pickle.loads(stored), jsonify)
+            response.get_data()
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(response.get_data())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spots", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="parking_bench_")
+    atexit.register(shutil.rmtree, db_dir, ignore_errors=True)
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["CACHE_TYPE"] = "SimpleCache"
+    # the whole lot must be buffered (and cached), not streamed
+    os.environ["STREAM_JSON_THRESHOLD"] = str(args.spots + 1)
+
+    from app import create_app
+    from json_cache import encode_json_body, json_body_response
+    app = create_app()
+    page = build_page(app, args.spots)
+    assert len(page["spots"]) == args.spots
+
+    with app.app_context():
+        entry = encode_json_body(page)
+    # RedisCache stores pickle.dumps(value, HIGHEST_PROTOCOL)
+    old = pickle.dumps(page, pickle.HIGHEST_PROTOCOL)
+    new = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+
+    variants = [
+        ("objects + jsonify", old, lambda value, jsonify: jsonify(value), None),
+        ("json bytes, identity", new, lambda value, jsonify: json_body_response(value), None),
+        ("json bytes, gzip", new, lambda value, jsonify: json_body_response(value), "gzip"),
+    ]
+
+    print(f"admin_spots ?limit=all, {args.spots} spots, {args.repeat} hits each")
+    print("=" * 66)
+    print(f"{'format':<24}{'stored KiB':>12}{'hit ms':>10}{'sent KiB':>10}{'speedup':>10}")
+    baseline = None
+    for name, stored, respond, accept_encoding in variants:
+        ms, sent = time_hits(app, stored, respond, accept_encoding, args.repeat)
+        baseline = baseline or ms
+        print(f"{name:<24}{len(stored) / 1024:>12.1f}{ms:>10.2f}{sent / 1024:>10.1f}{baseline / ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
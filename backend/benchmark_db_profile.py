@@ -0,0 +1,108 @@
+"""
+Write throughput benchmark: SQLite with its defaults (rollback journal,
+synchronous=FULL) vs the engine profile from engine_profile.py (WAL,
+synchronous=NORMAL, busy_timeout, mmap, cache).
+
+Each thread runs booking-shaped transactions: read a free spot, mark it
+occupied, insert a reservation, commit. Reports committed transactions
+per second and how many failed with "database is locked".
+
+Usage:
+    python benchmark_db_profile.py --threads 8 --seconds 10
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from engine_profile import engine_options, apply_sqlite_pragmas
+from models import db
+
+SPOTS = 5000
+
+
+def setup(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password_hash, role) VALUES (1, 'bench', 'x', 'user')"))
+        conn.execute(text("INSERT INTO parking_lots (id, name, price_per_hour, number_of_spots) VALUES (1, 'bench', 10, :n)"),
+                     {"n": SPOTS})
+        conn.execute(text("INSERT INTO parking_spots (lot_id, spot_number, status) VALUES (1, :n, 'A')"),
+                     [{"n": i} for i in range(1, SPOTS + 1)])
+
+
+def booking_transaction(engine, spot_number):
+    with engine.begin() as conn:
+        spot_id = conn.execute(text(
+            "SELECT id FROM parking_spots WHERE lot_id = 1 AND spot_number = :n"
+        ), {"n": spot_number}).scalar()
+        conn.execute(text("UPDATE parking_spots SET status = 'O' WHERE id = :id"), {"id": spot_id})
+        conn.execute(text(
+            "INSERT INTO reservations (spot_id, user_id, parking_timestamp, status) VALUES (:id, 1, :ts, 'active')"
+        ), {"id": spot_id, "ts": datetime.utcnow()})
+
+
+def run(engine, threads, seconds):
+    committed, locked = [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(offset):
+        n = offset
+        while time.perf_counter() < deadline:
+            try:
+                booking_transaction(engine, n % SPOTS + 1)
+                with lock:
+                    committed[0] += 1
+            except OperationalError:
+                with lock:
+                    locked[0] += 1
+            n += threads
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return committed[0], locked[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="parking_bench_")
+    atexit.register(shutil.rmtree, db_dir, ignore_errors=True)
+
+    print(f"{args.threads} writer threads for {args.seconds:.0f}s each")
+    print("=" * 60)
+    print(f"{'profile':<10}{'commits':>10}{'locked':>10}{'commits/s':>12}")
+
+    for profile in ("default", "tuned"):
+        uri = f"sqlite:///{os.path.join(db_dir, profile + '.db')}"
+        if profile == "tuned":
+            engine = create_engine(uri, **engine_options(uri))
+            apply_sqlite_pragmas(engine)
+        else:
+            engine = create_engine(uri)
+        setup(engine)
+
+        committed, locked = run(engine, args.threads, args.seconds)
+        print(f"{profile:<10}{committed:>10}{locked:>10}{committed / args.seconds:>12.0f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
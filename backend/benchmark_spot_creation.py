@@ -0,0 +1,77 @@
+"""
+Spot materialisation benchmark: one ORM object per spot (the old
+create_lot loop) vs bulk_create_spots (chunked executemany INSERTs).
+
+Reports wall time and peak Python memory for each lot size.
+
+Usage:
+    python benchmark_spot_creation.py --sizes 1000 10000 100000
+"""
+import argparse
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def orm_create_spots(lot_id, count):
+    from models import db, ParkingSpot
+    for i in range(1, count + 1):
+        db.session.add(ParkingSpot(lot_id=lot_id, spot_number=i, status="A", created_at=datetime.utcnow()))
+
+
+def bulk_spots(lot_id, count):
+    from models import bulk_create_spots
+    bulk_create_spots(lot_id, 1, count)
+
+
+def measure(app, create, count):
+    from models import db, ParkingLot
+    with app.app_context():
+        lot = ParkingLot(name=f"bench-{count}", number_of_spots=count, available_count=count)
+        db.session.add(lot)
+        db.session.commit()
+        lot_id = lot.id
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        create(lot_id, count)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    db_dir = tempfile.mkdtemp(prefix="parking_bench_")
+    atexit.register(shutil.rmtree, db_dir, ignore_errors=True)
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.join(db_dir, 'bench.db')}"
+    os.environ["CACHE_TYPE"] = "SimpleCache"
+
+    from app import create_app
+    app = create_app()
+
+    print("Creating spots: ORM objects vs bulk INSERT")
+    print("=" * 60)
+    print(f"{'spots':>8}{'orm s':>10}{'orm MiB':>10}{'bulk s':>10}{'bulk MiB':>10}{'speedup':>10}")
+    for count in args.sizes:
+        orm_time, orm_mem = measure(app, orm_create_spots, count)
+        bulk_time, bulk_mem = measure(app, bulk_spots, count)
+        print(f"{count:>8}{orm_time:>10.2f}{orm_mem:>10.1f}{bulk_time:>10.2f}{bulk_mem:>10.1f}"
+              f"{orm_time / bulk_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Cache instrumentation per key family.
+
+instrument_cache() wraps the app's cache backend so that every call is
+counted against the key's family, with numeric ids and tag/page suffixes
+folded away:
+
+    my_reservations_7|user:7=..|lots=..|page=50:first  ->  my_reservations_{id}
+    gen:lot:3                                          ->  gen
+    stale:lots_listing                                 ->  stale
+
+Per family: hits, misses, sets, deletes, bytes written (pickled size,
+which is what RedisCache stores) and the latency of the backend calls.
+Measuring a size means pickling the value a second time, so only one in
+CACHE_METRICS_SIZE_SAMPLE writes per family is measured (the first one
+always); bytes and str payloads, e.g. pre-serialized JSON, are measured
+by their length instead.
+Counters are per process, so with several workers each reports its own
+sample; GET /api/admin/cache/metrics returns this worker's numbers.
+"""
+import pickle
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from flask_caching.backends.base import BaseCache
+
+OPERATIONS = ("get", "set", "delete")
+
+
+def key_family(key):
+    base = key.split("|", 1)[0]
+    if ":" in base:
+        base = base.split(":", 1)[0]
+    return re.sub(r"\d+", "{id}", base)
+
+
+def _payload_size(value):
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class _Family:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.deletes = 0
+        self.sized = 0
+        self.bytes_written = 0
+        self.max_bytes = 0
+        self.calls = dict.fromkeys(OPERATIONS, 0)
+        self.seconds = dict.fromkeys(OPERATIONS, 0.0)
+        self.max_seconds = dict.fromkeys(OPERATIONS, 0.0)
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "sets": self.sets,
+            "deletes": self.deletes,
+            "avg_bytes": round(self.bytes_written / self.sized) if self.sized else None,
+            "max_bytes": self.max_bytes,
+            "latency_ms": {
+                op: {
+                    "calls": self.calls[op],
+                    "avg": round(self.seconds[op] / self.calls[op] * 1000, 3),
+                    "max": round(self.max_seconds[op] * 1000, 3),
+                }
+                for op in OPERATIONS if self.calls[op]
+            },
+        }
+
+
+class InstrumentedCache(BaseCache):
+    """Counts and times every call to `inner`, another flask_caching backend"""
+
+    def __init__(self, inner, size_sample=10):
+        super().__init__(default_timeout=inner.default_timeout)
+        self.inner = inner
+        self.size_sample = max(1, size_sample)
+        self.started_at = datetime.utcnow()
+        self._families = defaultdict(_Family)
+        self._lock = threading.Lock()
+
+    def _timed(self, op, family, call, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._families[family]
+                stats.calls[op] += 1
+                stats.seconds[op] += elapsed
+                stats.max_seconds[op] = max(stats.max_seconds[op], elapsed)
+
+    def _lookups(self, keys, values):
+        with self._lock:
+            for key, value in zip(keys, values):
+                stats = self._families[key_family(key)]
+                if value is None:
+                    stats.misses += 1
+                else:
+                    stats.hits += 1
+
+    def _writes(self, mapping):
+        sampled = []
+        with self._lock:
+            for key, value in mapping.items():
+                stats = self._families[key_family(key)]
+                stats.sets += 1
+                if (stats.sets - 1) % self.size_sample == 0:
+                    sampled.append((stats, value))
+        if not sampled:
+            return
+        sizes = [(stats, _payload_size(value)) for stats, value in sampled]
+        with self._lock:
+            for stats, size in sizes:
+                stats.sized += 1
+                stats.bytes_written += size
+                stats.max_bytes = max(stats.max_bytes, size)
+
+    def _deletes(self, keys):
+        with self._lock:
+            for key in keys:
+                self._families[key_family(key)].deletes += 1
+
+    # --- reads ---
+
+    def get(self, key):
+        value = self._timed("get", key_family(key), self.inner.get, key)
+        self._lookups([key], [value])
+        return value
+
+    def get_many(self, *keys):
+        # a mixed batch is timed against its first key's family
+        values = self._timed("get", key_family(keys[0]) if keys else "", self.inner.get_many, *keys)
+        self._lookups(keys, values)
+        return values
+
+    def has(self, key):
+        return self._timed("get", key_family(key), self.inner.has, key)
+
+    # --- writes ---
+
+    def set(self, key, value, timeout=None):
+        result = self._timed("set", key_family(key), self.inner.set, key, value, timeout=timeout)
+        self._writes({key: value})
+        return result
+
+    def add(self, key, value, timeout=None):
+        added = self._timed("set", key_family(key), self.inner.add, key, value, timeout=timeout)
+        if added:
+            self._writes({key: value})
+        return added
+
+    def set_many(self, mapping, timeout=None):
+        family = key_family(next(iter(mapping))) if mapping else ""
+        result = self._timed("set", family, self.inner.set_many, mapping, timeout=timeout)
+        self._writes(mapping)
+        return result
+
+    def delete(self, key):
+        result = self._timed("delete", key_family(key), self.inner.delete, key)
+        self._deletes([key])
+        return result
+
+    def delete_many(self, *keys):
+        result = self._timed("delete", key_family(keys[0]) if keys else "", self.inner.delete_many, *keys)
+        self._deletes(keys)
+        return result
+
+    def clear(self):
+        return self.inner.clear()
+
+    def inc(self, key, delta=1):
+        return self._timed("set", key_family(key), self.inner.inc, key, delta=delta)
+
+    def dec(self, key, delta=1):
+        return self._timed("set", key_family(key), self.inner.dec, key, delta=delta)
+
+    # --- metrics ---
+
+    def metrics(self):
+        with self._lock:
+            families = {name: stats.as_dict() for name, stats in sorted(self._families.items())}
+        return {"since": self.started_at.isoformat(), "families": families}
+
+    def reset_metrics(self):
+        with self._lock:
+            self._families.clear()
+            self.started_at = datetime.utcnow()
+
+
+def instrument_cache(app, cache):
+    """Put an InstrumentedCache in front of `cache`'s backend for `app`"""
+    backends = app.extensions["cache"]
+    if not isinstance(backends[cache], InstrumentedCache):
+        backends[cache] = InstrumentedCache(backends[cache], size_sample=app.config.get("CACHE_METRICS_SIZE_SAMPLE", 10))
+
+
+def backend_of(cache):
+    """The configured backend behind the metrics (and circuit breaker) layers, e.g. to reach RedisCache internals"""
+    backend = cache.cache
+    while hasattr(backend, "inner"):
+        backend = backend.inner
+    return backend
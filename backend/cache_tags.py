@@ -0,0 +1,56 @@
+"""
+Tag based cache invalidation with generation counters.
+
+Each tag has a generation stored in the cache under "gen:{tag}". A
+cached entry's key embeds the current generation of every tag it was
+built from. A write bumps the tags it touched, so every entry that read
+them becomes unreachable and ages out through its TTL. No route has to
+know which keys exist.
+
+Tags:
+    lots        the lot listing (a lot created, deleted or its details edited)
+    lot:{id}    one lot's spot grid
+    user:{id}   one user's reservation history
+"""
+import uuid
+
+LOTS = "lots"
+
+
+def lot_tag(lot_id):
+    return f"lot:{lot_id}"
+
+
+def user_tag(user_id):
+    return f"user:{user_id}"
+
+
+def _generation_key(tag):
+    return f"gen:{tag}"
+
+
+def _new_generation():
+    # random rather than incremented, so a bump is a blind write and
+    # two processes bumping at once can never land on the same value
+    return uuid.uuid4().hex[:16]
+
+
+def generations(cache, *tags):
+    """Current generation of each tag as a dict, starting one for tags that have none (e.g. evicted)"""
+    keys = [_generation_key(tag) for tag in tags]
+    values = cache.get_many(*keys)
+    missing = {key: _new_generation() for key, value in zip(keys, values) if value is None}
+    if missing:
+        cache.set_many(missing, timeout=0)
+    return {tag: value if value is not None else missing[key] for tag, key, value in zip(tags, keys, values)}
+
+
+def tagged_key(cache, key, *tags):
+    """`key` qualified by the current generation of each of `tags`"""
+    current = generations(cache, *tags)
+    return key + "".join(f"|{tag}={current[tag]}" for tag in tags)
+
+
+def bump(cache, *tags):
+    """Invalidate everything cached under any of `tags`, in one set_many round trip"""
+    cache.set_many({_generation_key(tag): _new_generation() for tag in tags}, timeout=0)
@@ -0,0 +1,102 @@
+"""
+Cache warm-up so a fresh worker, or a just-cleared cache, does not send
+its first wave of users to the database all at once.
+
+Precomputes the shared entries: the lot listing behind /api/user/lots
+and /api/admin/lots, the admin dashboard snapshot and, with
+CACHE_WARMUP_SPOT_GRIDS, the first page of every lot's spot grid.
+
+Enabled with CACHE_WARMUP=true. A worker starts warming in the
+background when it receives its first request (in practice the load
+balancer's first /health probe; create_app() alone does not, as Celery
+tasks and CLI commands call it too) and again after POST /cache/clear.
+/health answers 503 until the run has finished. A failed run still marks
+the worker ready, since serving cold beats not serving.
+"""
+import os
+import threading
+import time
+
+
+def warm_cache(cache, spot_grids=False):
+    """Fill the shared cache entries that are missing, returns how many spot grids were built"""
+    from dashboard import materialize_dashboard_stats
+    from lot_listing import lot_listing
+    from models import ParkingLot, live_lots
+    from pagination import cached_page
+    from routes.admin_routes import SPOT_PAGE_LIMIT, cache_spot_page, spot_grid_key
+
+    lot_listing(cache)
+    materialize_dashboard_stats(cache)
+
+    built = 0
+    if spot_grids:
+        for lot in live_lots().order_by(ParkingLot.id):
+            cache_key = spot_grid_key(cache, lot.id)
+            if cached_page(cache, cache_key, SPOT_PAGE_LIMIT, None) is None:
+                cache_spot_page(cache, cache_key, lot, SPOT_PAGE_LIMIT)
+                built += 1
+    return built
+
+
+class CacheWarmup:
+    """Per-process warm-up runs and the readiness flag they drive"""
+
+    def __init__(self, app):
+        self.app = app
+        self.ready = threading.Event()
+        self.last_run = None
+        self._runs = 0
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def ensure_started(self):
+        # once per process, a forked worker starts its own
+        if self._started_pid != os.getpid():
+            self._started_pid = os.getpid()
+            self.start()
+
+    def start(self):
+        with self._lock:
+            self._runs += 1
+            run = self._runs
+            self.ready.clear()
+        thread = threading.Thread(target=self._run, args=(run,), name="cache-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, run):
+        start = time.perf_counter()
+        error = None
+        try:
+            with self.app.app_context():
+                from models import db
+                try:
+                    grids = warm_cache(self.app.cache, spot_grids=self.app.config["CACHE_WARMUP_SPOT_GRIDS"])
+                finally:
+                    db.session.remove()
+            print(f"✓ Cache warmed in {time.perf_counter() - start:.2f}s ({grids} spot grids)")
+        except Exception as e:
+            error = str(e)
+            print(f"✗ Cache warm-up failed: {e}")
+        with self._lock:
+            # a newer run (e.g. another clear) decides readiness
+            if run == self._runs:
+                self.last_run = {"seconds": round(time.perf_counter() - start, 3), "error": error}
+                self.ready.set()
+
+    def status(self):
+        return {"cache_ready": self.ready.is_set(), "last_warmup": self.last_run}
+
+
+def register_cache_warmup(app):
+    """Attach app.cache_warmup (None when disabled) and start it on the first request"""
+    app.cache_warmup = None
+    if not app.config["CACHE_WARMUP"]:
+        return
+
+    warmup = app.cache_warmup = CacheWarmup(app)
+
+    @app.before_request
+    def start_cache_warmup():
+        warmup.ensure_started()
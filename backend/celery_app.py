@@ -11,6 +11,7 @@ sys.path.insert(0, current_dir)
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+DASHBOARD_STATS_INTERVAL = int(os.getenv("DASHBOARD_STATS_INTERVAL", 30))
 
 celery = Celery(
     "vehicle_parking_app",
@@ -37,6 +38,18 @@ celery.conf.update(
             "task": "tasks.monthly_report.send_monthly_report",
             "schedule": crontab(day_of_month=1, hour=9, minute=0),
             "args": ()
+        },
+        # Move old completed reservations to reservations_archive at 3 AM
+        "archive-reservations-task": {
+            "task": "tasks.archive_reservations.archive_completed_reservations",
+            "schedule": crontab(hour=3, minute=0),
+            "args": ()
+        },
+        # Admin dashboard stats snapshot, the endpoint only reads it
+        "dashboard-stats-task": {
+            "task": "tasks.dashboard_stats.materialize_dashboard_stats",
+            "schedule": DASHBOARD_STATS_INTERVAL,
+            "args": ()
         }
     }
 )
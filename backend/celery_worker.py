@@ -5,6 +5,9 @@ from celery_app import celery
 from tasks.daily_reminder import send_daily_reminder
 from tasks.monthly_report import send_monthly_report
 from tasks.export_csv import export_user_reservations
+from tasks.archive_reservations import archive_completed_reservations
+from tasks.dashboard_stats import materialize_dashboard_stats
 
 # Make tasks available when this module is imported
-__all__ = ['celery', 'send_daily_reminder', 'send_monthly_report', 'export_user_reservations']
\ No newline at end of file
+__all__ = ['celery', 'send_daily_reminder', 'send_monthly_report', 'export_user_reservations', 'archive_completed_reservations',
+           'materialize_dashboard_stats']
\ No newline at end of file
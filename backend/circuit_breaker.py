@@ -0,0 +1,200 @@
+"""
+Circuit breaker around the Redis cache backend.
+
+Every Redis call gets a short socket timeout (CACHE_REDIS_SOCKET_TIMEOUT).
+A call that fails or times out falls back to a small in-process cache
+(CACHE_FALLBACK_MAX_ITEMS), which on a cold key means the route goes
+straight to the database. After CACHE_BREAKER_FAILURES consecutive
+failures the breaker opens: calls skip Redis altogether and a background
+thread probes it every CACHE_BREAKER_PROBE_INTERVAL seconds.
+
+Writes that only reached the fallback (tag bumps, fresh entries, the
+generations started while Redis was away) are remembered. Before the
+breaker closes they are deleted from Redis (a clear during the outage
+clears Redis), so nothing cached before the outage outlives an
+invalidation made during it. The fallback is then emptied.
+"""
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cachelib import SimpleCache
+from flask_caching.backends.base import BaseCache
+from redis.exceptions import RedisError
+from werkzeug.utils import import_string
+
+BACKEND_ERRORS = (RedisError, OSError)
+PROBE_KEY = "breaker_probe"
+
+
+def with_socket_timeout(url, timeout):
+    """`url` with socket (connect) timeouts added, unless it already sets them"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.setdefault("socket_timeout", str(timeout))
+    query.setdefault("socket_connect_timeout", str(timeout))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class CircuitBreakerCache(BaseCache):
+    def __init__(self, inner, fallback=None, failure_threshold=3, probe_interval=1.0, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.inner = inner
+        self.fallback = fallback or SimpleCache(threshold=500, default_timeout=default_timeout)
+        self.failure_threshold = failure_threshold
+        self.probe_interval = probe_interval
+        self.is_open = False
+        self.opened_at = None
+        self._failures = 0
+        self._dirty = set()
+        self._clear_pending = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        timeout = config.get("CACHE_REDIS_SOCKET_TIMEOUT", 0.1)
+        config = dict(config)
+        if config.get("CACHE_REDIS_URL"):
+            config["CACHE_REDIS_URL"] = with_socket_timeout(config["CACHE_REDIS_URL"], timeout)
+        else:
+            kwargs.update(socket_timeout=timeout, socket_connect_timeout=timeout)
+        inner = import_string(config["CACHE_BREAKER_BACKEND"]).factory(app, config, args, kwargs)
+        default_timeout = config.get("CACHE_DEFAULT_TIMEOUT", 300)
+        return cls(
+            inner,
+            fallback=SimpleCache(threshold=config.get("CACHE_FALLBACK_MAX_ITEMS", 500), default_timeout=default_timeout),
+            failure_threshold=config.get("CACHE_BREAKER_FAILURES", 3),
+            probe_interval=config.get("CACHE_BREAKER_PROBE_INTERVAL", 1.0),
+            default_timeout=default_timeout,
+        )
+
+    # --- breaker state ---
+
+    def _call(self, op, *args, written=(), **kwargs):
+        if not self.is_open:
+            try:
+                result = getattr(self.inner, op)(*args, **kwargs)
+            except BACKEND_ERRORS as e:
+                self._failed(e)
+            else:
+                self._succeeded()
+                return result
+        if written:
+            with self._lock:
+                self._dirty.update(written)
+        return getattr(self.fallback, op)(*args, **kwargs)
+
+    def _failed(self, error):
+        with self._lock:
+            self._failures += 1
+            if self.is_open or self._failures < self.failure_threshold:
+                return
+            self.is_open = True
+            self.opened_at = datetime.utcnow().isoformat()
+        print(f"✗ Cache backend unavailable, serving from the local fallback: {error}")
+        threading.Thread(target=self._probe, name="cache-breaker-probe", daemon=True).start()
+
+    def _succeeded(self):
+        self._failures = 0
+        if self._dirty or self._clear_pending:
+            # a call failed without opening the breaker, catch Redis up now
+            try:
+                self._replay()
+            except BACKEND_ERRORS as e:
+                self._failed(e)
+
+    def _replay(self):
+        """Undo in Redis what was only done to the fallback, True once nothing is left"""
+        with self._lock:
+            dirty, clear = set(self._dirty), self._clear_pending
+        if clear:
+            self.inner.clear()
+        elif dirty:
+            self.inner.delete_many(*dirty)
+        with self._lock:
+            self._dirty -= dirty
+            if clear:
+                self._clear_pending = False
+            return not self._dirty and not self._clear_pending
+
+    def _probe(self):
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.inner.get(PROBE_KEY)
+                if not self._replay():
+                    continue
+            except BACKEND_ERRORS:
+                continue
+            with self._lock:
+                if self._dirty or self._clear_pending:
+                    # written to between the replay and here
+                    continue
+                self.is_open = False
+                self._failures = 0
+                self.opened_at = None
+                self.fallback.clear()
+            print("✓ Cache backend is back, circuit closed")
+            return
+
+    def status(self):
+        return {"state": "open" if self.is_open else "closed", "opened_at": self.opened_at}
+
+    # --- reads ---
+
+    def get(self, key):
+        return self._call("get", key)
+
+    def get_many(self, *keys):
+        return self._call("get_many", *keys)
+
+    def has(self, key):
+        return self._call("has", key)
+
+    # --- writes ---
+
+    def set(self, key, value, timeout=None):
+        return self._call("set", key, value, timeout=timeout, written=(key,))
+
+    def add(self, key, value, timeout=None):
+        return self._call("add", key, value, timeout=timeout, written=(key,))
+
+    def set_many(self, mapping, timeout=None):
+        return self._call("set_many", mapping, timeout=timeout, written=tuple(mapping))
+
+    def delete(self, key):
+        return self._call("delete", key, written=(key,))
+
+    def delete_many(self, *keys):
+        return self._call("delete_many", *keys, written=keys)
+
+    def clear(self):
+        self.fallback.clear()
+        if not self.is_open:
+            try:
+                result = self.inner.clear()
+            except BACKEND_ERRORS as e:
+                self._failed(e)
+            else:
+                self._succeeded()
+                return result
+        with self._lock:
+            self._clear_pending = True
+        return True
+
+    def inc(self, key, delta=1):
+        return self._call("inc", key, delta=delta, written=(key,))
+
+    def dec(self, key, delta=1):
+        return self._call("dec", key, delta=delta, written=(key,))
+
+
+def cache_breaker(cache):
+    """The CircuitBreakerCache among `cache`'s backend layers, or None"""
+    layer = cache.cache
+    while layer is not None:
+        if isinstance(layer, CircuitBreakerCache):
+            return layer
+        layer = getattr(layer, "inner", None)
+    return None
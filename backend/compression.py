@@ -0,0 +1,74 @@
+"""
+Negotiated response compression for large JSON bodies.
+
+An after_request hook compresses JSON/text responses of at least
+COMPRESS_MIN_SIZE bytes with the best coding the client accepts:
+br (when the optional brotli package is installed), gzip or deflate, at
+COMPRESS_LEVEL (gzip/deflate) or COMPRESS_BROTLI_LEVEL.
+
+Cached bodies are stored gzip'd (json_cache.py) and sent as they are to
+any client that accepts gzip, even if it would prefer br, so a cache hit
+never compresses anything. Responses that already have a
+Content-Encoding are left alone, as are streamed ones.
+"""
+import gzip
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_LEVEL = 6
+DEFAULT_BROTLI_LEVEL = 4
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/csv", "text/html")
+
+
+def gzip_bytes(data, level=DEFAULT_LEVEL):
+    # mtime=0 keeps the output (and so the cached entry) deterministic
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _compress(coding, data):
+    level = current_app.config.get("COMPRESS_LEVEL", DEFAULT_LEVEL)
+    if coding == "br":
+        return brotli.compress(data, quality=current_app.config.get("COMPRESS_BROTLI_LEVEL", DEFAULT_BROTLI_LEVEL))
+    if coding == "gzip":
+        return gzip_bytes(data, level)
+    return zlib.compress(data, level)
+
+
+def _should_compress(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers:
+        return False
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return False
+    min_size = current_app.config.get("COMPRESS_MIN_SIZE", DEFAULT_MIN_SIZE)
+    return response.content_length is not None and response.content_length >= min_size
+
+
+def register_compression(app):
+    """Compress eligible responses with the coding negotiated from Accept-Encoding"""
+    # server preference on equal client quality
+    codings = ["br", "gzip", "deflate"] if brotli is not None else ["gzip", "deflate"]
+
+    @app.after_request
+    def compress_response(response):
+        if not _should_compress(response):
+            return response
+        response.vary.add("Accept-Encoding")
+        coding = request.accept_encodings.best_match(codings)
+        if coding is None:
+            return response
+        response.set_data(_compress(coding, response.get_data()))
+        response.headers["Content-Encoding"] = coding
+        etag, weak = response.get_etag()
+        if etag:
+            # a strong validator differs per coding (see etags.py)
+            response.set_etag(f"{etag}-{coding}", weak)
+        return response
@@ -0,0 +1,132 @@
+"""
+Shared fixtures for the backend tests.
+
+Every test module gets its own app on a throwaway SQLite file with
+SimpleCache, so no server, Redis or mail setup is needed:
+    python -m pytest -q
+    python -m pytest -q test_lot_listing.py
+
+A module configures its app by overriding the module-scoped `app_env`
+fixture (extra environment variables for create_app()). The environment
+is restored once the app is built, so nothing leaks into later modules.
+The tests in a module share its app and database and run in file order.
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+ADMIN_USERNAME = os.getenv("ADMIN_USERNAME", "admin")
+ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin123")
+
+
+@pytest.fixture(scope="module")
+def db_dir():
+    path = tempfile.mkdtemp(prefix="parking_test_")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture(scope="module")
+def app_env():
+    """Extra environment for this module's create_app(), override in the module"""
+    return {}
+
+
+@pytest.fixture(scope="module")
+def app(db_dir, app_env):
+    from app import create_app
+    from models import db
+
+    env = {"DATABASE_URI": f"sqlite:///{os.path.join(db_dir, 'test.db')}", "CACHE_TYPE": "SimpleCache", **app_env}
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        app = create_app()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope="module")
+def login(client):
+    """login(username, password) -> Authorization headers"""
+    def login(username, password):
+        response = client.post("/api/auth/login", json={"username": username, "password": password})
+        return {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+    return login
+
+
+@pytest.fixture(scope="module")
+def admin(login):
+    return login(ADMIN_USERNAME, ADMIN_PASSWORD)
+
+
+@pytest.fixture(scope="module")
+def new_user(app, login):
+    """new_user(username) -> headers of a freshly created (or existing) user with password "secret" """
+    from models import db, User
+
+    def new_user(username, password="secret"):
+        with app.app_context():
+            if not User.query.filter_by(username=username).first():
+                user = User(username=username, email=f"{username}@example.com", role="user")
+                user.set_password(password)
+                db.session.add(user)
+                db.session.commit()
+        return login(username, password)
+    return new_user
+
+
+@pytest.fixture(scope="module")
+def new_lot(client, admin):
+    """new_lot(name, spots, price_per_hour=10, **fields) -> id of a lot created through the admin API"""
+    def new_lot(name, spots, price_per_hour=10, **fields):
+        response = client.post("/api/admin/lots", headers=admin, json={
+            "name": name, "price_per_hour": price_per_hour, "number_of_spots": spots, **fields
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["lot_id"]
+    return new_lot
+
+
+@pytest.fixture(scope="module")
+def double_leave(app, client):
+    """
+    double_leave(headers, reservation_id) -> sorted status codes of leaving
+    twice, the second request landing between the first one's check and its write
+    """
+    from models import db
+
+    def double_leave(headers, reservation_id):
+        with app.app_context():
+            engine = db.engine
+        responses, clicked = [], []
+
+        def second_click(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE reservations") and not clicked:
+                clicked.append(True)
+                responses.append(client.post("/api/user/leave", headers=headers, json={"reservation_id": reservation_id}))
+
+        event.listen(engine, "before_cursor_execute", second_click)
+        try:
+            responses.append(client.post("/api/user/leave", headers=headers, json={"reservation_id": reservation_id}))
+        finally:
+            event.remove(engine, "before_cursor_execute", second_click)
+        return sorted(response.status_code for response in responses)
+    return double_leave
+
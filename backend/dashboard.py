@@ -0,0 +1,81 @@
+"""
+Materialised admin dashboard stats.
+
+The aggregates behind /api/admin/dashboard/stats are computed by the
+materialize_dashboard_stats beat task every DASHBOARD_STATS_INTERVAL
+seconds and stored in the cache as a snapshot:
+
+    {"version": n, "computed_at": iso timestamp, "stats": {...}}
+
+The endpoint only reads the snapshot. It computes inline only when
+there is none, e.g. on a cold cache before the first beat run. A
+snapshot lives for several intervals, so if beat stops the endpoint
+falls back to inline computation instead of serving stale numbers
+forever.
+
+Every beat run recomputes. Some writers of these aggregates never touch
+the cache (registrations, the revenue backfill, counter reconciliation,
+the archive task), so nothing short of the queries says they are unchanged.
+"""
+import os
+from datetime import datetime
+
+from sqlalchemy import func, case
+
+from models import db, ParkingLot, Reservation, RevenueDaily, User
+
+DASHBOARD_STATS_KEY = "admin_dashboard_stats"
+DASHBOARD_STATS_INTERVAL = int(os.getenv("DASHBOARD_STATS_INTERVAL", 30))
+# missed beats before the snapshot expires
+SNAPSHOT_LIFETIME_INTERVALS = 10
+
+
+def compute_dashboard_stats():
+    total_lots, total_spots, occupied_spots = db.session.query(
+        func.count(ParkingLot.id),
+        func.coalesce(func.sum(ParkingLot.number_of_spots), 0),
+        func.coalesce(func.sum(ParkingLot.occupied_count), 0)
+    ).filter(ParkingLot.removed_at.is_(None)).one()
+    available_spots = total_spots - occupied_spots
+    active_reservations = Reservation.query.filter_by(status="active").count()
+    total_users = User.query.filter_by(role="user").count()
+
+    # month to date from the rollup, at most 31 rows per lot
+    today = datetime.utcnow().date()
+    lot_revenue = db.session.query(
+        RevenueDaily.lot_id,
+        func.sum(case((RevenueDaily.day == today, RevenueDaily.revenue), else_=0)),
+        func.sum(RevenueDaily.revenue)
+    ).filter(RevenueDaily.day >= today.replace(day=1)).group_by(RevenueDaily.lot_id).all()
+    today_revenue = sum(today_sum for _, today_sum, _ in lot_revenue)
+    month_revenue = sum(month_sum for _, _, month_sum in lot_revenue)
+
+    return {
+        "total_lots": total_lots,
+        "total_spots": int(total_spots),
+        "occupied_spots": occupied_spots,
+        "available_spots": available_spots,
+        "occupancy_rate": round((occupied_spots / total_spots * 100) if total_spots > 0 else 0, 2),
+        "active_reservations": active_reservations,
+        "total_users": total_users,
+        "today_revenue": round(today_revenue, 2),
+        "month_revenue": round(month_revenue, 2),
+        "lot_revenue": [
+            {"lot_id": lot_id, "today_revenue": round(today_sum, 2), "month_revenue": round(month_sum, 2)}
+            for lot_id, today_sum, month_sum in lot_revenue
+        ]
+    }
+
+
+def materialize_dashboard_stats(cache):
+    """Compute the stats and store them as the next snapshot version. Returns the snapshot."""
+    timeout = DASHBOARD_STATS_INTERVAL * SNAPSHOT_LIFETIME_INTERVALS
+    previous = cache.get(DASHBOARD_STATS_KEY)
+
+    snapshot = {
+        "version": (previous["version"] + 1) if previous else 1,
+        "computed_at": datetime.utcnow().isoformat(),
+        "stats": compute_dashboard_stats()
+    }
+    cache.set(DASHBOARD_STATS_KEY, snapshot, timeout=timeout)
+    return snapshot
@@ -0,0 +1,119 @@
+"""
+Read replica routing.
+
+DATABASE_REPLICA_URIS (comma separated) registers each replica as an
+SQLALCHEMY_BINDS entry named replica_0, replica_1, ... RoutingSession
+sends plain SELECTs to one of them while the session is in replica mode;
+anything else (writes, flushes, SELECTs after this session wrote) goes to
+the primary. Sessions take turns over the replicas, but a session sticks
+to the one it picked first (session.info["replica"]), so a request never
+mixes reads from replicas at different lag.
+
+Replica mode is switched on for GET requests to the user/admin
+blueprints, and by the Celery reporting tasks through read_from_replica().
+A user who just wrote (booked, left, edited a lot) is pinned to the
+primary for DATABASE_REPLICA_STICKY_SECONDS so they read their own writes
+even if the replica lags.
+"""
+import itertools
+import os
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_PREFIX = "replica_"
+ROUTED_BLUEPRINTS = {"user", "admin"}
+
+_round_robin = itertools.count()
+
+
+def replica_uris():
+    return [uri.strip() for uri in os.getenv("DATABASE_REPLICA_URIS", "").split(",") if uri.strip()]
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get("use_replica") and self._is_replica_safe(clause):
+            replica = self._replica()
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica(self):
+        """The replica bind key this session reads from, picked on its first replica read"""
+        if "replica" not in self.info:
+            keys = sorted(key for key in self._db.engines if key and key.startswith(REPLICA_PREFIX))
+            self.info["replica"] = keys[next(_round_robin) % len(keys)] if keys else None
+        return self.info["replica"]
+
+    def _is_replica_safe(self, clause):
+        if not isinstance(clause, sa.Select) or clause._for_update_arg is not None:
+            return False
+        # once this session has written, keep reading from the primary
+        return not (self._flushing or self.info.get("wrote") or self.new or self.dirty or self.deleted)
+
+
+@sa.event.listens_for(RoutingSession, "after_flush")
+def _mark_written(session, flush_context):
+    session.info["wrote"] = True
+
+
+@contextmanager
+def read_from_replica(session, use_replica=True):
+    """Route this session's plain reads to a replica for the duration of the block"""
+    previous = session.info.get("use_replica", False)
+    session.info["use_replica"] = use_replica
+    try:
+        yield session
+    finally:
+        session.info["use_replica"] = previous
+
+
+def read_from_primary(session):
+    """Route this session's reads to the primary for the duration of the block, e.g. in a GET handler"""
+    return read_from_replica(session, use_replica=False)
+
+
+def _sticky_key(user_id):
+    return f"replica_sticky_{user_id}"
+
+
+def _current_user_id():
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+
+def register_replica_routing(app, db):
+    """Wire the per-request replica switch and read-your-writes stickiness"""
+    if not any(key and key.startswith(REPLICA_PREFIX) for key in app.config.get("SQLALCHEMY_BINDS", {})):
+        return
+
+    sticky_seconds = int(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", 10))
+
+    @app.before_request
+    def route_reads_to_replica():
+        if request.method != "GET" or request.blueprint not in ROUTED_BLUEPRINTS:
+            return
+        from flask_jwt_extended import verify_jwt_in_request
+        try:
+            verify_jwt_in_request(optional=True)
+        except Exception:
+            # let the route's own @jwt_required produce the error response
+            return
+        user_id = _current_user_id()
+        if user_id is not None and current_app.cache.get(_sticky_key(user_id)):
+            return
+        db.session.info["use_replica"] = True
+
+    @app.after_request
+    def pin_writer_to_primary(response):
+        if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+            user_id = _current_user_id()
+            if user_id is not None:
+                current_app.cache.set(_sticky_key(user_id), True, timeout=sticky_seconds)
+        return response
@@ -0,0 +1,76 @@
+"""
+Database engine profile.
+
+SQLite gets WAL and friends applied as PRAGMAs on every new connection,
+server databases get pool sizing. Everything is read from env vars that
+sit next to DATABASE_URI:
+
+    DB_SQLITE_JOURNAL_MODE   WAL          (empty = leave SQLite's default)
+    DB_SQLITE_SYNCHRONOUS    NORMAL
+    DB_SQLITE_BUSY_TIMEOUT   5000         milliseconds
+    DB_SQLITE_MMAP_SIZE      268435456    bytes
+    DB_SQLITE_CACHE_SIZE     -65536       pages, negative = KiB
+
+    DB_POOL_SIZE             10
+    DB_MAX_OVERFLOW          20
+    DB_POOL_PRE_PING         True
+    DB_POOL_RECYCLE          1800         seconds
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def sqlite_pragmas():
+    """PRAGMA name -> value, in the order they should be applied"""
+    pragmas = {
+        "journal_mode": os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": _env_int("DB_SQLITE_BUSY_TIMEOUT", 5000),
+        "mmap_size": _env_int("DB_SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        "cache_size": _env_int("DB_SQLITE_CACHE_SIZE", -64 * 1024),
+    }
+    return {name: value for name, value in pragmas.items() if value not in (None, "")}
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def engine_options(uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URI"""
+    if is_sqlite(uri):
+        # pysqlite's own lock wait, PRAGMA busy_timeout below takes over once connected
+        return {"connect_args": {"timeout": _env_int("DB_SQLITE_BUSY_TIMEOUT", 5000) / 1000.0}}
+
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "True").lower() == "true",
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """Run the PRAGMAs on every connection the engine opens (no-op for other dialects)"""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas() if pragmas is None else pragmas
+    in_memory = engine.url.database in (None, "", ":memory:")
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if in_memory and name in ("journal_mode", "mmap_size"):
+                    continue
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
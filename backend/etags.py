@@ -0,0 +1,45 @@
+"""
+Conditional GETs: strong ETags derived from data versions.
+
+An ETag is a hash of whatever versions the response was built from (tag
+generations, the lot listing's build and patches), never of the body, so a
+route can answer If-None-Match with a 304 before touching the cached
+payload. Responses are marked "private, no-cache": the browser keeps them
+but revalidates every time, which is where the 304 comes in.
+
+A body sent with a Content-Encoding gets its own tag ("<etag>-gzip"),
+as a strong validator must differ per coding. All variants of one version
+are accepted in If-None-Match.
+"""
+import hashlib
+
+from flask import Response, request
+
+CONTENT_CODINGS = ("gzip", "br", "deflate")
+
+
+def etag_for(*versions):
+    return hashlib.sha1("|".join(map(str, versions)).encode()).hexdigest()[:32]
+
+
+def _revalidate(response):
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag):
+    """A 304 response if the client already holds `etag`, else None"""
+    if etag is None or not request.if_none_match:
+        return None
+    for tag in (etag, *(f"{etag}-{coding}" for coding in CONTENT_CODINGS)):
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            return _revalidate(response)
+    return None
+
+
+def with_etag(response, etag):
+    encoding = response.headers.get("Content-Encoding")
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    return _revalidate(response)
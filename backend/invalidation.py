@@ -0,0 +1,60 @@
+"""
+Cache invalidation coalesced per request.
+
+Write routes queue what they invalidate (tag bumps, lot listing patches)
+instead of writing to the cache as they go. The queue is flushed once,
+when the request is torn down: every lot patch in one patch_lots() write
+(a single pipeline on Redis), then every tag, deduplicated, in one
+bump() set_many. Under WSGI the teardown runs before the response body
+goes out, so a client never sees its own write missing.
+
+Outside a request (Celery tasks, CLI commands) both apply immediately.
+"""
+from flask import g, has_request_context
+
+from cache_tags import bump
+from lot_listing import lot_patch_fields, patch_lots
+
+
+def _pending(cache):
+    pending = g.get("_cache_invalidations")
+    if pending is None:
+        pending = g._cache_invalidations = {"cache": cache, "tags": set(), "patches": {}}
+    return pending
+
+
+def invalidate(cache, *tags):
+    """Bump `tags` at the end of the request"""
+    if not has_request_context():
+        bump(cache, *tags)
+        return
+    _pending(cache)["tags"].update(tags)
+
+
+def patch_lot_later(cache, lot_id, occupied=None, total=None):
+    """patch_lot() at the end of the request, merged with the request's other patches (the last value wins)"""
+    if not has_request_context():
+        patch_lots(cache, lot_patch_fields(lot_id, occupied, total))
+        return
+    _pending(cache)["patches"].update(lot_patch_fields(lot_id, occupied, total))
+
+
+def flush_invalidations():
+    pending = g.pop("_cache_invalidations", None)
+    if pending is None:
+        return
+    cache = pending["cache"]
+    # patches first: they target the current listing build, which a lots bump replaces
+    patch_lots(cache, pending["patches"])
+    if pending["tags"]:
+        bump(cache, *sorted(pending["tags"]))
+
+
+def register_invalidation_flush(app):
+    @app.teardown_request
+    def flush_cache_invalidations(exc):
+        try:
+            flush_invalidations()
+        except Exception as e:
+            # entries age out through their TTLs
+            print(f"✗ Failed to flush cache invalidations: {e}")
@@ -0,0 +1,51 @@
+"""
+Cached response bodies as pre-serialized JSON bytes.
+
+Instead of caching Python objects (pickled by flask_caching, then
+jsonify'd again on every hit) the finished response body is cached:
+compact JSON bytes, gzip-compressed above CACHE_COMPRESS_THRESHOLD bytes.
+A hit only has to write the bytes out. Clients that accept gzip get the
+compressed bytes as they are, others get them decompressed (and maybe
+re-compressed with a coding they do accept, see compression.py).
+
+An entry is a (encoding, body) tuple, encoding being None or "gzip".
+"""
+import gzip
+
+from flask import Response, current_app, request
+
+from compression import DEFAULT_LEVEL, gzip_bytes
+
+DEFAULT_COMPRESS_THRESHOLD = 1024
+
+
+def encode_json_body(payload):
+    """Serialize `payload` once into a cacheable (encoding, body) entry"""
+    body = current_app.json.dumps(payload, separators=(",", ":")).encode()
+    if len(body) >= current_app.config.get("CACHE_COMPRESS_THRESHOLD", DEFAULT_COMPRESS_THRESHOLD):
+        return "gzip", gzip_bytes(body, current_app.config.get("COMPRESS_LEVEL", DEFAULT_LEVEL))
+    return None, body
+
+
+def decode_json_body(entry):
+    """The plain JSON bytes of an entry"""
+    encoding, body = entry
+    return gzip.decompress(body) if encoding == "gzip" else body
+
+
+def accepts_encoding(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def json_body_response(entry, status=200, headers=None):
+    """Response for a cached entry, passing compressed bytes through when the client accepts them"""
+    encoding, body = entry
+    response = Response(mimetype="application/json", status=status, headers=headers)
+    if encoding and accepts_encoding(encoding):
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+    else:
+        response.set_data(decode_json_body(entry))
+    if encoding:
+        response.vary.add("Accept-Encoding")
+    return response
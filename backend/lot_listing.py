@@ -0,0 +1,202 @@
+"""
+Cached lot listing with write-through occupancy patches.
+
+/api/user/lots and /api/admin/lots are both served from one cached
+listing of every lot (tagged lots, single-flight rebuilt). Each build
+gets an id. Bookings, releases and spot-count changes do not invalidate
+the listing. They write the lot's committed occupied_count (and
+number_of_spots), read back inside their own transaction, into per-lot
+patches for the current build, which readers use in place of the cached
+row's values:
+
+    Redis:   one hash per build, HSET occupied:{lot_id} / total:{lot_id}
+    SQLite:  the same as field rows in the shared cache file
+    others:  a dict in the cache updated under a process lock
+
+Renames and other edits to a lot's fields still bump the lots tag and
+rebuild the listing. A build reads the primary, even inside a GET routed
+to a replica, and publishes its id before reading the rows. A patch is
+an absolute value, so a booking that lands in both the rows and the
+patches is not counted twice. Two patches for one lot that reach the
+cache out of commit order leave that lot one write behind until its
+next booking or release, or the listing's TTL.
+
+The build id plus its patches is the listing's version, which the user
+listing turns into an ETag (etags.py). A cached listing carries its build
+id, so serving it (or a 304) takes three cache calls: the lots
+generation, the listing and that build's patches.
+"""
+import threading
+import uuid
+
+from flask_caching.backends.rediscache import RedisCache
+from redis.exceptions import RedisError
+
+from cache_metrics import backend_of
+from circuit_breaker import cache_breaker
+from sqlite_cache import SQLiteCache
+from cache_tags import LOTS, tagged_key
+from db_routing import read_from_primary
+from models import db, ParkingLot, live_lots
+from single_flight import LOCK_TIMEOUT, cached_single_flight
+
+LISTING_KEY = "lots_listing"
+BUILD_KEY = "lots_listing_build"
+LISTING_TIMEOUT = 600
+PATCH_TIMEOUT = LISTING_TIMEOUT + LOCK_TIMEOUT
+
+
+class RedisPatches:
+    """Per-build patches as a Redis hash, HSET field by field"""
+
+    def __init__(self, redis_cache):
+        self.client = redis_cache._write_client
+        self.read_client = redis_cache._read_client
+        self.prefix = redis_cache._get_prefix()
+
+    def set(self, key, fields, timeout):
+        pipe = self.client.pipeline()
+        pipe.hset(self.prefix + key, mapping=fields)
+        pipe.expire(self.prefix + key, timeout)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            # the listing is stale for this lot until its next write or the TTL
+            print(f"✗ Failed to patch the cached lot listing: {e}")
+
+    def get(self, key):
+        try:
+            patches = self.read_client.hgetall(self.prefix + key)
+        except RedisError as e:
+            print(f"✗ Failed to read lot listing patches: {e}")
+            return {}
+        return {field.decode(): int(value) for field, value in patches.items()}
+
+
+class CachePatches:
+    """Per-build patches as a dict in any other cache backend (single process, e.g. SimpleCache)"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def set(self, key, fields, timeout):
+        with self._lock:
+            patches = dict(self.cache.get(key) or {})
+            patches.update(fields)
+            self.cache.set(key, patches, timeout=timeout)
+
+    def get(self, key):
+        return self.cache.get(key) or {}
+
+
+class SQLitePatches:
+    """Per-build patches as field rows in the shared SQLite cache"""
+
+    def __init__(self, sqlite_cache):
+        self.store = sqlite_cache
+
+    def set(self, key, fields, timeout):
+        self.store.set_fields(key, fields, timeout)
+
+    def get(self, key):
+        return self.store.get_fields(key)
+
+
+def _patches(cache):
+    backend = backend_of(cache)
+    # the two-tier backend keeps its Redis tier as .remote
+    remote = getattr(backend, "remote", backend)
+    breaker = cache_breaker(cache)
+    if isinstance(remote, RedisCache) and not (breaker and breaker.is_open):
+        return RedisPatches(remote)
+    if isinstance(backend, SQLiteCache):
+        return SQLitePatches(backend)
+    # with the breaker open this lands in its local fallback
+    return CachePatches(cache)
+
+
+def _patch_key(build):
+    return f"lots_patch:{build}"
+
+
+def lot_row(l):
+    return {
+        "id": l.id,
+        "name": l.name,
+        "price_per_hour": l.price_per_hour,
+        "number_of_spots": l.number_of_spots,
+        "occupied": l.occupied_count,
+        "available": l.number_of_spots - l.occupied_count,
+        "address": l.address,
+        "pincode": l.pincode,
+        "created_at": l.created_at.isoformat()
+    }
+
+
+def _build_listing(cache):
+    build = uuid.uuid4().hex
+    # from here on writes patch this build, including those the query below already sees
+    cache.set(tagged_key(cache, BUILD_KEY, LOTS), build, timeout=LISTING_TIMEOUT)
+    with read_from_primary(db.session):
+        query = live_lots().order_by(ParkingLot.created_at.desc()).execution_options(populate_existing=True)
+        lots = [lot_row(l) for l in query]
+    return {"build": build, "lots": lots}
+
+
+def _patched(lot, patches):
+    occupied = patches.get(f"occupied:{lot['id']}", lot["occupied"])
+    total = patches.get(f"total:{lot['id']}", lot["number_of_spots"])
+    return {**lot, "number_of_spots": total, "occupied": occupied, "available": total - occupied}
+
+
+def _version(build, patches):
+    return build + "".join(f"|{field}={value}" for field, value in sorted(patches.items()))
+
+
+def versioned_lot_listing(cache, peek=False):
+    """lot_listing() plus the version of the rows returned (build id plus patches, None on a peek miss)"""
+    listing, status = cache.get(tagged_key(cache, LISTING_KEY, LOTS)), "hit"
+    if listing is None:
+        if peek:
+            return None, "miss", None
+        listing, status = cached_single_flight(
+            cache, LISTING_KEY, (LOTS,), lambda: _build_listing(cache), timeout=LISTING_TIMEOUT
+        )
+    patches = _patches(cache).get(_patch_key(listing["build"]))
+    version = _version(listing["build"], patches)
+    if not patches:
+        return listing["lots"], status, version
+    return [_patched(lot, patches) for lot in listing["lots"]], status, version
+
+
+def lot_listing(cache, peek=False):
+    """
+    Every lot (newest first) with live occupancy, as (lots, cache status).
+    With peek=True returns (None, "miss") instead of building on a miss.
+    """
+    lots, status, _ = versioned_lot_listing(cache, peek)
+    return lots, status
+
+
+def lot_patch_fields(lot_id, occupied=None, total=None):
+    """Patch fields for one lot, only for the counts given"""
+    fields = {f"occupied:{lot_id}": occupied, f"total:{lot_id}": total}
+    return {field: value for field, value in fields.items() if value is not None}
+
+
+def patch_lots(cache, fields):
+    """Write patch fields (see lot_patch_fields) for any number of lots to the cached listing in one write"""
+    if not fields:
+        return
+    build = cache.get(tagged_key(cache, BUILD_KEY, LOTS))
+    if build is None:
+        # nothing cached, the next build reads the database
+        return
+    _patches(cache).set(_patch_key(build), fields, timeout=PATCH_TIMEOUT)
+
+
+def patch_lot(cache, lot_id, occupied=None, total=None):
+    """Set one lot's committed occupied count / number of spots in the cached listing"""
+    patch_lots(cache, lot_patch_fields(lot_id, occupied, total))
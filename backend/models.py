@@ -1,11 +1,16 @@
+import hashlib
 import os
 from datetime import datetime
 from dotenv import load_dotenv
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, tuple_
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.schema import CreateColumn
 from werkzeug.security import generate_password_hash, check_password_hash
+from db_routing import RoutingSession
 
 load_dotenv()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # --User model--
 class User(db.Model):
@@ -20,6 +25,9 @@ class User(db.Model):
     reservations = db.relationship("Reservation", back_populates="user", lazy="dynamic")
     export_jobs = db.relationship("ExportJob", back_populates="user", lazy="dynamic")
 
+    __table_args__ = (
+        db.Index("ix_users_role", "role"),
+    )
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -37,10 +45,19 @@ class ParkingLot(db.Model):
     pincode = db.Column(db.String(20))
     price_per_hour = db.Column(db.Float, nullable=False, default=0.0)
     number_of_spots = db.Column(db.Integer, nullable=False, default=0)
+    # denormalized from parking_spots, kept in step by book/leave/update_lot
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # set by delete_lot when spots with reservation history keep the row alive
+    removed_at = db.Column(db.DateTime, nullable=True)
 
     spots = db.relationship("ParkingSpot", back_populates="lot", cascade="all, delete-orphan", lazy="dynamic")
 
+    __table_args__ = (
+        db.Index("ix_parking_lots_created_at", "created_at"),
+    )
+
 
 # -- ParkingSpot Model--
 class ParkingSpot(db.Model):
@@ -48,12 +65,27 @@ class ParkingSpot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     lot_id = db.Column(db.Integer, db.ForeignKey("parking_lots.id"), nullable=False)
     spot_number = db.Column(db.Integer, nullable=False)
+    # A(vailable), O(ccupied), R(emoved): a spot dropped from its lot but still
+    # referenced by reservation history, never handed out again
     status = db.Column(db.String(1), nullable=False, default="A")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     lot = db.relationship("ParkingLot", back_populates="spots")
     reservation = db.relationship("Reservation", back_populates="spot", uselist=False)
 
+    __table_args__ = (
+        # spot grid and "last spot" lookups: WHERE lot_id = ? ORDER BY spot_number
+        db.Index("ix_parking_spots_lot_number", "lot_id", "spot_number"),
+        db.Index("ix_parking_spots_lot_status_number", "lot_id", "status", "spot_number"),
+        # partial indexes: only free spots (booking) and only occupied spots (counts).
+        # SQLite can't match a partial index against bound parameters, so these are postgres only
+        db.Index("ix_parking_spots_available", "lot_id", "spot_number",
+                 postgresql_where=db.text("status = 'A'")).ddl_if(dialect="postgresql"),
+        db.Index("ix_parking_spots_occupied", "lot_id",
+                 postgresql_where=db.text("status = 'O'")).ddl_if(dialect="postgresql"),
+        db.Index("ix_parking_spots_status", "status"),
+    )
+
 
 # -- Reservation Model --
 class Reservation(db.Model):
@@ -70,6 +102,56 @@ class Reservation(db.Model):
     user = db.relationship("User", back_populates="reservations")
     spot = db.relationship("ParkingSpot", back_populates="reservation")
 
+    __table_args__ = (
+        db.Index("ix_reservations_user_status", "user_id", "status"),
+        db.Index("ix_reservations_user_created", "user_id", "created_at"),
+        db.Index("ix_reservations_user_parking", "user_id", "parking_timestamp"),
+        db.Index("ix_reservations_spot_status", "spot_id", "status"),
+        # revenue range scans in dashboard_stats
+        db.Index("ix_reservations_status_leaving", "status", "leaving_timestamp"),
+        # the active set is tiny compared to the history, keep a dedicated (postgres) index for it
+        db.Index("ix_reservations_active_user", "user_id",
+                 postgresql_where=db.text("status = 'active'")).ddl_if(dialect="postgresql"),
+    )
+
+# --Archived (completed) reservations, moved out of the hot table by archive_reservations()--
+class ReservationArchive(db.Model):
+    __tablename__ = "reservations_archive"
+    # keeps the id it had in reservations
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    spot_id = db.Column(db.Integer, db.ForeignKey("parking_spots.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    parking_timestamp = db.Column(db.DateTime, nullable=False)
+    leaving_timestamp = db.Column(db.DateTime, nullable=True)
+    parking_cost = db.Column(db.Float, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    spot = db.relationship("ParkingSpot", viewonly=True)
+
+    __table_args__ = (
+        db.Index("ix_reservations_archive_user_created", "user_id", "created_at"),
+        db.Index("ix_reservations_archive_user_parking", "user_id", "parking_timestamp"),
+        db.Index("ix_reservations_archive_leaving", "leaving_timestamp"),
+        # lot deletes / shrinks check that no archived reservation points to a spot
+        db.Index("ix_reservations_archive_spot", "spot_id"),
+    )
+
+# --Per-lot, per-day revenue rollup, incremented by leave_spot through record_revenue()--
+class RevenueDaily(db.Model):
+    __tablename__ = "revenue_daily"
+    # no foreign key, revenue history outlives a deleted lot
+    lot_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    revenue = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_minutes = db.Column(db.Float, nullable=False, default=0.0, server_default="0")
+
+    __table_args__ = (
+        db.Index("ix_revenue_daily_day", "day"),
+    )
+
 # --ExportJobs Model--
 class ExportJob(db.Model):
     __tablename__ = "export_jobs"
@@ -81,4 +163,299 @@ class ExportJob(db.Model):
     completed_at = db.Column(db.DateTime, nullable=True)
 
     # relationship back to user (optional)
-    user = db.relationship("User", back_populates="export_jobs")
\ No newline at end of file
+    user = db.relationship("User", back_populates="export_jobs")
+
+    __table_args__ = (
+        db.Index("ix_export_jobs_user_status_requested", "user_id", "status", "requested_at"),
+        db.Index("ix_export_jobs_user_requested", "user_id", "requested_at"),
+    )
+
+
+# --Fingerprint of the models the database was last upgraded for, see ensure_schema()--
+class SchemaVersion(db.Model):
+    __tablename__ = "schema_version"
+    fingerprint = db.Column(db.String(40), primary_key=True)
+    upgraded_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def schema_fingerprint():
+    """Hash of every table, column and index the models declare"""
+    parts = []
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(table.name)
+        parts.extend(f"{table.name}.{column.name}" for column in table.columns)
+        parts.extend(sorted(f"{table.name}#{index.name}" for index in table.indexes))
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def ensure_schema():
+    """
+    Run upgrade_schema() unless the database was already upgraded for
+    these models. Called by every create_app() (web and Celery workers),
+    so the common case is a table check and one SELECT instead of full
+    introspection. `flask upgrade-schema` runs the upgrade regardless.
+    Returns the columns added.
+    """
+    if inspect(db.engine).has_table(SchemaVersion.__tablename__):
+        if db.session.get(SchemaVersion, schema_fingerprint()) is not None:
+            return []
+    return upgrade_schema()
+
+
+def _created_here(create, exists):
+    """
+    Run DDL that another booting worker may be running at the same time.
+    True if this call made the change, False if someone else got there
+    first (the statement failed but the object now exists).
+    """
+    try:
+        create()
+        return True
+    except DBAPIError:
+        if exists():
+            return False
+        raise
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models.
+    Missing tables are created; columns and indexes added to tables that
+    already exist are created here, and derived tables that are new get
+    filled from the existing data.
+
+    Workers booting together on a new schema may all get here. Each DDL
+    statement runs in its own transaction and "already exists" is not an
+    error, and only the worker that created a column or table fills it,
+    so concurrent runs are safe. `flask upgrade-schema` before starting
+    the workers avoids the duplicated work altogether.
+    """
+    engine = db.engine
+    existing_tables = set(inspect(engine).get_table_names())
+    added = []
+    created_tables = set()
+
+    # primary only, replicas get the schema through replication
+    for table in db.metadata.sorted_tables:
+        if table.name in existing_tables:
+            continue
+        if _created_here(lambda: table.create(bind=engine),
+                         lambda: inspect(engine).has_table(table.name)):
+            created_tables.add(table.name)
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {c["name"] for c in inspect(engine).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+
+            def add_column():
+                with engine.begin() as conn:
+                    conn.execute(db.text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+            def column_exists():
+                return column.name in {c["name"] for c in inspect(engine).get_columns(table.name)}
+
+            if _created_here(add_column, column_exists):
+                added.append(f"{table.name}.{column.name}")
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            _created_here(lambda: index.create(bind=engine, checkfirst=True),
+                          lambda: index.name in {i["name"] for i in inspect(engine).get_indexes(table.name)})
+
+    if "parking_lots.occupied_count" in added or "parking_lots.available_count" in added:
+        reconcile_lot_counters()
+    if "revenue_daily" in created_tables and "reservations" in existing_tables:
+        backfill_revenue_daily()
+
+    fingerprint = schema_fingerprint()
+    db.session.query(SchemaVersion).filter(SchemaVersion.fingerprint != fingerprint).delete()
+    db.session.add(SchemaVersion(fingerprint=fingerprint))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another worker stamped the same models
+        db.session.rollback()
+    return added
+
+
+SPOT_INSERT_CHUNK = 5000
+
+
+def bulk_create_spots(lot_id, first_number, count, status="A"):
+    """
+    Insert `count` spots numbered first_number.. for a lot with chunked
+    executemany INSERTs. Skips the ORM unit of work and identity map, so
+    a 100k-spot lot costs a few statements and constant memory.
+    Returns the number of spots inserted.
+    """
+    spots = ParkingSpot.__table__
+    created_at = datetime.utcnow()
+    last_number = first_number + count
+    for chunk_start in range(first_number, last_number, SPOT_INSERT_CHUNK):
+        chunk_end = min(chunk_start + SPOT_INSERT_CHUNK, last_number)
+        db.session.execute(spots.insert(), [
+            {"lot_id": lot_id, "spot_number": n, "status": status, "created_at": created_at}
+            for n in range(chunk_start, chunk_end)
+        ])
+    return count
+
+
+def adjust_lot_counters(lot_id, occupied=0, available=0):
+    """
+    Apply a relative change to a lot's occupancy counters inside the
+    current transaction. Done as UPDATE ... SET x = x + n so concurrent
+    bookings never overwrite each other's counts.
+    """
+    lots = ParkingLot.__table__
+    db.session.execute(
+        lots.update()
+        .where(lots.c.id == lot_id)
+        .values(
+            occupied_count=lots.c.occupied_count + occupied,
+            available_count=lots.c.available_count + available,
+        )
+    )
+
+
+
+def lot_counts(lot_id):
+    """
+    (occupied_count, number_of_spots) of a lot as seen by the current
+    transaction. Read right after adjust_lot_counters() this is the value
+    the transaction commits, which the cached lot listing is patched with.
+    """
+    lots = ParkingLot.__table__
+    return tuple(db.session.execute(
+        db.select(lots.c.occupied_count, lots.c.number_of_spots).where(lots.c.id == lot_id)
+    ).one())
+
+
+def live_lots():
+    """Lots that were not removed by delete_lot"""
+    return ParkingLot.query.filter(ParkingLot.removed_at.is_(None))
+
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVED_COLUMNS = ("id", "spot_id", "user_id", "parking_timestamp", "leaving_timestamp",
+                    "parking_cost", "status", "created_at")
+
+
+def archive_reservations(older_than, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move completed reservations that left before `older_than` from
+    reservations to reservations_archive, `batch_size` rows per
+    transaction so the hot table is never locked for long.
+    Returns the number of reservations moved.
+    """
+    hot = Reservation.__table__
+    archive = ReservationArchive.__table__
+    columns = [hot.c[name] for name in ARCHIVED_COLUMNS]
+    moved = 0
+
+    while True:
+        batch = db.select(hot.c.id).where(
+            hot.c.status == "completed",
+            hot.c.leaving_timestamp < older_than,
+            # never the newest row: SQLite hands max(id) + 1 to the next insert,
+            # so moving it out would let a new booking reuse an archived id
+            hot.c.id < db.select(db.func.max(hot.c.id)).scalar_subquery()
+        ).order_by(hot.c.id).limit(batch_size)
+        ids = db.session.execute(batch).scalars().all()
+        if not ids:
+            return moved
+
+        db.session.execute(archive.insert().from_select(
+            list(ARCHIVED_COLUMNS) + ["archived_at"],
+            db.select(*columns, db.literal(datetime.utcnow(), db.DateTime)).where(hot.c.id.in_(ids))
+        ))
+        db.session.execute(hot.delete().where(hot.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+
+def record_revenue(lot_id, day, revenue, minutes):
+    """
+    Add one completed reservation to the lot's revenue_daily row for `day`
+    inside the current transaction, creating the row on first use.
+    """
+    rollup = RevenueDaily.__table__
+    increment = rollup.update().where(rollup.c.lot_id == lot_id, rollup.c.day == day).values(
+        revenue=rollup.c.revenue + revenue,
+        completed_count=rollup.c.completed_count + 1,
+        total_minutes=rollup.c.total_minutes + minutes,
+    )
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(rollup.insert().values(
+                lot_id=lot_id, day=day, revenue=revenue, completed_count=1, total_minutes=minutes
+            ))
+    except IntegrityError:
+        # another request created the day's row first
+        db.session.execute(increment)
+
+
+REVENUE_BACKFILL_CHUNK = 500
+
+
+def backfill_revenue_daily():
+    """
+    Rebuild revenue_daily from the completed reservations in both the hot
+    table and the archive. Reservations whose spot has since been removed
+    cannot be attributed to a lot and are skipped; only the (lot, day)
+    rows being rebuilt are replaced, so the history of removed lots stays.
+    Returns the number of (lot, day) rows written.
+    """
+    totals = {}
+    for model in (Reservation, ReservationArchive):
+        rows = db.session.query(
+            ParkingSpot.lot_id, model.parking_timestamp, model.leaving_timestamp, model.parking_cost
+        ).join(ParkingSpot, model.spot_id == ParkingSpot.id).filter(
+            model.status == "completed", model.leaving_timestamp.isnot(None)
+        ).yield_per(5000)
+        for lot_id, parked, left, cost in rows:
+            row = totals.setdefault((lot_id, left.date()), [0.0, 0, 0.0])
+            row[0] += cost or 0.0
+            row[1] += 1
+            row[2] += (left - parked).total_seconds() / 60.0
+
+    rollup = RevenueDaily.__table__
+    keys = list(totals)
+    for start in range(0, len(keys), REVENUE_BACKFILL_CHUNK):
+        chunk = keys[start:start + REVENUE_BACKFILL_CHUNK]
+        db.session.execute(rollup.delete().where(tuple_(rollup.c.lot_id, rollup.c.day).in_(chunk)))
+        db.session.execute(rollup.insert(), [
+            {"lot_id": lot_id, "day": day, "revenue": revenue, "completed_count": count, "total_minutes": minutes}
+            for (lot_id, day), (revenue, count, minutes) in ((key, totals[key]) for key in chunk)
+        ])
+    db.session.commit()
+    return len(totals)
+
+
+def reconcile_lot_counters(lot_id=None):
+    """
+    Recompute ParkingLot.occupied_count / available_count from parking_spots.
+    Returns the number of lots updated.
+    """
+    lots = ParkingLot.__table__
+    spots = ParkingSpot.__table__
+
+    def spot_count(status):
+        return (
+            db.select(db.func.count())
+            .where(spots.c.lot_id == lots.c.id, spots.c.status == status)
+            .scalar_subquery()
+        )
+
+    stmt = lots.update().values(occupied_count=spot_count("O"), available_count=spot_count("A"))
+    if lot_id is not None:
+        stmt = stmt.where(lots.c.id == lot_id)
+
+    result = db.session.execute(stmt)
+    db.session.commit()
+    return result.rowcount
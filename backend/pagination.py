@@ -0,0 +1,63 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on the previous page, as
+url-safe base64 JSON. The next page is "rows strictly after that key",
+which is an index range seek, so page 500 costs the same as page 1.
+"""
+import base64
+import json
+from datetime import datetime
+
+from flask import request
+
+from json_cache import encode_json_body
+
+
+class InvalidPageParams(ValueError):
+    pass
+
+
+def encode_cursor(*values):
+    encoded = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """Decode a cursor into values converted with `types` (datetime or a callable)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(values, types)]
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise InvalidPageParams("invalid cursor")
+
+
+def page_params(default_limit, max_limit):
+    """Read ?limit=&cursor= from the request, returns (limit, cursor or None)"""
+    try:
+        limit = int(request.args.get("limit", default_limit))
+    except ValueError:
+        raise InvalidPageParams("limit must be an integer")
+    if limit < 1:
+        raise InvalidPageParams("limit must be >= 1")
+    return min(limit, max_limit), request.args.get("cursor") or None
+
+
+def page_cache_key(cache_key, limit, cursor):
+    """Each page is its own entry, invalidated with the listing's tags (cache_key is already tagged)"""
+    return f"{cache_key}|page={limit}:{cursor or 'first'}"
+
+
+def cached_page(cache, cache_key, limit, cursor):
+    """The cached body entry of a page (see json_cache), or None"""
+    return cache.get(page_cache_key(cache_key, limit, cursor))
+
+
+def cache_page(cache, cache_key, limit, cursor, payload, timeout):
+    """Serialize a page once, cache it and return the body entry"""
+    entry = encode_json_body(payload)
+    cache.set(page_cache_key(cache_key, limit, cursor), entry, timeout=timeout)
+    return entry
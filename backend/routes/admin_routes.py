@@ -1,13 +1,45 @@
 # admin_routes.py
 from flask import Blueprint, request, jsonify, current_app
-from models import db, ParkingLot, ParkingSpot, Reservation, User
+from models import db, ParkingLot, ParkingSpot, Reservation, ReservationArchive, bulk_create_spots, live_lots, lot_counts
 from flask_jwt_extended import jwt_required, get_jwt
 from datetime import datetime
 from sqlalchemy import func
 from functools import wraps
+from pagination import InvalidPageParams, page_params, encode_cursor, decode_cursor, cached_page, cache_page
+from json_cache import json_body_response
+from streaming import should_stream, stream_batch_size, json_chunks, stream_json
+from dashboard import DASHBOARD_STATS_KEY, materialize_dashboard_stats
+from cache_tags import LOTS, lot_tag, tagged_key
+from lot_listing import lot_listing, lot_row
+from invalidation import invalidate, patch_lot_later
+from single_flight import CACHE_STATUS_HEADER
 
 admin_bp = Blueprint("admin", __name__)
 
+SPOT_PAGE_LIMIT = 500
+
+def _without_history():
+    """Spots no reservation (hot or archived) points to, the only ones that may be DELETEd"""
+    return db.and_(
+        ~db.exists().where(Reservation.spot_id == ParkingSpot.id),
+        ~db.exists().where(ReservationArchive.spot_id == ParkingSpot.id),
+    )
+
+def _remove_free_spots(*criteria):
+    """
+    Take the free spots matching `criteria` out of their lot: spots without
+    reservation history are DELETEd, the rest are kept as status "R" so their
+    history still resolves (and SQLite can't hand their id to a new spot).
+    Returns how many spots were removed.
+    """
+    kept = ParkingSpot.query.filter(
+        *criteria, ParkingSpot.status == "A", ~_without_history()
+    ).update({ParkingSpot.status: "R"}, synchronize_session=False)
+    deleted = ParkingSpot.query.filter(
+        *criteria, ParkingSpot.status == "A", _without_history()
+    ).delete(synchronize_session=False)
+    return kept + deleted
+
 def admin_required(fn):
     @wraps(fn)
     @jwt_required()
@@ -37,6 +69,8 @@ def create_lot():
         pincode=pincode,
         price_per_hour=price_per_hour,
         number_of_spots=number_of_spots,
+        occupied_count=0,
+        available_count=number_of_spots,
         created_at=datetime.utcnow()
     )
 
@@ -44,23 +78,16 @@ def create_lot():
         db.session.add(lot)
         db.session.flush()
 
-        spots = []
-        for i in range(1, number_of_spots + 1):
-            spot = ParkingSpot(lot_id=lot.id, spot_number=i, status="A", created_at=datetime.utcnow())
-            db.session.add(spot)
-            spots.append(spot)
+        spots_created = bulk_create_spots(lot.id, 1, number_of_spots)
         db.session.commit()
         
         # INVALIDATE CACHE
-        cache = current_app.cache
-        cache.delete('admin_lots')
-        cache.delete('user_lots')
-        cache.delete('admin_dashboard_stats')
+        invalidate(current_app.cache, LOTS)
         
         return jsonify({
             "msg": "lot created",
             "lot_id": lot.id,
-            "spots_created": len(spots)
+            "spots_created": spots_created
         }), 201
     except Exception as e:
         db.session.rollback()
@@ -69,45 +96,29 @@ def create_lot():
 @admin_bp.route("/lots", methods=["GET"])
 @admin_required
 def list_lots():
+    """Served from the shared lot listing (lot_listing.py), streamed from the DB when too large to cache"""
     cache = current_app.cache
-    cache_key = 'admin_lots'
-    
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return jsonify(cached_data), 200
-    
-    lots = ParkingLot.query.order_by(ParkingLot.created_at.desc()).all()
-    out = []
-    for l in lots:
-        total = l.number_of_spots
-        occupied = l.spots.filter_by(status="O").count()
-        available = total - occupied
-        out.append({
-            "id": l.id,
-            "name": l.name,
-            "price_per_hour": l.price_per_hour,
-            "number_of_spots": total,
-            "occupied": occupied,
-            "available": available,
-            "address": l.address,
-            "pincode": l.pincode,
-            "created_at": l.created_at.isoformat()
-        })
+
+    out, status = lot_listing(cache, peek=True)
+    if out is None:
+        if should_stream(live_lots().count()):
+            lots = live_lots().order_by(ParkingLot.created_at.desc())
+            return stream_json(json_chunks(lots.yield_per(stream_batch_size()), lot_row))
+        out, status = lot_listing(cache)
     
-    cache.set(cache_key, out, timeout=180)
-    return jsonify(out), 200
+    return jsonify(out), 200, {CACHE_STATUS_HEADER: status}
 
 
 @admin_bp.route("/lots/<int:lot_id>", methods=["GET"])
 @admin_required
 def get_lot(lot_id):
     """Get single lot details for editing"""
-    lot = ParkingLot.query.get(lot_id)
+    lot = live_lots().filter_by(id=lot_id).first()
     if not lot:
         return jsonify({"msg": "lot not found"}), 404
     
     total = lot.number_of_spots
-    occupied = lot.spots.filter_by(status="O").count()
+    occupied = lot.occupied_count
     available = total - occupied
     
     return jsonify({
@@ -126,49 +137,101 @@ def get_lot(lot_id):
 @admin_bp.route("/lots/<int:lot_id>/spots", methods=["GET"])
 @admin_required
 def list_spots_for_lot(lot_id):
+    """
+    Spot grid in spot_number order, one keyset page at a time (?limit=&cursor=).
+    ?limit=all returns the whole lot, streamed when it is above the threshold.
+    """
     cache = current_app.cache
-    cache_key = f'admin_spots_{lot_id}'
+    cache_key = spot_grid_key(cache, lot_id)
+
+    try:
+        if request.args.get("limit") == "all":
+            limit, cursor, after = "all", None, None
+        else:
+            limit, cursor = page_params(default_limit=SPOT_PAGE_LIMIT, max_limit=2000)
+            after = decode_cursor(cursor, int)[0] if cursor else None
+    except InvalidPageParams as e:
+        return jsonify({"msg": str(e)}), 400
     
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return jsonify(cached_data), 200
+    cached_body = cached_page(cache, cache_key, limit, cursor)
+    if cached_body is not None:
+        return json_body_response(cached_body)
     
-    lot = ParkingLot.query.get(lot_id)
+    lot = live_lots().filter_by(id=lot_id).first()
     if not lot:
         return jsonify({"msg": "lot not found"}), 404
 
-    spots = lot.spots.order_by(ParkingSpot.spot_number).all()
-    out = []
-
-    for s in spots:
-        spot_info = {
-            "id": s.id,
-            "spot_number": s.spot_number,
-            "status": s.status,
-            "created_at": s.created_at.isoformat()
-        }
-
-        if s.status == "O" and s.reservation:
-            r = s.reservation
-            spot_info["reservation"] = {
-                "reservation_id": r.id,
-                "user_id": r.user_id,
-                "parking_timestamp": r.parking_timestamp.isoformat() if r.parking_timestamp else None,
-                "status": r.status
-            }
-        out.append(spot_info)
-    
-    result = {"lot": {"id": lot.id, "name": lot.name}, "spots": out}
-    cache.set(cache_key, result, timeout=60)
+    if limit == "all":
+        envelope = {"lot": {"id": lot.id, "name": lot.name}, "next_cursor": None}
+        spots = _spot_query(lot_id)
+        if should_stream(lot.number_of_spots):
+            return stream_json(json_chunks(spots.yield_per(stream_batch_size()), _spot_json, envelope, "spots"))
+        result = {**envelope, "spots": [_spot_json(s) for s in spots]}
+        return json_body_response(cache_page(cache, cache_key, limit, cursor, result, timeout=600))
+
+    return json_body_response(cache_spot_page(cache, cache_key, lot, limit, cursor, after))
+
+
+def spot_grid_key(cache, lot_id):
+    return tagged_key(cache, f'admin_spots_{lot_id}', lot_tag(lot_id))
+
+
+def _spot_query(lot_id):
+    # spots and their active reservation in a single outer join
+    return db.session.query(
+        ParkingSpot.id,
+        ParkingSpot.spot_number,
+        ParkingSpot.status,
+        ParkingSpot.created_at,
+        Reservation.id.label("reservation_id"),
+        Reservation.user_id,
+        Reservation.parking_timestamp,
+        Reservation.status.label("reservation_status")
+    ).outerjoin(
+        Reservation, (Reservation.spot_id == ParkingSpot.id) & (Reservation.status == "active")
+    ).filter(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R").order_by(ParkingSpot.spot_number)
+
+
+def cache_spot_page(cache, cache_key, lot, limit, cursor=None, after=None):
+    """Build one keyset page of `lot`'s spot grid, cache it and return the body entry"""
+    spots = _spot_query(lot.id)
+    if after is not None:
+        spots = spots.filter(ParkingSpot.spot_number > after)
+    spots = spots.limit(limit + 1).all()
+    has_more = len(spots) > limit
+    spots = spots[:limit]
     
-    return jsonify(result), 200
+    result = {
+        "lot": {"id": lot.id, "name": lot.name},
+        "spots": [_spot_json(s) for s in spots],
+        "next_cursor": encode_cursor(spots[-1].spot_number) if has_more else None
+    }
+    return cache_page(cache, cache_key, limit, cursor, result, timeout=600)
+
+
+def _spot_json(s):
+    spot_info = {
+        "id": s.id,
+        "spot_number": s.spot_number,
+        "status": s.status,
+        "created_at": s.created_at.isoformat()
+    }
+
+    if s.status == "O" and s.reservation_id:
+        spot_info["reservation"] = {
+            "reservation_id": s.reservation_id,
+            "user_id": s.user_id,
+            "parking_timestamp": s.parking_timestamp.isoformat() if s.parking_timestamp else None,
+            "status": s.reservation_status
+        }
+    return spot_info
 
 
 @admin_bp.route("/lots/<int:lot_id>", methods=["PUT"])
 @admin_required
 def update_lot(lot_id):
     data = request.get_json() or {}
-    lot = ParkingLot.query.get(lot_id)
+    lot = live_lots().filter_by(id=lot_id).first()
 
     if not lot:
         return jsonify({"msg": "lot not found"}), 404
@@ -180,6 +243,8 @@ def update_lot(lot_id):
     new_count = data.get("number_of_spots")
 
     try:
+        details = (lot.name, lot.price_per_hour, lot.address, lot.pincode)
+        resized = False
         if name:
             lot.name = name
         if price is not None:
@@ -196,37 +261,48 @@ def update_lot(lot_id):
 
             current_count = lot.number_of_spots
             if new_count > current_count:
-                start = 0
-                last_spot = lot.spots.order_by(ParkingSpot.spot_number.desc()).first()
-                if last_spot:
-                    start = last_spot.spot_number
+                start = db.session.query(func.max(ParkingSpot.spot_number)).filter(
+                    ParkingSpot.lot_id == lot.id, ParkingSpot.status != "R"
+                ).scalar() or 0
 
                 spots_to_add = new_count - current_count
-                for i in range(1, spots_to_add + 1):
-                    sn = start + i
-                    spot = ParkingSpot(lot_id=lot.id, spot_number=sn, status="A", created_at=datetime.utcnow())
-                    db.session.add(spot)    
+                bulk_create_spots(lot.id, start + 1, spots_to_add)
+                resized = True
                 lot.number_of_spots = new_count
+                lot.available_count = ParkingLot.available_count + spots_to_add
             elif new_count < current_count:
                 remove_count = current_count - new_count
-                spots_to_remove = lot.spots.order_by(ParkingSpot.spot_number.desc()).limit(remove_count).all()
-
-                for s in spots_to_remove:
-                    if s.status != "A":
-                        return jsonify({"msg": "cannot decrease number_of_spots: some spots to remove are occupied"}), 400
-                
-                for s in spots_to_remove:
-                    db.session.delete(s)
+                # ids up front: removing the first spots would shift a "top N" subquery
+                top_spots = db.session.scalars(
+                    db.select(ParkingSpot.id).where(
+                        ParkingSpot.lot_id == lot.id, ParkingSpot.status != "R"
+                    ).order_by(ParkingSpot.spot_number.desc()).limit(remove_count)
+                ).all()
+
+                # guarded on status "A": an occupied spot shows up as a short count
+                removed = _remove_free_spots(ParkingSpot.id.in_(top_spots))
+
+                if removed != remove_count:
+                    db.session.rollback()
+                    return jsonify({"msg": "cannot decrease number_of_spots: some spots to remove are occupied"}), 400
+
+                resized = True
                 lot.number_of_spots = new_count
+                lot.available_count = ParkingLot.available_count - removed
 
+        db.session.flush()
+        occupied, total = lot_counts(lot.id)
         db.session.commit()
+        current_app.spot_allocator.forget(lot_id)
         
-        # INVALIDATE CACHE
+        # PATCH / INVALIDATE CACHE: only edited details need a listing rebuild
         cache = current_app.cache
-        cache.delete('admin_lots')
-        cache.delete(f'admin_spots_{lot_id}')
-        cache.delete('user_lots')
-        cache.delete('admin_dashboard_stats')
+        if details != (lot.name, lot.price_per_hour, lot.address, lot.pincode):
+            invalidate(cache, LOTS, lot_tag(lot_id))
+        else:
+            if resized:
+                patch_lot_later(cache, lot_id, occupied=occupied, total=total)
+            invalidate(cache, lot_tag(lot_id))
         
         return jsonify({"msg": "lot updated", "lot_id": lot.id}), 200
     except Exception as e:
@@ -237,26 +313,37 @@ def update_lot(lot_id):
 @admin_bp.route("/lots/<int:lot_id>", methods=["DELETE"])
 @admin_required
 def delete_lot(lot_id):
-    lot = ParkingLot.query.get(lot_id)
+    lot = live_lots().filter_by(id=lot_id).first()
     if not lot:
         return jsonify({"msg": "lot not found"}), 404
 
-    occupied_spots = lot.spots.filter_by(status="O").count()
+    occupied_spots = lot.occupied_count
     active_reservations = Reservation.query.join(ParkingSpot, Reservation.spot_id == ParkingSpot.id).filter(ParkingSpot.lot_id == lot_id, Reservation.status=="active").count()
 
     if occupied_spots > 0 or active_reservations > 0:
         return jsonify({"msg": "cannot delete lot while spots are occupied or active reservations exist"}), 400
 
     try:
-        db.session.delete(lot)
+        # set-based instead of the ORM cascade, which loads every spot first
+        _remove_free_spots(ParkingSpot.lot_id == lot_id)
+        if ParkingSpot.query.filter(ParkingSpot.lot_id == lot_id, ParkingSpot.status != "R").count():
+            # a spot got occupied between the checks above and the removal
+            db.session.rollback()
+            return jsonify({"msg": "cannot delete lot while spots are occupied or active reservations exist"}), 400
+
+        if lot.spots.count():
+            # spots kept for their reservation history keep the lot row too, hidden from listings
+            lot.removed_at = datetime.utcnow()
+            lot.number_of_spots = 0
+            lot.available_count = 0
+        else:
+            ParkingLot.query.filter(ParkingLot.id == lot_id).delete(synchronize_session=False)
+
         db.session.commit()
+        current_app.spot_allocator.forget(lot_id)
         
         # INVALIDATE CACHE
-        cache = current_app.cache
-        cache.delete('admin_lots')
-        cache.delete(f'admin_spots_{lot_id}')
-        cache.delete('user_lots')
-        cache.delete('admin_dashboard_stats')
+        invalidate(current_app.cache, LOTS, lot_tag(lot_id))
         
         return jsonify({"msg": "lot deleted"}), 200
     except Exception as e:
@@ -267,47 +354,42 @@ def delete_lot(lot_id):
 @admin_bp.route("/dashboard/stats", methods=["GET"])
 @admin_required
 def dashboard_stats():
+    """Latest stats snapshot from the beat task, computed inline only if there is none yet"""
     cache = current_app.cache
-    cache_key = 'admin_dashboard_stats'
-    
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return jsonify(cached_data), 200
     
     try:
-        total_lots = ParkingLot.query.count()
-        total_spots = db.session.query(func.sum(ParkingLot.number_of_spots)).scalar() or 0
-        occupied_spots = ParkingSpot.query.filter_by(status="O").count()
-        available_spots = total_spots - occupied_spots
-        active_reservations = Reservation.query.filter_by(status="active").count()
-        total_users = User.query.filter_by(role="user").count()
-        
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        today_revenue = db.session.query(func.sum(Reservation.parking_cost)).filter(
-            Reservation.leaving_timestamp >= today_start,
-            Reservation.status == "completed"
-        ).scalar() or 0
+        snapshot = cache.get(DASHBOARD_STATS_KEY)
+        if snapshot is None:
+            snapshot = materialize_dashboard_stats(cache)
         
-        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        month_revenue = db.session.query(func.sum(Reservation.parking_cost)).filter(
-            Reservation.leaving_timestamp >= month_start,
-            Reservation.status == "completed"
-        ).scalar() or 0
-        
-        result = {
-            "total_lots": total_lots,
-            "total_spots": int(total_spots),
-            "occupied_spots": occupied_spots,
-            "available_spots": available_spots,
-            "occupancy_rate": round((occupied_spots / total_spots * 100) if total_spots > 0 else 0, 2),
-            "active_reservations": active_reservations,
-            "total_users": total_users,
-            "today_revenue": round(today_revenue, 2),
-            "month_revenue": round(month_revenue, 2)
-        }
-        
-        cache.set(cache_key, result, timeout=300)
-        return jsonify(result), 200
+        return jsonify({
+            **snapshot["stats"],
+            "version": snapshot["version"],
+            "computed_at": snapshot["computed_at"]
+        }), 200
         
     except Exception as e:
-        return jsonify({"msg": "error fetching stats", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"msg": "error fetching stats", "error": str(e)}), 500
+
+
+@admin_bp.route("/cache/metrics", methods=["GET"])
+@admin_required
+def cache_metrics():
+    """
+    Hits, misses, sets, deletes, payload sizes and backend latency per cache
+    key family, counted by this worker since start (or the last reset).
+    """
+    backend = current_app.cache.cache
+    if not hasattr(backend, "metrics"):
+        return jsonify({"msg": "cache metrics are disabled (CACHE_METRICS=false)"}), 404
+    return jsonify(backend.metrics()), 200
+
+
+@admin_bp.route("/cache/metrics/reset", methods=["POST"])
+@admin_required
+def reset_cache_metrics():
+    backend = current_app.cache.cache
+    if not hasattr(backend, "metrics"):
+        return jsonify({"msg": "cache metrics are disabled (CACHE_METRICS=false)"}), 404
+    backend.reset_metrics()
+    return jsonify({"msg": "cache metrics reset"}), 200
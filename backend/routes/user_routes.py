@@ -1,9 +1,17 @@
 # parking_routes.py
 
 from flask import Blueprint, request, jsonify, send_file, current_app
-from models import db, ParkingLot, ParkingSpot, Reservation, User, ExportJob
+from models import db, ParkingLot, ParkingSpot, Reservation, ReservationArchive, User, ExportJob, adjust_lot_counters, lot_counts, record_revenue
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, case
 from datetime import datetime, timedelta
+from pagination import InvalidPageParams, page_params, encode_cursor, decode_cursor, page_cache_key, cached_page, cache_page
+from json_cache import json_body_response
+from cache_tags import LOTS, lot_tag, user_tag, tagged_key
+from single_flight import CACHE_STATUS_HEADER
+from lot_listing import versioned_lot_listing
+from invalidation import invalidate, patch_lot_later
+from etags import etag_for, not_modified, with_etag
 import math
 import os
 
@@ -14,37 +22,36 @@ user_bp = Blueprint("user", __name__)
 def list_available_lots():
     """
     List lots with available counts. Accessible to logged in users.
-    CACHED: 60 seconds - Frequently accessed, changes moderately
+    CACHED: shared lot listing (lot_listing.py), patched in place by bookings.
+    Rebuilt by one request at a time, the rest get the previous list (X-Cache-Status: stale).
+    ETag is the listing's version, so an unchanged listing is a 304.
     """
     # Get cache from current_app inside the function
     from flask import current_app
     cache = current_app.cache
-    
-    cache_key = 'user_lots'
-    
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return jsonify(cached_data), 200
-    
-    lots = ParkingLot.query.order_by(ParkingLot.created_at.desc()).all()
+
+    lots, status, version = versioned_lot_listing(cache)
+    etag = etag_for("user_lots", version)
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
     out = []
                     
     for l in lots:
-        total = l.number_of_spots
-        occupied = l.spots.filter_by(status="O").count()
-        available = total - occupied
         out.append({
-            "id": l.id,
-            "name": l.name,
-            "price_per_hour": l.price_per_hour,
-            "available_spots": available,
-            "total_spots": total,
-            "address": l.address,
-            "pincode": l.pincode
+            "id": l["id"],
+            "name": l["name"],
+            "price_per_hour": l["price_per_hour"],
+            "available_spots": l["available"],
+            "total_spots": l["number_of_spots"],
+            "address": l["address"],
+            "pincode": l["pincode"]
         })
     
-    cache.set(cache_key, out, timeout=60)
-    return jsonify(out), 200
+    response = with_etag(jsonify(out), etag)
+    response.headers[CACHE_STATUS_HEADER] = status
+    return response
 
 @user_bp.route("/book", methods=["POST"])
 @jwt_required()
@@ -54,21 +61,30 @@ def book_spot():
     lot_id = data.get("lot_id")
     if not lot_id:
         return jsonify({"msg": "lot_id required"}), 400
+    try:
+        lot_id = int(lot_id)
+    except (TypeError, ValueError):
+        return jsonify({"msg": "lot_id must be an integer"}), 400
 
     existing = Reservation.query.filter_by(user_id=user_id, status="active").first()
     if existing:
         return jsonify({"msg": "You already have an active reservation", "reservation_id": existing.id}), 409
 
+    allocator = current_app.spot_allocator
+    spot_number = spot_id = None
     try:
         with db.session.begin_nested():
-            spot = ParkingSpot.query.filter_by(lot_id=lot_id, status="A").order_by(ParkingSpot.spot_number).with_for_update().first()
+            # heap picks the candidate, the conditional UPDATE inside allocate() decides
+            claimed = allocator.allocate(lot_id)
 
-            if not spot:
+            if not claimed:
                 return jsonify({"msg": "no available spot in this lot"}), 409
 
-            spot.status = "O"
+            spot_number, spot_id = claimed
+            adjust_lot_counters(lot_id, occupied=1, available=-1)
+            occupied, total = lot_counts(lot_id)
             reservation = Reservation(
-                spot_id=spot.id,
+                spot_id=spot_id,
                 user_id=user_id,
                 parking_timestamp=datetime.utcnow(),
                 status="active",
@@ -78,22 +94,23 @@ def book_spot():
         
         db.session.commit()
         
-        # INVALIDATE CACHE
+        # PATCH / INVALIDATE CACHE
         cache = current_app.cache
-        cache.delete('user_lots')
-        cache.delete('admin_lots')
-        cache.delete(f'my_reservations_{user_id}')
+        patch_lot_later(cache, lot_id, occupied=occupied, total=total)
+        invalidate(cache, lot_tag(lot_id), user_tag(user_id))
         
         return jsonify({
             "msg": "Parking spot booked successfully",
             "lot_id": lot_id,
             "reservation_id": reservation.id,
-            "spot_id": spot.id,
-            "spot_number": spot.spot_number
+            "spot_id": spot_id,
+            "spot_number": spot_number
         }), 201
     
     except Exception as e:
         db.session.rollback()
+        if spot_id is not None:
+            allocator.release(lot_id, spot_number, spot_id)
         return jsonify({"msg": "Error while booking", "error": str(e)}), 500
 
 @user_bp.route("/leave", methods=["POST"])
@@ -111,25 +128,36 @@ def leave_spot():
         return jsonify({"msg": "active reservation not found"}), 404
 
     try:
-        res.leaving_timestamp = datetime.utcnow()
-        duration = res.leaving_timestamp - res.parking_timestamp
+        leaving_timestamp = datetime.utcnow()
+        duration = leaving_timestamp - res.parking_timestamp
         minutes = duration.total_seconds() / 60.0
         hours = math.ceil(minutes / 60.0) if minutes > 0 else 0
         price_per_hour = res.spot.lot.price_per_hour if res.spot and res.spot.lot else 0.0
-        res.parking_cost = hours * price_per_hour
-        res.status = "completed"
+        parking_cost = hours * price_per_hour
+        # the conditional write decides, a concurrent leave of the same reservation (double click) updates nothing
+        released = Reservation.query.filter_by(id=res.id, status="active").update({
+            Reservation.status: "completed",
+            Reservation.leaving_timestamp: leaving_timestamp,
+            Reservation.parking_cost: parking_cost,
+        }, synchronize_session=False)
+        if released != 1:
+            db.session.rollback()
+            return jsonify({"msg": "reservation already released"}), 409
         res.spot.status = "A"
+        adjust_lot_counters(res.spot.lot_id, occupied=-1, available=1)
+        occupied, total = lot_counts(res.spot.lot_id)
+        record_revenue(res.spot.lot_id, leaving_timestamp.date(), parking_cost, minutes)
         db.session.commit()
+        current_app.spot_allocator.release(res.spot.lot_id, res.spot.spot_number, res.spot.id)
         
-        # INVALIDATE CACHE
+        # PATCH / INVALIDATE CACHE
         cache = current_app.cache
-        cache.delete('user_lots')
-        cache.delete('admin_lots')
-        cache.delete(f'my_reservations_{user_id}')
+        patch_lot_later(cache, res.spot.lot_id, occupied=occupied, total=total)
+        invalidate(cache, lot_tag(res.spot.lot_id), user_tag(user_id))
         
         return jsonify({
             "msg": "released",
-            "parking_cost": res.parking_cost,
+            "parking_cost": parking_cost,
             "duration_minutes": minutes
         }), 200
     except Exception as e:
@@ -140,31 +168,98 @@ def leave_spot():
 @user_bp.route("/my_reservations", methods=["GET"])
 @jwt_required()
 def my_reservations():
+    """
+    Reservation history, newest first, one keyset page at a time.
+    ?limit=&cursor= ; the first page also carries a summary of the whole history.
+    """
     user_id = get_jwt_identity()
     cache = current_app.cache
-    cache_key = f'my_reservations_{user_id}'
-    
-    cached_data = cache.get(cache_key)
-    if cached_data is not None:
-        return jsonify(cached_data), 200
+    # lot names appear in the history, so a lot rename invalidates it too
+    cache_key = tagged_key(cache, f'my_reservations_{user_id}', user_tag(user_id), LOTS)
+
+    try:
+        limit, cursor = page_params(default_limit=50, max_limit=200)
+        after = decode_cursor(cursor, datetime, int) if cursor else None
+    except InvalidPageParams as e:
+        return jsonify({"msg": str(e)}), 400
+
+    # the page key carries the tag generations, i.e. the data version
+    etag = etag_for(page_cache_key(cache_key, limit, cursor))
+    unchanged = not_modified(etag)
+    if unchanged:
+        return unchanged
+
+    cached_body = cached_page(cache, cache_key, limit, cursor)
+    if cached_body is not None:
+        return with_etag(json_body_response(cached_body), etag)
     
-    reservations = Reservation.query.filter_by(user_id=user_id).order_by(Reservation.created_at.desc()).all()
+    # the same keyset seek on the hot table and the archive, merged
+    reservations = []
+    for model in (Reservation, ReservationArchive):
+        # one joined projection instead of lazy-loading spot and lot per row
+        query = db.session.query(
+            model.id,
+            model.spot_id,
+            model.parking_timestamp,
+            model.leaving_timestamp,
+            model.parking_cost,
+            model.status,
+            model.created_at,
+            ParkingSpot.spot_number,
+            ParkingSpot.lot_id,
+            ParkingLot.name.label("lot_name")
+        ).outerjoin(ParkingSpot, model.spot_id == ParkingSpot.id).outerjoin(
+            ParkingLot, ParkingSpot.lot_id == ParkingLot.id
+        ).filter(model.user_id == user_id)
+
+        if after:
+            query = query.filter(db.tuple_(model.created_at, model.id) < db.tuple_(*after))
+
+        reservations += query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+
+    reservations.sort(key=lambda r: (r.created_at, r.id), reverse=True)
+    has_more = len(reservations) > limit
+    reservations = reservations[:limit]
+
     out = []
     for r in reservations:
         out.append({
             "id": r.id,
             "spot_id": r.spot_id,
-            "spot_number": r.spot.spot_number if r.spot else None,
-            "lot_id": r.spot.lot_id if r.spot else None,
-            "lot_name": r.spot.lot.name if r.spot and r.spot.lot else None,
+            "spot_number": r.spot_number,
+            "lot_id": r.lot_id,
+            "lot_name": r.lot_name,
             "parking_timestamp": r.parking_timestamp.isoformat() if r.parking_timestamp else None,
             "leaving_timestamp": r.leaving_timestamp.isoformat() if r.leaving_timestamp else None,
             "parking_cost": r.parking_cost,
             "status": r.status
         })
+
+    last = reservations[-1] if reservations else None
+    result = {
+        "items": out,
+        "next_cursor": encode_cursor(last.created_at, last.id) if has_more else None
+    }
+
+    if not cursor:
+        totals = [0, 0, 0, 0]
+        for model in (Reservation, ReservationArchive):
+            row = db.session.query(
+                func.count(model.id),
+                func.coalesce(func.sum(case((model.status == "active", 1), else_=0)), 0),
+                func.coalesce(func.sum(case((model.status == "completed", 1), else_=0)), 0),
+                func.coalesce(func.sum(model.parking_cost), 0)
+            ).filter(model.user_id == user_id).one()
+            totals = [a + b for a, b in zip(totals, row)]
+        total, active, completed, total_spent = totals
+        result["summary"] = {
+            "total_bookings": total,
+            "active_bookings": active,
+            "completed_bookings": completed,
+            "total_spent": round(total_spent, 2)
+        }
     
-    cache.set(cache_key, out, timeout=120)
-    return jsonify(out), 200
+    return with_etag(json_body_response(cache_page(cache, cache_key, limit, cursor, result, timeout=900)), etag)
 
 
 # ============= EXPORT ROUTES =============
@@ -222,10 +317,19 @@ def trigger_export():
 @jwt_required()
 def export_status():
     user_id = get_jwt_identity()
+
+    try:
+        limit, cursor = page_params(default_limit=10, max_limit=100)
+        after = decode_cursor(cursor, datetime, int) if cursor else None
+    except InvalidPageParams as e:
+        return jsonify({"msg": str(e)}), 400
     
-    jobs = ExportJob.query.filter_by(user_id=user_id).order_by(
-        ExportJob.requested_at.desc()
-    ).limit(10).all()
+    query = ExportJob.query.filter_by(user_id=user_id)
+    if after:
+        query = query.filter(db.tuple_(ExportJob.requested_at, ExportJob.id) < db.tuple_(*after))
+    jobs = query.order_by(ExportJob.requested_at.desc(), ExportJob.id.desc()).limit(limit + 1).all()
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
     
     out = []
     for job in jobs:
@@ -237,7 +341,10 @@ def export_status():
             "file_available": job.status == "done" and job.file_path is not None
         })
     
-    return jsonify(out), 200
+    return jsonify({
+        "items": out,
+        "next_cursor": encode_cursor(jobs[-1].requested_at, jobs[-1].id) if has_more else None
+    }), 200
 
 
 @user_bp.route("/export/download/<int:job_id>", methods=["GET"])
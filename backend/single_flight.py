@@ -0,0 +1,59 @@
+"""
+Stampede protection for cached listings.
+
+On a miss only one request, across all workers, recomputes the value: it
+takes a short lock with cache.add() (SET NX on Redis). The others are
+served the previous value, marked stale, while that recompute is in
+flight. If there is no previous value they wait for the recompute,
+polling the cache. If the lock holder dies, its lock expires after
+lock_timeout and the next request recomputes, so a stale value is only
+ever served for that long after a miss.
+
+The previous value is kept under "stale:{key}" without tag generations,
+so it survives both TTL expiry and a tag bump.
+"""
+import time
+
+from cache_tags import tagged_key
+
+CACHE_STATUS_HEADER = "X-Cache-Status"
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+
+def cached_single_flight(cache, key, tags, compute, timeout, lock_timeout=LOCK_TIMEOUT):
+    """
+    Cached value of `key` (tagged with `tags`), recomputing it with
+    `compute()` in at most one request at a time.
+    Returns (value, status) where status is "hit", "miss" or "stale".
+    """
+    cache_key = tagged_key(cache, key, *tags)
+    value = cache.get(cache_key)
+    if value is not None:
+        return value, "hit"
+
+    lock_key = f"lock:{key}"
+    deadline = time.monotonic() + lock_timeout
+    while not cache.add(lock_key, True, timeout=lock_timeout):
+        stale = cache.get(f"stale:{key}")
+        if stale is not None:
+            return stale, "stale"
+        if time.monotonic() >= deadline:
+            # the lock holder is stuck or gone, stop waiting
+            break
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(cache_key)
+        if value is not None:
+            return value, "hit"
+
+    try:
+        # the previous holder may have stored the value between our miss and the lock
+        value = cache.get(cache_key)
+        if value is not None:
+            return value, "hit"
+        value = compute()
+        cache.set(cache_key, value, timeout=timeout)
+        cache.set(f"stale:{key}", value, timeout=timeout + lock_timeout)
+    finally:
+        cache.delete(lock_key)
+    return value, "miss"
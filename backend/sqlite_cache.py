@@ -0,0 +1,231 @@
+"""
+Single-host cache shared by every worker process, backed by one SQLite file.
+
+For small deployments without Redis (CACHE_TYPE=SQLiteCache). Unlike
+SimpleCache, a set or tag bump in one gunicorn worker is seen by all the
+others, and a listing computed by one worker serves all of them. Values
+are pickled into a WAL-mode SQLite file (CACHE_SQLITE_PATH), which in
+practice sits in the page cache.
+
+add() is atomic across processes (an upsert that only replaces expired
+rows), so the single-flight lock works as it does on Redis. Field
+hashes (set_fields/get_fields) stand in for Redis HSET for the lot
+listing's patches. Reads skip expired rows; they are deleted every
+PRUNE_EVERY writes (per process), which also trims the cache to
+CACHE_THRESHOLD entries, soonest-expiring first.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from flask_caching.backends.base import BaseCache
+
+PRUNE_EVERY = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at);
+CREATE TABLE IF NOT EXISTS cache_counters (
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (key, field)
+);
+"""
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, path, default_timeout=300, threshold=10000):
+        super().__init__(default_timeout=default_timeout)
+        self.path = path
+        self.threshold = threshold
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        return cls(
+            config.get("CACHE_SQLITE_PATH", "parking_cache.db"),
+            default_timeout=config.get("CACHE_DEFAULT_TIMEOUT", 300),
+            threshold=config.get("CACHE_THRESHOLD", 10000),
+        )
+
+    # --- connections ---
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _conn(self):
+        # one connection per thread, and fresh ones in a forked worker
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        return local.conn
+
+    def _transaction(self):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        return _Transaction(conn)
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout and timeout > 0 else None
+
+    def _wrote(self, count=1):
+        self._writes += count
+        if self._writes >= PRUNE_EVERY:
+            self._writes = 0
+            self._prune()
+
+    def _prune(self):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM cache_counters WHERE expires_at <= ?", (now,))
+            excess = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.threshold
+            if excess > 0:
+                conn.execute(
+                    "DELETE FROM cache_entries WHERE key IN ("
+                    "SELECT key FROM cache_entries ORDER BY expires_at IS NULL, expires_at LIMIT ?)",
+                    (excess,),
+                )
+
+    # --- reads ---
+
+    def get(self, key):
+        row = self._conn.execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        rows = self._conn.execute(
+            f"SELECT key, value FROM cache_entries WHERE key IN ({','.join('?' * len(keys))})"
+            " AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time()),
+        ).fetchall()
+        found = {key: pickle.loads(value) for key, value in rows}
+        return [found.get(key) for key in keys]
+
+    def has(self, key):
+        return self._conn.execute(
+            "SELECT 1 FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone() is not None
+
+    # --- writes ---
+
+    def set(self, key, value, timeout=None):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout)),
+        )
+        self._wrote()
+        return True
+
+    def add(self, key, value, timeout=None):
+        # only an expired row may be replaced, atomically
+        cursor = self._conn.execute(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache_entries.expires_at <= ?",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout), time.time()),
+        )
+        added = cursor.rowcount == 1
+        if added:
+            self._wrote()
+        return added
+
+    def set_many(self, mapping, timeout=None):
+        expires_at = self._expires_at(timeout)
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires_at) for key, value in mapping.items()],
+            )
+        self._wrote(len(mapping))
+        return list(mapping)
+
+    def delete(self, key):
+        return self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,)).rowcount == 1
+
+    def delete_many(self, *keys):
+        if not keys:
+            return []
+        self._conn.execute(f"DELETE FROM cache_entries WHERE key IN ({','.join('?' * len(keys))})", keys)
+        return list(keys)
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("DELETE FROM cache_counters")
+        return True
+
+    def inc(self, key, delta=1):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            value = (pickle.loads(row[0]) if row else 0) + delta
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), row[1] if row else None),
+            )
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, delta=-delta)
+
+    # --- field hashes ---
+
+    def set_fields(self, key, fields, timeout):
+        """Set each of `fields` ({field: int}) under `key`, like HSET + EXPIRE"""
+        expires_at = self._expires_at(timeout)
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO cache_counters (key, field, value, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key, field) DO UPDATE SET value = excluded.value",
+                [(key, field, value, expires_at) for field, value in fields.items()],
+            )
+            conn.execute("UPDATE cache_counters SET expires_at = ? WHERE key = ?", (expires_at, key))
+
+    def get_fields(self, key):
+        rows = self._conn.execute(
+            "SELECT field, value FROM cache_counters WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchall()
+        return dict(rows)
+
+
+class _Transaction:
+    """Commits on success, rolls back on error (the connection is in autocommit mode otherwise)"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -0,0 +1,60 @@
+"""
+Streaming JSON responses for listings too large to build in memory.
+
+Above STREAM_JSON_THRESHOLD rows a listing is not collected into a list,
+jsonify'd into one string and pickled into the cache. Rows are fetched
+with yield_per() and serialized a batch at a time into a generator, so
+peak memory per request is one batch whatever the row count. Streamed
+responses are not cached.
+"""
+from flask import Response, current_app, stream_with_context
+
+DEFAULT_STREAM_THRESHOLD = 5000
+DEFAULT_STREAM_BATCH_SIZE = 1000
+
+
+def stream_threshold():
+    return current_app.config.get("STREAM_JSON_THRESHOLD", DEFAULT_STREAM_THRESHOLD)
+
+
+def stream_batch_size():
+    return current_app.config.get("STREAM_JSON_BATCH_SIZE", DEFAULT_STREAM_BATCH_SIZE)
+
+
+def should_stream(row_count):
+    return row_count > stream_threshold()
+
+
+def json_chunks(rows, serialize, envelope=None, key=None):
+    """
+    Yield the JSON for `rows` piece by piece: a bare array, or when
+    `envelope` is given an object with the other fields of `envelope`
+    first and the array under `key`.
+    """
+    def dumps(obj):
+        # compact, like jsonify() outside debug mode
+        return current_app.json.dumps(obj, separators=(",", ":"))
+
+    batch_size = stream_batch_size()
+
+    if envelope is not None:
+        head = dumps(envelope)[:-1]
+        yield head + ("," if envelope else "") + dumps(key) + ":["
+    else:
+        yield "["
+
+    batch, separator = [], ""
+    for row in rows:
+        batch.append(dumps(serialize(row)))
+        if len(batch) >= batch_size:
+            yield separator + ",".join(batch)
+            batch, separator = [], ","
+    if batch:
+        yield separator + ",".join(batch)
+
+    yield "]}" if envelope is not None else "]"
+
+
+def stream_json(chunks, status=200):
+    """Response for a json_chunks() generator, keeping the request context alive while it runs"""
+    return Response(stream_with_context(chunks), status=status, mimetype="application/json")
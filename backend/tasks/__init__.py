@@ -0,0 +1,17 @@
+"""
+Celery tasks. Each worker process creates the Flask app once, on its
+first task, and reuses it (flask_app()).
+"""
+import os
+
+_apps = {}
+
+
+def flask_app():
+    """The Flask app of this worker process, created on first use (per pid, prefork workers fork)"""
+    pid = os.getpid()
+    if pid not in _apps:
+        from app import create_app
+        _apps.clear()
+        _apps[pid] = create_app()
+    return _apps[pid]
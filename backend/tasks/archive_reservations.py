@@ -0,0 +1,21 @@
+from celery_app import celery
+from datetime import datetime, timedelta
+import os
+
+@celery.task(name="tasks.archive_reservations.archive_completed_reservations", bind=False)
+def archive_completed_reservations():
+    """Nightly move of old completed reservations into reservations_archive"""
+    
+    from app import create_app
+    from models import archive_reservations, ARCHIVE_BATCH_SIZE
+    
+    app = create_app()
+    # at least a day, the daily reminder and today's revenue only read the hot table
+    days = max(int(os.getenv("RESERVATION_ARCHIVE_AFTER_DAYS", 90)), 1)
+    batch_size = int(os.getenv("RESERVATION_ARCHIVE_BATCH_SIZE", ARCHIVE_BATCH_SIZE))
+
+    with app.app_context():
+        moved = archive_reservations(datetime.utcnow() - timedelta(days=days), batch_size=batch_size)
+
+    print(f"✓ Archived {moved} reservations completed more than {days} days ago")
+    return f"Archived {moved} reservations"
@@ -8,12 +8,13 @@ def send_daily_reminder():
     """Daily reminder at 6 PM to users who haven't booked parking today"""
     
     from app import create_app
-    from models import User, Reservation
+    from models import db, User, Reservation
+    from db_routing import read_from_replica
     
     app = create_app()
     mail = Mail(app)
 
-    with app.app_context():
+    with app.app_context(), read_from_replica(db.session):
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = today_start + timedelta(days=1)
 
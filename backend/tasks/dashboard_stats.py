@@ -0,0 +1,18 @@
+from celery_app import celery
+
+@celery.task(name="tasks.dashboard_stats.materialize_dashboard_stats", bind=False)
+def materialize_dashboard_stats():
+    """Recompute the admin dashboard stats into the cache every DASHBOARD_STATS_INTERVAL seconds"""
+    
+    from tasks import flask_app
+    from models import db
+    from db_routing import read_from_replica
+    import dashboard
+    
+    # runs every few seconds: reuse the worker's app instead of a create_app() per run
+    app = flask_app()
+
+    with app.app_context(), read_from_replica(db.session):
+        snapshot = dashboard.materialize_dashboard_stats(app.cache)
+
+    return f"Dashboard stats version {snapshot['version']} computed at {snapshot['computed_at']}"
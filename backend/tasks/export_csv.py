@@ -12,7 +12,8 @@ def export_user_reservations(self, user_id, user_email, username):
     """
     
     from app import create_app
-    from models import Reservation, ExportJob, db
+    from models import Reservation, ReservationArchive, ExportJob, db
+    from db_routing import read_from_replica
     
     app = create_app()
     mail = Mail(app)
@@ -30,8 +31,11 @@ def export_user_reservations(self, user_id, user_email, username):
 
     try:
         with app.app_context():
-            # Fetch all user reservations
-            reservations = Reservation.query.filter_by(user_id=user_id).order_by(Reservation.created_at.desc()).all()
+            # Fetch all user reservations, hot and archived (reporting read, a replica is fine)
+            with read_from_replica(db.session):
+                reservations = Reservation.query.filter_by(user_id=user_id).all()
+                reservations += ReservationArchive.query.filter_by(user_id=user_id).all()
+            reservations.sort(key=lambda r: (r.created_at or datetime.min, r.id), reverse=True)
             
             if not reservations:
                 # Update job status to done (even with no data)
@@ -10,12 +10,13 @@ def send_monthly_report():
     """Send monthly activity report to all users on the 1st of each month"""
     
     from app import create_app
-    from models import User, Reservation, ParkingLot, ParkingSpot
+    from models import db, User, Reservation, ReservationArchive, ParkingLot, ParkingSpot
+    from db_routing import read_from_replica
     
     app = create_app()
     mail = Mail(app)
 
-    with app.app_context():
+    with app.app_context(), read_from_replica(db.session):
         # Get previous month's date range
         today = datetime.utcnow()
         first_day_current_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -31,12 +32,15 @@ def send_monthly_report():
             if not user.email:
                 continue
 
-            # Get user's reservations for previous month
-            reservations = Reservation.query.filter(
-                Reservation.user_id == user.id,
-                Reservation.parking_timestamp >= first_day_prev_month,
-                Reservation.parking_timestamp < first_day_current_month
-            ).all()
+            # Get user's reservations for previous month, from the hot table and the archive
+            reservations = []
+            for model in (Reservation, ReservationArchive):
+                reservations += model.query.filter(
+                    model.user_id == user.id,
+                    model.parking_timestamp >= first_day_prev_month,
+                    model.parking_timestamp < first_day_current_month
+                ).all()
+            reservations.sort(key=lambda r: r.parking_timestamp, reverse=True)
 
             if not reservations:
                 # Skip users with no activity
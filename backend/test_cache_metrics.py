@@ -0,0 +1,90 @@
+"""
+Tests for the per key family cache metrics and their admin endpoint.
+"""
+import pytest
+
+from app import cache
+from cache_metrics import key_family
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Metered Lot", 30)
+
+
+@pytest.fixture(scope="module")
+def driver(new_user):
+    return new_user("metered_driver")
+
+
+@pytest.fixture(scope="module")
+def metrics(client, admin):
+    def metrics():
+        response = client.get("/api/admin/cache/metrics", headers=admin)
+        assert response.status_code == 200
+        return response.get_json()["families"]
+    return metrics
+
+
+@pytest.fixture
+def reset(app, client, admin):
+    with app.app_context():
+        cache.clear()
+    assert client.post("/api/admin/cache/metrics/reset", headers=admin).status_code == 200
+
+
+def test_key_families_fold_ids_and_tags():
+    assert key_family("my_reservations_7|user:7=ab|lots=cd|page=50:first") == "my_reservations_{id}"
+    assert key_family("admin_spots_12|lot:12=ab|page=all:first") == "admin_spots_{id}"
+    assert key_family("gen:lot:3") == "gen"
+    assert key_family("stale:lots_listing") == "stale"
+    assert key_family("lots_listing|lots=ab") == "lots_listing"
+
+
+def test_hits_misses_and_sizes_are_counted(client, admin, lot_id, metrics, reset):
+    for _ in range(3):
+        client.get(f"/api/admin/lots/{lot_id}/spots", headers=admin)
+    spots = metrics()["admin_spots_{id}"]
+    assert (spots["hits"], spots["misses"], spots["sets"]) == (2, 1, 1)
+    assert spots["hit_ratio"] == 0.6667
+    assert spots["avg_bytes"] > 0 and spots["max_bytes"] == spots["avg_bytes"]
+    assert spots["latency_ms"]["get"]["calls"] == 3
+
+
+def test_sizes_are_sampled():
+    from cachelib import SimpleCache
+    from cache_metrics import InstrumentedCache
+    metered = InstrumentedCache(SimpleCache(), size_sample=4)
+    for i in range(9):
+        metered.set("sampled", "x" * (i + 1))
+    stats = metered.metrics()["families"]["sampled"]
+    # writes 1, 5 and 9 were measured
+    assert stats["sets"] == 9 and stats["avg_bytes"] == 5 and stats["max_bytes"] == 9
+
+
+def test_endpoints_show_up_as_separate_families(client, driver, lot_id, metrics, reset):
+    client.get("/api/user/lots", headers=driver)
+    client.get("/api/user/lots", headers=driver)
+    client.get("/api/user/my_reservations", headers=driver)
+    families = metrics()
+    assert families["lots_listing"]["hits"] == 1
+    assert families["my_reservations_{id}"]["misses"] == 1
+    assert families["gen"]["sets"] >= 1
+    assert families["lock"]["deletes"] == 1
+
+
+def test_a_lot_listing_hit_takes_three_cache_calls(client, admin, driver, lot_id, metrics, reset):
+    client.get("/api/user/lots", headers=driver)
+    etag = client.get("/api/user/lots", headers=driver).headers["ETag"]
+    for headers in (driver, {**driver, "If-None-Match": etag}):
+        client.post("/api/admin/cache/metrics/reset", headers=admin)
+        client.get("/api/user/lots", headers=headers)
+        calls = {family: sum(op["calls"] for op in stats["latency_ms"].values())
+                 for family, stats in metrics().items()}
+        # the lots generation, the listing and its patches
+        assert calls == {"gen": 1, "lots_listing": 1, "lots_patch": 1}
+
+
+def test_metrics_are_admin_only(client, driver):
+    assert client.get("/api/admin/cache/metrics", headers=driver).status_code == 403
+    assert client.post("/api/admin/cache/metrics/reset", headers=driver).status_code == 403
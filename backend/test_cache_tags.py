@@ -0,0 +1,108 @@
+"""
+Tests for tag/generation based cache invalidation.
+"""
+import pytest
+
+from app import cache
+from cache_tags import LOTS, lot_tag, user_tag, generations, tagged_key, bump
+from dashboard import materialize_dashboard_stats
+from models import User
+from pagination import cached_page
+
+
+@pytest.fixture(scope="module")
+def lots(new_lot):
+    return new_lot("Lot A", 3), new_lot("Lot B", 3)
+
+
+@pytest.fixture(scope="module")
+def users(app, new_user):
+    """(user id, headers) of the driver and the bystander"""
+    users = []
+    for username in ("tag_driver", "tag_bystander"):
+        headers = new_user(username)
+        with app.app_context():
+            users.append((User.query.filter_by(username=username).one().id, headers))
+    return users
+
+
+@pytest.fixture(scope="module")
+def occupied(client, admin):
+    def occupied(lot_id):
+        spots = client.get(f"/api/admin/lots/{lot_id}/spots", headers=admin).get_json()["spots"]
+        return sum(s["status"] == "O" for s in spots)
+    return occupied
+
+
+@pytest.fixture(scope="module")
+def cached(app):
+    def cached(key, limit, *tags):
+        """Whether the first page (of `limit` rows) of a listing is cached"""
+        with app.app_context():
+            return cached_page(cache, tagged_key(cache, key, *tags), limit, None) is not None
+    return cached
+
+
+def test_booking_and_leaving_refresh_the_spot_grid(client, lots, users, occupied):
+    lot_a, _ = lots
+    (_, driver), _ = users
+    assert occupied(lot_a) == 0
+    booked = client.post("/api/user/book", headers=driver, json={"lot_id": lot_a}).get_json()
+    assert occupied(lot_a) == 1
+    client.post("/api/user/leave", headers=driver, json={"reservation_id": booked["reservation_id"]})
+    assert occupied(lot_a) == 0
+
+
+def test_bump_only_touches_its_tags(client, lots, users, occupied, cached):
+    lot_a, lot_b = lots
+    (driver_id, driver), (bystander_id, bystander) = users
+    occupied(lot_b)
+    client.get("/api/user/my_reservations", headers=bystander)
+    client.post("/api/user/book", headers=driver, json={"lot_id": lot_a})
+
+    assert cached(f"admin_spots_{lot_b}", 500, lot_tag(lot_b))
+    assert cached(f"my_reservations_{bystander_id}", 50, user_tag(bystander_id), LOTS)
+    assert not cached(f"my_reservations_{driver_id}", 50, user_tag(driver_id), LOTS)
+    available = {l["id"]: l["available_spots"] for l in client.get("/api/user/lots", headers=bystander).get_json()}
+    assert available[lot_a] == 2
+
+
+def test_lot_edit_reaches_every_listing(client, admin, lots, users):
+    _, lot_b = lots
+    (_, driver), _ = users
+    client.get("/api/user/lots", headers=driver)
+    client.get("/api/admin/lots", headers=admin)
+    client.put(f"/api/admin/lots/{lot_b}", headers=admin, json={"name": "Lot B renamed"})
+    user_names = {l["name"] for l in client.get("/api/user/lots", headers=driver).get_json()}
+    admin_names = {l["name"] for l in client.get("/api/admin/lots", headers=admin).get_json()}
+    assert "Lot B renamed" in user_names and "Lot B renamed" in admin_names
+
+
+def test_evicted_generation_does_not_resurrect_entries(app, lots):
+    lot_a, _ = lots
+    with app.app_context():
+        key = tagged_key(cache, "probe", LOTS)
+        cache.set(key, "old")
+        cache.delete(f"gen:{LOTS}")
+        assert cache.get(tagged_key(cache, "probe", LOTS)) is None
+        before = generations(cache, LOTS, lot_tag(lot_a))
+        bump(cache, lot_tag(lot_a))
+        after = generations(cache, LOTS, lot_tag(lot_a))
+    assert before[LOTS] == after[LOTS] and before[lot_tag(lot_a)] != after[lot_tag(lot_a)]
+
+
+def test_every_beat_run_recomputes_the_stats(app, client, lots, users):
+    _, lot_b = lots
+    _, (_, bystander) = users
+    with app.app_context():
+        first = materialize_dashboard_stats(cache)
+    # registration does not touch the cache at all
+    client.post("/api/auth/register", json={
+        "username": "late_signup", "email": "late_signup@example.com", "password": "secret"
+    })
+    client.post("/api/user/book", headers=bystander, json={"lot_id": lot_b})
+    with app.app_context():
+        refreshed = materialize_dashboard_stats(cache)
+    assert refreshed["version"] == first["version"] + 1
+    assert refreshed["stats"]["total_users"] == first["stats"]["total_users"] + 1
+    assert refreshed["stats"]["active_reservations"] == first["stats"]["active_reservations"] + 1
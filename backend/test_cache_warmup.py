@@ -0,0 +1,90 @@
+"""
+Tests for the cache warm-up on boot / after /cache/clear and the /health readiness flag.
+"""
+import threading
+import time
+
+import pytest
+
+import cache_warmup
+from app import cache
+from cache_tags import LOTS, tagged_key
+from dashboard import DASHBOARD_STATS_KEY
+from lot_listing import LISTING_KEY
+from pagination import cached_page
+from routes.admin_routes import SPOT_PAGE_LIMIT, spot_grid_key
+
+
+@pytest.fixture(scope="module")
+def app_env():
+    return {"CACHE_WARMUP": "true", "CACHE_WARMUP_SPOT_GRIDS": "true"}
+
+
+@pytest.fixture(scope="module")
+def wait_ready(client):
+    def wait_ready(timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            response = client.get("/health")
+            if response.status_code == 200:
+                return response
+            time.sleep(0.02)
+        raise AssertionError("cache never became ready")
+    return wait_ready
+
+
+@pytest.fixture(scope="module")
+def lot_ids(new_lot):
+    return [new_lot(f"Warm Lot {i}", 5) for i in range(3)]
+
+
+def warm_entries(app, lot_ids):
+    with app.app_context():
+        return {
+            "listing": cache.get(tagged_key(cache, LISTING_KEY, LOTS)) is not None,
+            "dashboard": cache.get(DASHBOARD_STATS_KEY) is not None,
+            "grids": sum(cached_page(cache, spot_grid_key(cache, lot_id), SPOT_PAGE_LIMIT, None) is not None
+                         for lot_id in lot_ids),
+        }
+
+
+def test_health_reports_readiness(wait_ready):
+    body = wait_ready().get_json()
+    assert body["status"] == "ok" and body["cache_ready"] is True
+    assert body["last_warmup"]["error"] is None
+
+
+def test_clear_warms_shared_entries_again(app, client, wait_ready, lot_ids):
+    wait_ready()
+    client.post("/cache/clear")
+    wait_ready()
+    assert warm_entries(app, lot_ids) == {"listing": True, "dashboard": True, "grids": len(lot_ids)}
+
+
+def test_health_is_unavailable_while_warming(client, wait_ready, monkeypatch):
+    release = threading.Event()
+    original = cache_warmup.warm_cache
+
+    def slow_warm(*args, **kwargs):
+        release.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(cache_warmup, "warm_cache", slow_warm)
+    try:
+        client.post("/cache/clear")
+        warming = client.get("/health")
+        assert warming.status_code == 503
+        assert warming.get_json()["status"] == "warming"
+    finally:
+        release.set()
+    wait_ready()
+
+
+def test_failed_warmup_still_marks_ready(client, wait_ready, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(cache_warmup, "warm_cache", broken)
+    client.post("/cache/clear")
+    body = wait_ready().get_json()
+    assert body["last_warmup"]["error"] == "database unavailable"
@@ -0,0 +1,146 @@
+"""
+Tests for the circuit breaker around the cache backend.
+
+A SimpleCache that can be switched "down" stands in for Redis.
+"""
+import time
+
+import pytest
+from cachelib import SimpleCache
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import cache
+from cache_metrics import InstrumentedCache
+from circuit_breaker import CircuitBreakerCache, with_socket_timeout
+
+
+class FlakyCache(SimpleCache):
+    """SimpleCache whose every call fails while .down is set"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+        self.calls = 0
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise RedisConnectionError("redis is down")
+
+    def get(self, key):
+        self._check()
+        return super().get(key)
+
+    def get_many(self, *keys):
+        self._check()
+        return super().get_many(*keys)
+
+    def set(self, key, value, timeout=None):
+        self._check()
+        return super().set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        self._check()
+        return super().add(key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        self._check()
+        return super().set_many(mapping, timeout)
+
+    def delete(self, key):
+        self._check()
+        return super().delete(key)
+
+    def delete_many(self, *keys):
+        self._check()
+        return super().delete_many(*keys)
+
+
+@pytest.fixture(scope="module")
+def redis_stub():
+    return FlakyCache()
+
+
+@pytest.fixture(scope="module")
+def breaker(redis_stub):
+    return CircuitBreakerCache(redis_stub, failure_threshold=3, probe_interval=0.02)
+
+
+@pytest.fixture(scope="module")
+def app(app, breaker):
+    app.extensions["cache"][cache] = InstrumentedCache(breaker)
+    return app
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Breaker Lot", 3)
+
+
+@pytest.fixture(scope="module")
+def lot_name(client, admin, lot_id):
+    def lot_name():
+        lots = client.get("/api/admin/lots", headers=admin).get_json()
+        return next(l["name"] for l in lots if l["id"] == lot_id)
+    return lot_name
+
+
+def wait_closed(breaker, timeout=5):
+    deadline = time.monotonic() + timeout
+    while breaker.is_open and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not breaker.is_open
+
+
+def test_socket_timeout_is_added_to_the_url():
+    assert with_socket_timeout("redis://localhost:6379/1", 0.1) == \
+        "redis://localhost:6379/1?socket_timeout=0.1&socket_connect_timeout=0.1"
+    assert "socket_timeout=2" in with_socket_timeout("redis://h:6379/1?socket_timeout=2", 0.1)
+
+
+def test_requests_are_served_while_redis_is_down(client, admin, redis_stub, breaker):
+    redis_stub.down = True
+    try:
+        assert client.get("/api/admin/lots", headers=admin).status_code == 200
+        assert breaker.is_open
+        calls = redis_stub.calls
+        for _ in range(3):
+            assert client.get("/api/admin/lots", headers=admin).status_code == 200
+        # an open breaker does not touch Redis on the request path
+        assert redis_stub.calls - calls < 3
+        health = client.get("/health").get_json()
+        assert health["status"] == "ok" and health["cache_backend"]["state"] == "open"
+    finally:
+        redis_stub.down = False
+    wait_closed(breaker)
+    assert client.get("/health").get_json()["cache_backend"]["state"] == "closed"
+
+
+def test_invalidations_made_during_an_outage_reach_redis(client, admin, redis_stub, breaker, lot_id, lot_name):
+    assert lot_name() == "Breaker Lot"
+    redis_stub.down = True
+    try:
+        client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"name": "Renamed in outage"})
+        assert lot_name() == "Renamed in outage"
+    finally:
+        redis_stub.down = False
+    wait_closed(breaker)
+    # the listing cached in "Redis" before the outage must not come back
+    assert lot_name() == "Renamed in outage"
+
+
+def test_single_failure_falls_back_without_opening(app, redis_stub, breaker):
+    with app.app_context():
+        cache.set("probe_key", "before")
+    redis_stub.down = True
+    try:
+        with app.app_context():
+            assert cache.set("probe_key", "fallback") is True
+            assert cache.get("probe_key") == "fallback"
+    finally:
+        redis_stub.down = False
+    assert not breaker.is_open
+    with app.app_context():
+        cache.get("other_key")
+        # the next successful call dropped the value the failed write should have replaced
+        assert redis_stub.get("probe_key") is None
@@ -0,0 +1,71 @@
+"""
+Tests for negotiated response compression.
+"""
+import gzip
+import zlib
+
+import pytest
+
+from app import cache
+
+
+@pytest.fixture(scope="module")
+def app(app):
+    app.config["COMPRESS_MIN_SIZE"] = 1024
+    app.config["STREAM_JSON_THRESHOLD"] = 100
+    return app
+
+
+@pytest.fixture(scope="module")
+def big_lot(new_lot):
+    for i in range(20):
+        new_lot(f"Compressed Lot {i}", 3, address="1 Long Street Name", pincode="560001")
+    return new_lot("Streamed Lot", 150)
+
+
+@pytest.fixture(scope="module")
+def get(client, admin, big_lot):
+    def get(url, accept_encoding=None):
+        headers = {**admin, "Accept-Encoding": accept_encoding} if accept_encoding else admin
+        return client.get(url, headers=headers)
+    return get
+
+
+def test_large_json_is_gzipped_when_accepted(get):
+    plain = get("/api/admin/lots")
+    gzipped = get("/api/admin/lots", "gzip, deflate")
+    assert len(plain.data) >= 1024
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(gzipped.data) == plain.data
+
+
+def test_client_preference_is_honoured(get):
+    deflated = get("/api/admin/lots", "gzip;q=0.5, deflate")
+    assert deflated.headers["Content-Encoding"] == "deflate"
+    assert len(zlib.decompress(deflated.data)) >= 1024
+    assert "Content-Encoding" not in get("/api/admin/lots", "identity").headers
+
+
+def test_small_responses_are_not_compressed(app, client, monkeypatch):
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    monkeypatch.setitem(app.config, "COMPRESS_MIN_SIZE", 1)
+    assert client.get("/health", headers={"Accept-Encoding": "gzip"}).headers["Content-Encoding"] == "gzip"
+
+
+def test_cached_body_is_not_compressed_twice(app, get, big_lot):
+    with app.app_context():
+        cache.clear()
+    get(f"/api/admin/lots/{big_lot}/spots?limit=50")
+    hit = get(f"/api/admin/lots/{big_lot}/spots?limit=50", "gzip")
+    assert hit.headers["Content-Encoding"] == "gzip"
+    assert len(get(f"/api/admin/lots/{big_lot}/spots?limit=50").get_json()["spots"]) == 50
+    assert gzip.decompress(hit.data).startswith(b'{"lot":')
+
+
+def test_streamed_responses_are_left_alone(get, big_lot):
+    response = get(f"/api/admin/lots/{big_lot}/spots?limit=all", "gzip")
+    assert "Content-Encoding" not in response.headers
+    assert len(response.get_json()["spots"]) == 150
@@ -0,0 +1,77 @@
+"""
+Tests for the materialised admin dashboard stats snapshot.
+"""
+import pytest
+from sqlalchemy import event
+
+from app import cache
+from dashboard import DASHBOARD_STATS_KEY, materialize_dashboard_stats
+from models import db
+
+
+@pytest.fixture(scope="module")
+def stats_and_query_count(app, client, admin):
+    def stats_and_query_count():
+        selects = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            body = client.get("/api/admin/dashboard/stats", headers=admin).get_json()
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        return body, len(selects)
+    return stats_and_query_count
+
+
+def test_inline_fallback_without_snapshot(app, new_lot, stats_and_query_count):
+    new_lot("Stats Lot", 4)
+    with app.app_context():
+        cache.clear()
+    body, queries = stats_and_query_count()
+    assert queries > 0
+    assert body["version"] == 1 and body["total_spots"] == 4
+    with app.app_context():
+        assert cache.get(DASHBOARD_STATS_KEY)["version"] == 1
+
+
+def test_endpoint_is_a_pure_read_of_the_snapshot(app, stats_and_query_count):
+    with app.app_context():
+        cache.clear()
+        materialize_dashboard_stats(cache)
+    body, queries = stats_and_query_count()
+    assert queries == 0
+    assert body["total_spots"] == 4 and body["computed_at"]
+
+
+def test_beat_run_publishes_a_new_version(app, new_lot, stats_and_query_count):
+    new_lot("Stats Lot", 6)
+    before, _ = stats_and_query_count()
+    # writes leave the snapshot alone, the next beat run picks them up
+    assert before["total_spots"] == 4
+    with app.app_context():
+        materialize_dashboard_stats(cache)
+    after, _ = stats_and_query_count()
+    assert after["version"] == before["version"] + 1
+    assert after["total_spots"] == 10 and after["total_lots"] == 2
+
+
+def test_beat_task_reuses_the_worker_app(app, monkeypatch):
+    import app as app_module
+    import tasks
+    from tasks.dashboard_stats import materialize_dashboard_stats as beat_task
+
+    # the worker boots on this module's database
+    monkeypatch.setenv("DATABASE_URI", app.config["SQLALCHEMY_DATABASE_URI"])
+    monkeypatch.setenv("CACHE_TYPE", "SimpleCache")
+    monkeypatch.setattr(tasks, "_apps", {})
+    created, create_app = [], app_module.create_app
+    monkeypatch.setattr(app_module, "create_app", lambda: created.append(1) or create_app())
+    for _ in range(3):
+        assert beat_task.run().startswith("Dashboard stats version")
+    assert len(created) == 1
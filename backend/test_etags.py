@@ -0,0 +1,103 @@
+"""
+Tests for ETag / If-None-Match on the user lot listing and reservation history.
+"""
+from datetime import datetime
+
+import pytest
+
+from app import cache
+from models import db, User, ParkingSpot, Reservation
+
+
+@pytest.fixture(scope="module")
+def app(app):
+    app.config["CACHE_COMPRESS_THRESHOLD"] = 256
+    return app
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Tag Lot", 5)
+
+
+@pytest.fixture(scope="module")
+def users(app, new_user, lot_id):
+    """Headers of the driver and of the other user, who has ten past reservations"""
+    driver, other = new_user("etag_driver"), new_user("etag_other")
+    with app.app_context():
+        other_id = User.query.filter_by(username="etag_other").one().id
+        spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+        for _ in range(10):
+            db.session.add(Reservation(spot_id=spot_id, user_id=other_id, status="completed", parking_cost=5.0,
+                                       parking_timestamp=datetime.utcnow(), leaving_timestamp=datetime.utcnow()))
+        db.session.commit()
+    return driver, other
+
+
+@pytest.fixture(scope="module")
+def revalidate(client):
+    def revalidate(url, headers, etag):
+        return client.get(url, headers={**headers, "If-None-Match": etag})
+    return revalidate
+
+
+def test_unchanged_lot_listing_is_not_modified(client, users, revalidate):
+    driver, _ = users
+    first = client.get("/api/user/lots", headers=driver)
+    assert first.status_code == 200 and first.headers["ETag"]
+    assert "no-cache" in first.headers["Cache-Control"]
+    again = revalidate("/api/user/lots", driver, first.headers["ETag"])
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_booking_changes_the_listing_etag(client, users, lot_id, revalidate):
+    driver, _ = users
+    etag = client.get("/api/user/lots", headers=driver).headers["ETag"]
+    client.post("/api/user/book", headers=driver, json={"lot_id": lot_id})
+    changed = revalidate("/api/user/lots", driver, etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert revalidate("/api/user/lots", driver, changed.headers["ETag"]).status_code == 304
+
+
+def test_lot_rename_changes_both_etags(client, admin, users, lot_id, revalidate):
+    _, other = users
+    lots_etag = client.get("/api/user/lots", headers=other).headers["ETag"]
+    history_etag = client.get("/api/user/my_reservations", headers=other).headers["ETag"]
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"name": "Tag Lot renamed"})
+    assert revalidate("/api/user/lots", other, lots_etag).status_code == 200
+    history = revalidate("/api/user/my_reservations", other, history_etag)
+    assert history.status_code == 200
+    assert history.get_json()["items"][0]["lot_name"] == "Tag Lot renamed"
+
+
+def test_history_etag_is_per_user_and_per_page(client, users, revalidate):
+    driver, other = users
+    first = client.get("/api/user/my_reservations?limit=5", headers=other)
+    etag = first.headers["ETag"]
+    assert revalidate("/api/user/my_reservations?limit=5", other, etag).status_code == 304
+    assert revalidate("/api/user/my_reservations?limit=6", other, etag).status_code == 200
+    second = f"/api/user/my_reservations?limit=5&cursor={first.get_json()['next_cursor']}"
+    assert revalidate(second, other, etag).status_code == 200
+    assert revalidate("/api/user/my_reservations?limit=5", driver, etag).status_code == 200
+
+
+def test_own_booking_changes_the_history_etag(client, users, lot_id, revalidate):
+    _, other = users
+    etag = client.get("/api/user/my_reservations", headers=other).headers["ETag"]
+    client.post("/api/user/book", headers=other, json={"lot_id": lot_id})
+    assert revalidate("/api/user/my_reservations", other, etag).status_code == 200
+
+
+def test_compressed_body_has_its_own_etag(app, client, users, revalidate):
+    _, other = users
+    with app.app_context():
+        cache.clear()
+    plain = client.get("/api/user/my_reservations", headers=other)
+    gzipped = client.get("/api/user/my_reservations", headers={**other, "Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    again = revalidate("/api/user/my_reservations", {**other, "Accept-Encoding": "gzip"}, gzipped.headers["ETag"])
+    assert again.status_code == 304
@@ -0,0 +1,63 @@
+"""
+Tests for per-request coalesced cache invalidation.
+"""
+import pytest
+
+from app import cache
+from cache_tags import LOTS, generations, lot_tag, user_tag
+from invalidation import invalidate, patch_lot_later
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Coalesced Lot", 4)
+
+
+@pytest.fixture(scope="module")
+def driver(new_user):
+    return new_user("coalesced_driver")
+
+
+def current_generations(app, *tags):
+    with app.app_context():
+        return generations(cache, *tags)
+
+
+def test_invalidations_wait_for_the_end_of_the_request(app):
+    before = current_generations(app, LOTS, user_tag(1))
+    with app.test_request_context():
+        invalidate(cache, LOTS)
+        invalidate(cache, LOTS, user_tag(1))
+        assert current_generations(app, LOTS, user_tag(1)) == before
+        app.do_teardown_request()
+    after = current_generations(app, LOTS, user_tag(1))
+    assert after[LOTS] != before[LOTS] and after[user_tag(1)] != before[user_tag(1)]
+
+
+def test_booking_writes_tags_in_one_call(client, admin, driver, lot_id):
+    client.get("/api/user/lots", headers=driver)
+    client.post("/api/admin/cache/metrics/reset", headers=admin)
+    client.post("/api/user/book", headers=driver, json={"lot_id": lot_id})
+    gen = client.get("/api/admin/cache/metrics", headers=admin).get_json()["families"]["gen"]
+    assert gen["latency_ms"]["set"]["calls"] == 1
+    assert gen["sets"] == 2
+    lots = client.get("/api/user/lots", headers=driver).get_json()
+    assert next(l["available_spots"] for l in lots if l["id"] == lot_id) == 3
+
+
+def test_patches_to_one_lot_are_merged(app, client, driver, lot_id):
+    client.get("/api/user/lots", headers=driver)
+    with app.test_request_context():
+        patch_lot_later(cache, lot_id, occupied=2)
+        patch_lot_later(cache, lot_id, occupied=3)
+        patch_lot_later(cache, lot_id, total=5)
+        app.do_teardown_request()
+    lot = next(l for l in client.get("/api/user/lots", headers=driver).get_json() if l["id"] == lot_id)
+    assert (lot["total_spots"], lot["available_spots"]) == (5, 2)
+
+
+def test_outside_a_request_invalidation_is_immediate(app, lot_id):
+    before = current_generations(app, lot_tag(lot_id))
+    with app.app_context():
+        invalidate(cache, lot_tag(lot_id))
+    assert current_generations(app, lot_tag(lot_id)) != before
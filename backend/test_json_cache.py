@@ -0,0 +1,82 @@
+"""
+Tests for caching listing pages as pre-serialized (and compressed) JSON bodies.
+"""
+import gzip
+
+import pytest
+
+from app import cache
+from cache_tags import lot_tag, tagged_key
+from pagination import cached_page
+
+
+@pytest.fixture(scope="module")
+def app(app):
+    app.config["CACHE_COMPRESS_THRESHOLD"] = 1024
+    return app
+
+
+@pytest.fixture(scope="module")
+def big_lot(new_lot):
+    return new_lot("Body Lot", 200)
+
+
+@pytest.fixture(scope="module")
+def tiny_lot(new_lot):
+    return new_lot("Tiny Lot", 1)
+
+
+@pytest.fixture(scope="module")
+def entry(app):
+    def entry(lot_id, limit, cursor=None):
+        with app.app_context():
+            return cached_page(cache, tagged_key(cache, f"admin_spots_{lot_id}", lot_tag(lot_id)), limit, cursor)
+    return entry
+
+
+def test_hit_serves_the_same_body(app, client, admin, big_lot):
+    with app.app_context():
+        cache.clear()
+    miss = client.get(f"/api/admin/lots/{big_lot}/spots?limit=all", headers=admin)
+    hit = client.get(f"/api/admin/lots/{big_lot}/spots?limit=all", headers=admin)
+    assert miss.status_code == hit.status_code == 200
+    assert hit.mimetype == "application/json"
+    assert miss.get_json() == hit.get_json()
+    assert len(hit.get_json()["spots"]) == 200
+
+
+def test_large_body_is_cached_compressed(client, admin, big_lot, entry):
+    client.get(f"/api/admin/lots/{big_lot}/spots?limit=all", headers=admin)
+    encoding, body = entry(big_lot, "all")
+    assert encoding == "gzip"
+    assert b'"spot_number":1,' in gzip.decompress(body)
+
+
+def test_compressed_body_is_passed_through_when_accepted(client, admin, big_lot):
+    plain = client.get(f"/api/admin/lots/{big_lot}/spots?limit=all", headers=admin)
+    gzipped = client.get(f"/api/admin/lots/{big_lot}/spots?limit=all",
+                         headers={**admin, "Accept-Encoding": "gzip, deflate"})
+    assert "Content-Encoding" not in plain.headers
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in gzipped.headers["Vary"]
+    assert len(gzipped.data) < len(plain.data)
+    assert gzip.decompress(gzipped.data) == plain.data
+
+
+def test_small_body_is_cached_plain(client, admin, tiny_lot, entry):
+    response = client.get(f"/api/admin/lots/{tiny_lot}/spots?limit=all",
+                          headers={**admin, "Accept-Encoding": "deflate"})
+    assert "Content-Encoding" not in response.headers
+    encoding, body = entry(tiny_lot, "all")
+    assert encoding is None
+    assert body == response.data
+
+
+def test_pages_are_cached_separately(app, client, admin, big_lot, entry):
+    with app.app_context():
+        cache.clear()
+    first = client.get(f"/api/admin/lots/{big_lot}/spots?limit=50", headers=admin).get_json()
+    client.get(f"/api/admin/lots/{big_lot}/spots?limit=50&cursor={first['next_cursor']}", headers=admin)
+    assert entry(big_lot, 50) is not None
+    assert entry(big_lot, 50, first["next_cursor"]) is not None
+    assert entry(big_lot, 100) is None
@@ -0,0 +1,133 @@
+"""
+Tests for the denormalized ParkingLot.occupied_count / available_count.
+"""
+import pytest
+
+from models import db, ParkingLot, ParkingSpot, reconcile_lot_counters
+
+
+@pytest.fixture(scope="module")
+def counters(app):
+    def counters(lot_id):
+        with app.app_context():
+            lot = db.session.get(ParkingLot, lot_id)
+            return lot.occupied_count, lot.available_count
+    return counters
+
+
+def test_create_lot_starts_all_available(new_lot, counters):
+    lot_id = new_lot("Counter Lot", 5)
+    assert counters(lot_id) == (0, 5)
+
+
+def test_book_and_leave_move_counters(client, new_lot, new_user, counters):
+    lot_id = new_lot("Counter Lot", 3)
+    users = [new_user(f"counter_user_{i}") for i in range(2)]
+    bookings = [client.post("/api/user/book", headers=u, json={"lot_id": lot_id}).get_json() for u in users]
+    assert counters(lot_id) == (2, 1)
+
+    client.post("/api/user/leave", headers=users[0], json={"reservation_id": bookings[0]["reservation_id"]})
+    assert counters(lot_id) == (1, 2)
+
+    lots = {l["id"]: l for l in client.get("/api/user/lots", headers=users[0]).get_json()}
+    assert lots[lot_id]["available_spots"] == 2
+
+    client.post("/api/user/leave", headers=users[1], json={"reservation_id": bookings[1]["reservation_id"]})
+    assert counters(lot_id) == (0, 3)
+
+
+
+def test_double_leave_moves_counters_once(client, new_lot, new_user, counters, double_leave):
+    lot_id = new_lot("Counter Lot", 2)
+    headers = new_user("double_click_user")
+    booking = client.post("/api/user/book", headers=headers, json={"lot_id": lot_id}).get_json()
+    assert double_leave(headers, booking["reservation_id"]) == [200, 409]
+    assert counters(lot_id) == (0, 2)
+
+def test_update_lot_grow_and_shrink(client, admin, new_lot, counters):
+    lot_id = new_lot("Counter Lot", 4)
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 10})
+    assert counters(lot_id) == (0, 10)
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 2})
+    assert counters(lot_id) == (0, 2)
+
+
+def test_shrink_refuses_occupied_spots(app, client, admin, new_lot, new_user, counters):
+    lot_id = new_lot("Counter Lot", 2)
+    client.post("/api/user/book", headers=new_user("shrink_user"), json={"lot_id": lot_id})
+    client.post("/api/user/book", headers=new_user("shrink_user_2"), json={"lot_id": lot_id})
+
+    response = client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 1})
+    assert response.status_code == 400
+    assert counters(lot_id) == (2, 0)
+    with app.app_context():
+        assert db.session.get(ParkingLot, lot_id).spots.count() == 2
+
+
+def test_delete_lot_removes_spots(app, client, admin, new_lot):
+    lot_id = new_lot("Counter Lot", 5)
+    assert client.delete(f"/api/admin/lots/{lot_id}", headers=admin).status_code == 200
+    with app.app_context():
+        assert db.session.get(ParkingLot, lot_id) is None
+        assert ParkingSpot.query.filter_by(lot_id=lot_id).count() == 0
+
+
+def _book_and_leave(client, headers, lot_id):
+    booking = client.post("/api/user/book", headers=headers, json={"lot_id": lot_id}).get_json()
+    client.post("/api/user/leave", headers=headers, json={"reservation_id": booking["reservation_id"]})
+    return booking
+
+
+def test_shrink_and_grow_lot_with_history(app, client, admin, new_lot, new_user, counters):
+    lot_id = new_lot("Counter Lot", 2)
+    headers = new_user("history_user")
+    first = _book_and_leave(client, headers, lot_id)
+
+    assert client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 0}).status_code == 200
+    assert counters(lot_id) == (0, 0)
+    assert client.post("/api/user/book", headers=headers, json={"lot_id": lot_id}).status_code == 409
+
+    assert client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 2}).status_code == 200
+    assert counters(lot_id) == (0, 2)
+    grid = client.get(f"/api/admin/lots/{lot_id}/spots", headers=admin).get_json()["spots"]
+    assert [s["spot_number"] for s in grid] == [1, 2]
+    assert first["spot_id"] not in {s["id"] for s in grid}
+
+    second = _book_and_leave(client, headers, lot_id)
+    assert second["spot_id"] != first["spot_id"]
+    history = client.get("/api/user/my_reservations", headers=headers).get_json()["items"]
+    assert {r["spot_id"] for r in history} == {first["spot_id"], second["spot_id"]}
+
+
+def test_delete_lot_with_history(app, client, admin, new_lot, new_user):
+    lot_id = new_lot("Removed Lot", 2)
+    headers = new_user("removed_lot_user")
+    _book_and_leave(client, headers, lot_id)
+
+    assert client.delete(f"/api/admin/lots/{lot_id}", headers=admin).status_code == 200
+    assert client.get(f"/api/admin/lots/{lot_id}", headers=admin).status_code == 404
+    assert lot_id not in {l["id"] for l in client.get("/api/admin/lots", headers=admin).get_json()}
+    assert lot_id not in {l["id"] for l in client.get("/api/user/lots", headers=headers).get_json()}
+    assert client.post("/api/user/book", headers=headers, json={"lot_id": lot_id}).status_code == 409
+
+    history = client.get("/api/user/my_reservations", headers=headers).get_json()["items"]
+    assert [r["lot_name"] for r in history] == ["Removed Lot"]
+    with app.app_context():
+        # only the spot with history is kept
+        assert [s.status for s in ParkingSpot.query.filter_by(lot_id=lot_id)] == ["R"]
+
+
+def test_reconcile_repairs_drift(app, new_lot, counters):
+    lot_id = new_lot("Counter Lot", 6)
+    with app.app_context():
+        lot = db.session.get(ParkingLot, lot_id)
+        lot.occupied_count, lot.available_count = 42, -1
+        db.session.commit()
+        assert reconcile_lot_counters(lot_id) == 1
+    assert counters(lot_id) == (0, 6)
+
+
+def test_reconcile_cli_command(app):
+    result = app.test_cli_runner().invoke(args=["reconcile-counters"])
+    assert result.exit_code == 0
+    assert "Reconciled occupancy counters" in result.output
@@ -0,0 +1,100 @@
+"""
+Tests for write-through patching of the cached lot listing.
+"""
+import pytest
+
+from app import cache
+from single_flight import CACHE_STATUS_HEADER
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Churn Lot", 10)
+
+
+@pytest.fixture(scope="module")
+def drivers(new_user):
+    return [new_user(f"churn_driver_{i}") for i in range(4)]
+
+
+@pytest.fixture(scope="module")
+def user_lot(client, drivers, lot_id):
+    def user_lot():
+        response = client.get("/api/user/lots", headers=drivers[0])
+        lot = next(l for l in response.get_json() if l["id"] == lot_id)
+        return lot, response.headers[CACHE_STATUS_HEADER]
+    return user_lot
+
+
+@pytest.fixture(scope="module")
+def admin_lot(client, admin, lot_id):
+    def admin_lot():
+        response = client.get("/api/admin/lots", headers=admin)
+        return next(l for l in response.get_json() if l["id"] == lot_id), response.headers[CACHE_STATUS_HEADER]
+    return admin_lot
+
+
+def test_booking_patches_listing_without_rebuild(app, client, drivers, lot_id, user_lot, admin_lot):
+    with app.app_context():
+        cache.clear()
+    assert user_lot()[1] == "miss"
+    reservations = [client.post("/api/user/book", headers=h, json={"lot_id": lot_id}).get_json()["reservation_id"]
+                    for h in drivers]
+    lot, status = user_lot()
+    assert status == "hit" and lot["available_spots"] == 6
+    lot, admin_status = admin_lot()
+    assert admin_status == "hit" and (lot["occupied"], lot["available"]) == (4, 6)
+
+    client.post("/api/user/leave", headers=drivers[0], json={"reservation_id": reservations[0]})
+    lot, status = user_lot()
+    assert status == "hit" and lot["available_spots"] == 7
+
+
+def test_spot_count_change_is_patched(client, admin, lot_id, user_lot):
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 15})
+    lot, status = user_lot()
+    assert status == "hit" and (lot["total_spots"], lot["available_spots"]) == (15, 12)
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"number_of_spots": 12})
+    lot, _ = user_lot()
+    assert (lot["total_spots"], lot["available_spots"]) == (12, 9)
+
+
+def test_unchanged_details_do_not_rebuild(client, admin, lot_id, user_lot):
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"name": "Churn Lot", "price_per_hour": 10})
+    assert user_lot()[1] == "hit"
+
+
+def test_detail_edit_rebuilds(client, admin, lot_id, user_lot):
+    client.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"name": "Churn Lot East"})
+    lot, status = user_lot()
+    assert status == "miss" and lot["name"] == "Churn Lot East"
+
+
+def test_patched_listing_matches_fresh_build(app, client, admin, drivers, lot_id):
+    client.post("/api/user/book", headers=drivers[0], json={"lot_id": lot_id})
+    patched = client.get("/api/admin/lots", headers=admin).get_json()
+    with app.app_context():
+        cache.clear()
+    assert client.get("/api/admin/lots", headers=admin).get_json() == patched
+
+
+def test_booking_seen_by_a_rebuild_is_not_counted_twice(app, client, new_user, lot_id, user_lot, monkeypatch):
+    import invalidation
+    from lot_listing import patch_lots
+
+    with app.app_context():
+        cache.clear()
+    available = user_lot()[0]["available_spots"]
+    # the booking commits, then a rebuild reads it, then its patch reaches the new build
+    held = []
+    monkeypatch.setattr(invalidation, "patch_lots", lambda cache, fields: held.append((cache, fields)))
+    client.post("/api/user/book", headers=new_user("late_patch_driver"), json={"lot_id": lot_id})
+    monkeypatch.undo()
+    with app.app_context():
+        cache.clear()
+    lot, status = user_lot()
+    assert status == "miss" and lot["available_spots"] == available - 1
+    for held_cache, fields in held:
+        patch_lots(held_cache, fields)
+    lot, status = user_lot()
+    assert status == "hit" and lot["available_spots"] == available - 1
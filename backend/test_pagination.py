@@ -0,0 +1,117 @@
+"""
+Tests for keyset pagination on reservation history, export jobs and the
+admin spot grid.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import cache
+from models import db, User, ParkingSpot, Reservation, ExportJob
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Page Lot", 25)
+
+
+@pytest.fixture(scope="module")
+def user(app, new_user, lot_id):
+    """Headers of a user with 45 past reservations and 12 export jobs"""
+    headers = new_user("page_user")
+    with app.app_context():
+        user_id = User.query.filter_by(username="page_user").one().id
+        spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+        now = datetime.utcnow()
+        for i in range(45):
+            # pairs share a created_at so the id tie-breaker is exercised
+            created = now - timedelta(hours=i // 2)
+            db.session.add(Reservation(spot_id=spot_id, user_id=user_id, status="completed", parking_cost=5.0,
+                                       parking_timestamp=created, leaving_timestamp=created, created_at=created))
+        for i in range(12):
+            db.session.add(ExportJob(user_id=user_id, status="done", requested_at=now - timedelta(minutes=i)))
+        db.session.commit()
+    return headers
+
+
+@pytest.fixture(scope="module")
+def walk(client):
+    def walk(url, headers, items_key="items"):
+        """Follow next_cursor to the end, returns every page"""
+        pages, cursor = [], None
+        while True:
+            separator = "&" if "?" in url else "?"
+            page = client.get(url + (f"{separator}cursor={cursor}" if cursor else ""), headers=headers).get_json()
+            pages.append(page[items_key])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return pages
+    return walk
+
+
+def test_reservation_pages_cover_history_once(user, walk):
+    pages = walk("/api/user/my_reservations?limit=10", user)
+    ids = [r["id"] for page in pages for r in page]
+    assert [len(p) for p in pages] == [10, 10, 10, 10, 5]
+    assert len(ids) == len(set(ids)) == 45
+
+
+def test_first_page_summarises_whole_history(client, user):
+    body = client.get("/api/user/my_reservations?limit=5", headers=user).get_json()
+    assert body["summary"]["total_bookings"] == 45
+    assert body["summary"]["total_spent"] == 225.0
+
+
+def test_export_status_pages(user, walk):
+    pages = walk("/api/user/export/status?limit=5", user)
+    assert [len(p) for p in pages] == [5, 5, 2]
+
+
+def test_spot_grid_pages_in_spot_order(admin, lot_id, walk):
+    pages = walk(f"/api/admin/lots/{lot_id}/spots?limit=10", admin, items_key="spots")
+    numbers = [s["spot_number"] for page in pages for s in page]
+    assert numbers == list(range(1, 26))
+
+
+def test_deep_page_costs_the_same_as_first(app, client, user):
+    first = client.get("/api/user/my_reservations?limit=10", headers=user).get_json()
+    deep_cursor = client.get(
+        f"/api/user/my_reservations?limit=10&cursor={first['next_cursor']}", headers=user
+    ).get_json()["next_cursor"]
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM reservations" in statement and "ORDER BY" in statement:
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        cache.clear()
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        client.get(f"/api/user/my_reservations?limit=10&cursor={deep_cursor}", headers=user)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    with engine.connect() as conn:
+        steps = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statements[0][0], statements[0][1])]
+    assert any(step.startswith("SEARCH reservations USING INDEX") for step in steps), steps
+    assert not any("TEMP B-TREE" in step for step in steps), steps
+
+
+def test_cache_is_keyed_by_cursor(app, client, user):
+    with app.app_context():
+        cache.clear()
+    first = client.get("/api/user/my_reservations?limit=10", headers=user).get_json()
+    second = client.get(f"/api/user/my_reservations?limit=10&cursor={first['next_cursor']}", headers=user).get_json()
+    again = client.get("/api/user/my_reservations?limit=10", headers=user).get_json()
+    assert first == again
+    assert {r["id"] for r in first["items"]}.isdisjoint({r["id"] for r in second["items"]})
+
+
+def test_bad_params_are_rejected(client, admin, user, lot_id):
+    assert client.get("/api/user/my_reservations?cursor=not-a-cursor", headers=user).status_code == 400
+    assert client.get("/api/user/my_reservations?limit=zero", headers=user).status_code == 400
+    assert client.get(f"/api/admin/lots/{lot_id}/spots?limit=0", headers=admin).status_code == 400
@@ -0,0 +1,93 @@
+"""
+Pins the listing endpoints to a constant number of queries, however many
+rows they return (guards against lazy-load N+1 regressions).
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import cache
+from models import db, User, ParkingSpot, Reservation
+
+
+@pytest.fixture(scope="module")
+def user_with_history(app, new_user):
+    def user_with_history(username, lot_id, count):
+        """Create a user with `count` completed reservations spread over the lot"""
+        headers = new_user(username)
+        with app.app_context():
+            user_id = User.query.filter_by(username=username).one().id
+            spot_ids = [s.id for s in ParkingSpot.query.filter_by(lot_id=lot_id)]
+            start = datetime.utcnow() - timedelta(days=count)
+            for i in range(count):
+                parked = start + timedelta(days=i)
+                db.session.add(Reservation(
+                    spot_id=spot_ids[i % len(spot_ids)], user_id=user_id, status="completed",
+                    parking_timestamp=parked, leaving_timestamp=parked + timedelta(hours=1),
+                    parking_cost=10.0, created_at=parked
+                ))
+            db.session.commit()
+        return headers
+    return user_with_history
+
+
+@contextmanager
+def count_queries(app):
+    counter = {"selects": 0}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            counter["selects"] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture(scope="module")
+def queries_for(app, client):
+    def queries_for(url, headers):
+        with app.app_context():
+            cache.clear()
+        with count_queries(app) as counter:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        return counter["selects"], response.get_json()
+    return queries_for
+
+
+def test_my_reservations_constant_queries(new_lot, user_with_history, queries_for):
+    lot_id = new_lot("Count Lot", 10)
+    small = user_with_history("history_small", lot_id, 3)
+    large = user_with_history("history_large", lot_id, 200)
+
+    small_queries, small_body = queries_for("/api/user/my_reservations?limit=200", small)
+    large_queries, large_body = queries_for("/api/user/my_reservations?limit=200", large)
+
+    assert len(small_body["items"]) == 3 and len(large_body["items"]) == 200
+    assert large_body["items"][0]["lot_name"] == "Count Lot"
+    assert small_queries == large_queries, f"{small_queries} vs {large_queries} queries"
+
+
+def test_spot_grid_constant_queries(client, admin, new_lot, user_with_history, queries_for):
+    small_lot = new_lot("Count Lot", 2)
+    large_lot = new_lot("Count Lot", 300)
+    users = [user_with_history(f"grid_user_{i}", large_lot, 0) for i in range(20)]
+    for headers in users:
+        client.post("/api/user/book", headers=headers, json={"lot_id": large_lot})
+    client.post("/api/user/book", headers=user_with_history("grid_user_small", small_lot, 0),
+                json={"lot_id": small_lot})
+
+    small_queries, _ = queries_for(f"/api/admin/lots/{small_lot}/spots", admin)
+    large_queries, large_body = queries_for(f"/api/admin/lots/{large_lot}/spots?limit=500", admin)
+
+    occupied = [s for s in large_body["spots"] if s["status"] == "O"]
+    assert len(large_body["spots"]) == 300 and len(occupied) == 20
+    assert all(s["reservation"]["status"] == "active" for s in occupied)
+    assert small_queries == large_queries, f"{small_queries} vs {large_queries} queries"
@@ -0,0 +1,168 @@
+"""
+Query plan regression tests for the hot routes.
+
+Every SELECT issued while a route runs is captured and re-run through
+EXPLAIN QUERY PLAN. A plan step that scans a whole table (SQLite reports
+"SCAN <table>" without "USING ... INDEX") fails the test.
+"""
+import re
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app, cache
+from models import db
+
+# listing every lot is a full read by definition, the lots table stays small
+FULL_SCAN_ALLOWED = {"parking_lots"}
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)(?!.*USING)")
+
+
+@pytest.fixture(scope="module")
+def user(new_user):
+    return new_user("plan_user")
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Plan Lot", 50, price_per_hour=20)
+
+
+@contextmanager
+def captured_selects(app):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(app, statements):
+    """Return (table, statement) for every plan step that reads a whole table"""
+    offenders = []
+    with app.app_context():
+        with db.engine.connect() as conn:
+            for statement, parameters in statements:
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                for row in rows:
+                    match = FULL_SCAN.match(row[-1])
+                    if match and match.group(1) not in FULL_SCAN_ALLOWED:
+                        offenders.append((match.group(1), statement))
+    return offenders
+
+
+@pytest.fixture(scope="module")
+def assert_indexed(app, client):
+    def assert_indexed(method, url, headers, **kwargs):
+        with app.app_context():
+            cache.clear()
+        with captured_selects(app) as statements:
+            getattr(client, method)(url, headers=headers, **kwargs)
+        assert statements, f"{url} issued no queries"
+        offenders = full_scans(app, statements)
+        assert not offenders, f"{method.upper()} {url} scans: " + "; ".join(
+            f"{table} <- {sql.split(chr(10))[0]}" for table, sql in offenders
+        )
+    return assert_indexed
+
+
+def test_user_lots(assert_indexed, user, lot_id):
+    assert_indexed("get", "/api/user/lots", user)
+
+
+def test_book_and_leave(app, client, user, lot_id):
+    with captured_selects(app) as statements:
+        booked = client.post("/api/user/book", headers=user, json={"lot_id": lot_id}).get_json()
+        client.post("/api/user/leave", headers=user, json={"reservation_id": booked["reservation_id"]})
+    offenders = full_scans(app, statements)
+    assert not offenders, "book/leave scans: " + ", ".join(table for table, _ in offenders)
+
+
+def test_my_reservations(assert_indexed, user):
+    assert_indexed("get", "/api/user/my_reservations", user)
+
+
+def test_export_routes(assert_indexed, user):
+    with mock.patch("tasks.export_csv.export_user_reservations.delay") as delay:
+        delay.return_value.id = "test-task"
+        assert_indexed("post", "/api/user/export/trigger", user)
+    assert_indexed("get", "/api/user/export/status", user)
+
+
+def test_admin_lot_routes(assert_indexed, admin, lot_id):
+    assert_indexed("get", "/api/admin/lots", admin)
+    assert_indexed("get", f"/api/admin/lots/{lot_id}", admin)
+    assert_indexed("get", f"/api/admin/lots/{lot_id}/spots", admin)
+
+
+def test_update_lot(assert_indexed, admin, lot_id):
+    assert_indexed("put", f"/api/admin/lots/{lot_id}", admin, json={"number_of_spots": 60})
+    assert_indexed("put", f"/api/admin/lots/{lot_id}", admin, json={"number_of_spots": 50})
+
+
+def test_dashboard_stats(assert_indexed, admin):
+    assert_indexed("get", "/api/admin/dashboard/stats", admin)
+
+
+def test_boot_skips_the_schema_upgrade_once_done(app, monkeypatch, db_dir):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # a second worker (or Celery task) booting on the upgraded database
+    monkeypatch.setenv("DATABASE_URI", app.config["SQLALCHEMY_DATABASE_URI"])
+    monkeypatch.setenv("CACHE_TYPE", "SimpleCache")
+    event.listen(Engine, "before_cursor_execute", count)
+    try:
+        create_app()
+    finally:
+        event.remove(Engine, "before_cursor_execute", count)
+    assert not [sql for sql in statements if sql.lstrip().upper().startswith(("CREATE", "ALTER", "PRAGMA INDEX"))]
+    assert len(statements) < 10, statements
+
+
+def test_upgrade_tolerates_a_worker_that_got_there_first(app, monkeypatch):
+    import models
+    from models import SchemaVersion, upgrade_schema
+
+    real_inspect = models.inspect
+    # what this worker saw before another one upgraded the database, each read once
+    stale = {"tables": True, "columns": True}
+
+    def inspect(engine):
+        inspector = real_inspect(engine)
+        get_table_names, get_columns = inspector.get_table_names, inspector.get_columns
+
+        def stale_table_names():
+            names = get_table_names()
+            if stale.pop("tables", False):
+                names = [name for name in names if name != "revenue_daily"]
+            return names
+
+        def stale_columns(table_name):
+            columns = get_columns(table_name)
+            if table_name == "parking_lots" and stale.pop("columns", False):
+                columns = [c for c in columns if c["name"] != "available_count"]
+            return columns
+
+        inspector.get_table_names, inspector.get_columns = stale_table_names, stale_columns
+        return inspector
+
+    monkeypatch.setattr(models, "inspect", inspect)
+    with app.app_context():
+        # the CREATE TABLE and ALTER TABLE fail, the re-checks see the other worker's work
+        assert upgrade_schema() == []
+        assert SchemaVersion.query.count() == 1
@@ -0,0 +1,122 @@
+"""
+Tests for read replica routing, using more SQLite files as the replicas.
+
+The replicas are snapshots of the primary that are then edited directly,
+so a response shows which database served it.
+"""
+import os
+import sqlite3
+
+import pytest
+import sqlalchemy as sa
+
+from app import cache
+from db_routing import read_from_replica
+from models import db, ParkingLot
+
+
+@pytest.fixture(scope="module")
+def replicas(db_dir):
+    return [os.path.join(db_dir, f"replica_{i}.db") for i in range(2)]
+
+
+@pytest.fixture(scope="module")
+def app_env(replicas):
+    return {"DATABASE_REPLICA_URIS": ",".join(f"sqlite:///{path}" for path in replicas)}
+
+
+@pytest.fixture(scope="module")
+def primary(db_dir):
+    return os.path.join(db_dir, "test.db")
+
+
+def on_replica(replicas, sql, params=()):
+    for path in replicas:
+        with sqlite3.connect(path) as conn:
+            conn.execute(sql, params)
+
+
+@pytest.fixture(scope="module")
+def user(new_user):
+    return new_user("replica_user")
+
+
+@pytest.fixture(scope="module")
+def lot_id(app, admin, user, new_lot, primary, replicas):
+    """A lot named "Primary Lot" on the primary and "Replica Lot" on the replicas"""
+    lot_id = new_lot("Primary Lot", 3)
+    # copy the primary over the replicas, like a caught-up replication stream
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    for path in replicas:
+        with sqlite3.connect(primary) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+    on_replica(replicas, "UPDATE parking_lots SET name = 'Replica Lot' WHERE id = ?", (lot_id,))
+    return lot_id
+
+
+def test_get_handlers_read_from_replica(app, client, admin, lot_id):
+    with app.app_context():
+        # also drops the admin's read-your-writes pin from creating the lot
+        cache.clear()
+    assert client.get(f"/api/admin/lots/{lot_id}", headers=admin).get_json()["name"] == "Replica Lot"
+
+
+def test_lot_listing_is_built_from_the_primary(app, client, user, lot_id):
+    # a booking the replica has not seen would otherwise be missing until the listing expires
+    with app.app_context():
+        cache.clear()
+    lots = client.get("/api/user/lots", headers=user).get_json()
+    assert [l["name"] for l in lots if l["id"] == lot_id] == ["Primary Lot"]
+
+
+def test_writes_go_to_primary_and_writer_reads_own_writes(app, client, user, lot_id, replicas):
+    with app.app_context():
+        cache.clear()
+    booked = client.post("/api/user/book", headers=user, json={"lot_id": lot_id})
+    assert booked.status_code == 201
+
+    # the replica has not seen the booking, the sticky user must still see it
+    reservations = client.get("/api/user/my_reservations", headers=user).get_json()["items"]
+    assert [r["id"] for r in reservations] == [booked.get_json()["reservation_id"]]
+    assert reservations[0]["lot_name"] == "Primary Lot"
+
+    for path in replicas:
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT count(*) FROM reservations").fetchone()[0] == 0
+
+
+def test_other_users_are_not_pinned(app, client, admin, user, lot_id, primary):
+    with app.app_context():
+        cache.clear()
+    with sqlite3.connect(primary) as conn:
+        reservation_id = conn.execute("SELECT id FROM reservations WHERE status = 'active'").fetchone()[0]
+    assert client.post("/api/user/leave", headers=user, json={"reservation_id": reservation_id}).status_code == 200
+
+    # only replica_user wrote just now, the admin keeps reading from the replica
+    assert client.get(f"/api/admin/lots/{lot_id}", headers=admin).get_json()["name"] == "Replica Lot"
+
+
+def test_read_from_replica_context(app, lot_id):
+    with app.app_context():
+        assert db.session.get(ParkingLot, lot_id).name == "Primary Lot"
+        db.session.remove()
+        with read_from_replica(db.session):
+            assert ParkingLot.query.filter_by(id=lot_id).one().name == "Replica Lot"
+
+
+def test_a_session_sticks_to_one_replica(app, lot_id, replicas):
+    # replica_1 lags behind replica_0 on this column
+    on_replica(replicas[1:], "UPDATE parking_lots SET address = 'lagging' WHERE id = ?", (lot_id,))
+    query = sa.select(ParkingLot.address).where(ParkingLot.id == lot_id)
+    seen = set()
+    with app.app_context():
+        for _ in range(4):
+            db.session.remove()
+            with read_from_replica(db.session):
+                addresses = {db.session.execute(query).scalar() for _ in range(4)}
+            assert len(addresses) == 1
+            seen |= addresses
+    # sessions still spread over both replicas
+    assert seen == {None, "lagging"}
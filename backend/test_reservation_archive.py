@@ -0,0 +1,91 @@
+"""
+Tests for the reservations hot/cold split and the archival job.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import cache
+from models import db, User, ParkingSpot, Reservation, ReservationArchive, archive_reservations
+
+NOW = datetime.utcnow()
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Archive Lot", 5)
+
+
+@pytest.fixture(scope="module")
+def user(app, new_user, lot_id):
+    """Headers of a user with 15 old reservations 10 days apart, then 5 from the last few days"""
+    headers = new_user("archive_user")
+    with app.app_context():
+        user_id = User.query.filter_by(username="archive_user").one().id
+        spot_id = ParkingSpot.query.filter_by(lot_id=lot_id).first().id
+        for i in range(20):
+            parked = NOW - timedelta(days=200 - i * 10 if i < 15 else 20 - i)
+            db.session.add(Reservation(spot_id=spot_id, user_id=user_id, status="completed", parking_cost=10.0,
+                                       parking_timestamp=parked, leaving_timestamp=parked + timedelta(hours=1),
+                                       created_at=parked))
+        db.session.commit()
+    return headers
+
+
+@pytest.fixture(scope="module")
+def history(app, client, user):
+    def history():
+        with app.app_context():
+            cache.clear()
+        items, cursor = [], None
+        while True:
+            page = client.get("/api/user/my_reservations?limit=4" + (f"&cursor={cursor}" if cursor else ""),
+                              headers=user).get_json()
+            items += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return items
+    return history
+
+
+def test_history_reads_across_both_tables(app, history):
+    before = history()
+    with app.app_context():
+        moved = archive_reservations(NOW - timedelta(days=30), batch_size=4)
+        hot = Reservation.query.count()
+        archived = ReservationArchive.query.count()
+    assert moved == 15 and archived == 15 and hot == 5
+    assert history() == before
+    assert [r["id"] for r in before] == sorted((r["id"] for r in before), reverse=True)
+
+
+def test_summary_counts_archived_rows(app, client, user):
+    with app.app_context():
+        cache.clear()
+    summary = client.get("/api/user/my_reservations", headers=user).get_json()["summary"]
+    assert summary["total_bookings"] == 20 and summary["completed_bookings"] == 20
+    assert summary["total_spent"] == 200.0
+
+
+def test_active_reservations_are_never_archived(app, client, user, lot_id):
+    booked = client.post("/api/user/book", headers=user, json={"lot_id": lot_id}).get_json()
+    with app.app_context():
+        archive_reservations(NOW + timedelta(days=1))
+        assert db.session.get(Reservation, booked["reservation_id"]).status == "active"
+    assert client.post("/api/user/leave", headers=user,
+                       json={"reservation_id": booked["reservation_id"]}).status_code == 200
+
+
+def test_archived_ids_are_not_reused(app, client, user, lot_id):
+    with app.app_context():
+        archive_reservations(NOW + timedelta(days=1))
+        newest = db.session.query(db.func.max(Reservation.id)).scalar()
+        assert db.session.get(Reservation, newest) is not None
+        highest_archived = db.session.query(db.func.max(ReservationArchive.id)).scalar()
+    booked = client.post("/api/user/book", headers=user, json={"lot_id": lot_id}).get_json()
+    assert booked["reservation_id"] > highest_archived
+
+
+def test_cli_command(app):
+    result = app.test_cli_runner().invoke(args=["archive-reservations", "--days", "0"])
+    assert result.exit_code == 0 and "Archived" in result.output
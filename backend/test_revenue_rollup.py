@@ -0,0 +1,119 @@
+"""
+Tests for the revenue_daily rollup behind dashboard_stats.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import cache
+from models import db, User, ParkingSpot, Reservation, RevenueDaily, backfill_revenue_daily, upgrade_schema
+
+
+@pytest.fixture(scope="module")
+def lots(new_lot):
+    """The cheap and the dear lot"""
+    return new_lot("Cheap Lot", 3, price_per_hour=10), new_lot("Dear Lot", 3, price_per_hour=25)
+
+
+@pytest.fixture(scope="module")
+def user(new_user):
+    return new_user("revenue_user")
+
+
+@pytest.fixture(scope="module")
+def park(app, client):
+    def park(headers, lot_id, hours):
+        """Book and leave, backdating the booking so it is charged `hours` hours"""
+        reservation_id = client.post("/api/user/book", headers=headers,
+                                     json={"lot_id": lot_id}).get_json()["reservation_id"]
+        with app.app_context():
+            reservation = db.session.get(Reservation, reservation_id)
+            reservation.parking_timestamp -= timedelta(hours=hours, minutes=-30)
+            db.session.commit()
+        assert client.post("/api/user/leave", headers=headers,
+                           json={"reservation_id": reservation_id}).status_code == 200
+    return park
+
+
+@pytest.fixture(scope="module")
+def rollup(app):
+    def rollup():
+        with app.app_context():
+            return {(r.lot_id, r.day): (round(r.revenue, 2), r.completed_count, round(r.total_minutes))
+                    for r in RevenueDaily.query.all()}
+    return rollup
+
+
+@pytest.fixture(scope="module")
+def stats(app, client, admin):
+    def stats():
+        with app.app_context():
+            cache.clear()
+        return client.get("/api/admin/dashboard/stats", headers=admin).get_json()
+    return stats
+
+
+def test_leave_increments_rollup(user, lots, park, rollup):
+    cheap_lot, dear_lot = lots
+    park(user, cheap_lot, 2)
+    park(user, cheap_lot, 1)
+    park(user, dear_lot, 3)
+    today = datetime.utcnow().date()
+    rows = rollup()
+    assert rows[(cheap_lot, today)][:2] == (30.0, 2)
+    assert rows[(dear_lot, today)][:2] == (75.0, 1)
+
+
+def test_dashboard_reads_rollup(lots, stats):
+    cheap_lot, dear_lot = lots
+    body = stats()
+    assert body["today_revenue"] == body["month_revenue"] == 105.0
+    by_lot = {r["lot_id"]: r["month_revenue"] for r in body["lot_revenue"]}
+    assert by_lot == {cheap_lot: 30.0, dear_lot: 75.0}
+
+
+def test_backfill_matches_incremental_rollup(app, rollup):
+    incremental = rollup()
+    with app.app_context():
+        backfill_revenue_daily()
+    assert rollup() == incremental
+
+
+def test_backfill_picks_up_history(app, lots, rollup):
+    _, dear_lot = lots
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    with app.app_context():
+        spot_id = ParkingSpot.query.filter_by(lot_id=dear_lot).first().id
+        user_id = User.query.filter_by(username="revenue_user").one().id
+        db.session.add(Reservation(spot_id=spot_id, user_id=user_id, status="completed", parking_cost=50.0,
+                                   parking_timestamp=yesterday - timedelta(hours=2), leaving_timestamp=yesterday,
+                                   created_at=yesterday - timedelta(hours=2)))
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=["backfill-revenue"])
+    assert result.exit_code == 0, result.output
+    assert rollup()[(dear_lot, yesterday.date())] == (50.0, 1, 120)
+
+
+def test_backfill_keeps_history_of_removed_lots(app, rollup):
+    last_year = (datetime.utcnow() - timedelta(days=365)).date()
+    with app.app_context():
+        db.session.add(RevenueDaily(lot_id=999999, day=last_year, revenue=12.0, completed_count=1, total_minutes=60))
+        db.session.commit()
+        backfill_revenue_daily()
+    assert rollup()[(999999, last_year)] == (12.0, 1, 60)
+
+
+def test_new_rollup_table_is_backfilled_on_upgrade(app, rollup, stats):
+    rebuilt = {key: row for key, row in rollup().items() if key[0] != 999999}
+    with app.app_context():
+        RevenueDaily.__table__.drop(db.engine)
+        upgrade_schema()
+    assert rollup() == rebuilt
+    assert stats()["today_revenue"] == 105.0
+
+
+def test_double_leave_is_counted_once(client, user, new_lot, rollup, double_leave):
+    lot_id = new_lot("Double Click Lot", 1, price_per_hour=40)
+    booking = client.post("/api/user/book", headers=user, json={"lot_id": lot_id}).get_json()
+    assert double_leave(user, booking["reservation_id"]) == [200, 409]
+    assert rollup()[(lot_id, datetime.utcnow().date())][:2] == (40.0, 1)
@@ -0,0 +1,80 @@
+"""
+Tests for stampede protection (single-flight recompute, stale-while-revalidate).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_caching.backends.simplecache import SimpleCache
+
+from app import cache
+from cache_tags import LOTS, bump
+from single_flight import CACHE_STATUS_HEADER, cached_single_flight
+
+
+def _slow_compute(calls, result, delay=0.3):
+    lock = threading.Lock()
+
+    def compute():
+        with lock:
+            calls.append(1)
+        time.sleep(delay)
+        return result
+    return compute
+
+
+def _concurrently(count, fn):
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(lambda _: fn(), range(count)))
+
+
+def test_cold_miss_is_computed_once():
+    shared, calls = SimpleCache(), []
+    compute = _slow_compute(calls, ["lot"])
+    results = _concurrently(20, lambda: cached_single_flight(shared, "user_lots", (LOTS,), compute, timeout=60))
+    assert len(calls) == 1
+    assert all(value == ["lot"] for value, _ in results)
+    assert sorted(status for _, status in results).count("miss") == 1
+
+
+def test_bump_serves_previous_value_while_recomputing():
+    shared, calls = SimpleCache(), []
+    cached_single_flight(shared, "user_lots", (LOTS,), lambda: ["old"], timeout=60)
+    bump(shared, LOTS)
+    compute = _slow_compute(calls, ["new"])
+    results = _concurrently(10, lambda: cached_single_flight(shared, "user_lots", (LOTS,), compute, timeout=60))
+    assert len(calls) == 1
+    assert sorted(results) == [(["new"], "miss")] + [(["old"], "stale")] * 9
+    assert cached_single_flight(shared, "user_lots", (LOTS,), compute, timeout=60) == (["new"], "hit")
+
+
+def test_abandoned_lock_expires():
+    shared = SimpleCache()
+    shared.add("lock:user_lots", True, timeout=1)
+    started = time.monotonic()
+    value, status = cached_single_flight(shared, "user_lots", (LOTS,), lambda: ["lot"], timeout=60, lock_timeout=1)
+    assert (value, status) == (["lot"], "miss")
+    assert time.monotonic() - started < 2
+
+
+def test_failed_recompute_releases_lock():
+    shared = SimpleCache()
+
+    def broken():
+        raise RuntimeError("db down")
+    try:
+        cached_single_flight(shared, "user_lots", (LOTS,), broken, timeout=60)
+    except RuntimeError:
+        pass
+    assert shared.get("lock:user_lots") is None
+
+
+def test_lot_listing_reports_cache_status(app, client, admin):
+    with app.app_context():
+        cache.clear()
+    first = client.get("/api/user/lots", headers=admin)
+    second = client.get("/api/user/lots", headers=admin)
+    assert first.headers[CACHE_STATUS_HEADER] == "miss"
+    assert second.headers[CACHE_STATUS_HEADER] == "hit"
+    assert first.get_json() == second.get_json()
+
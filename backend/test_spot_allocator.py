@@ -0,0 +1,64 @@
+"""
+Tests for the in-process free spot allocator used by book_spot.
+"""
+from allocator import SpotAllocator
+from models import db, ParkingSpot
+
+
+def test_books_lowest_free_spot_and_reuses_released(client, new_lot, new_user):
+    lot_id = new_lot("Allocator Lot", 3)
+    users = [new_user(f"alloc_user_{i}") for i in range(3)]
+    booked = [client.post("/api/user/book", headers=u, json={"lot_id": lot_id}).get_json() for u in users[:2]]
+    assert [b["spot_number"] for b in booked] == [1, 2]
+
+    client.post("/api/user/leave", headers=users[0], json={"reservation_id": booked[0]["reservation_id"]})
+    third = client.post("/api/user/book", headers=users[2], json={"lot_id": lot_id}).get_json()
+    assert third["spot_number"] == 1
+
+
+def test_full_lot_returns_conflict(client, new_lot, new_user):
+    lot_id = new_lot("Allocator Lot", 1)
+    first, second = new_user("full_user_a"), new_user("full_user_b")
+    assert client.post("/api/user/book", headers=first, json={"lot_id": lot_id}).status_code == 201
+    assert client.post("/api/user/book", headers=second, json={"lot_id": lot_id}).status_code == 409
+
+
+def test_stale_candidate_is_skipped(app, new_lot):
+    lot_id = new_lot("Allocator Lot", 3)
+    allocator = SpotAllocator()
+    with app.app_context():
+        allocator.load(lot_id)
+        # another worker takes spot 1 behind this allocator's back
+        ParkingSpot.query.filter_by(lot_id=lot_id, spot_number=1).update({"status": "O"})
+        db.session.commit()
+
+        spot_number, spot_id = allocator.allocate(lot_id)
+        db.session.commit()
+        assert spot_number == 2
+        assert db.session.get(ParkingSpot, spot_id).status == "O"
+
+
+def test_reload_picks_up_spots_freed_elsewhere(app, new_lot):
+    lot_id = new_lot("Allocator Lot", 1)
+    allocator = SpotAllocator()
+    with app.app_context():
+        assert allocator.allocate(lot_id) is not None
+        db.session.commit()
+        assert allocator.allocate(lot_id) is None
+
+        # freed by another worker, this allocator never saw the release
+        ParkingSpot.query.filter_by(lot_id=lot_id).update({"status": "A"})
+        db.session.commit()
+        assert allocator.allocate(lot_id)[0] == 1
+
+
+def test_release_ignores_duplicates(app, new_lot):
+    lot_id = new_lot("Allocator Lot", 1)
+    allocator = SpotAllocator()
+    with app.app_context():
+        allocator.load(lot_id)
+    candidate = allocator.acquire(lot_id)
+    allocator.release(lot_id, *candidate)
+    allocator.release(lot_id, *candidate)
+    assert allocator.acquire(lot_id) == candidate
+    assert allocator.acquire(lot_id) is None
@@ -0,0 +1,104 @@
+"""
+Tests for the SQLite backed cache shared by all workers on a host.
+"""
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app import create_app
+from sqlite_cache import SQLiteCache
+
+
+@pytest.fixture(scope="module")
+def cache_path(db_dir):
+    return os.path.join(db_dir, "cache.db")
+
+
+@pytest.fixture(scope="module")
+def app_env(cache_path):
+    return {"CACHE_TYPE": "SQLiteCache", "CACHE_SQLITE_PATH": cache_path}
+
+
+@pytest.fixture(scope="module")
+def client_b(app, app_env):
+    """A second app on the same database and cache file, as another gunicorn worker"""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("DATABASE_URI", app.config["SQLALCHEMY_DATABASE_URI"])
+        for key, value in app_env.items():
+            patch.setenv(key, value)
+        worker_b = create_app()
+    return worker_b.test_client()
+
+
+@pytest.fixture(scope="module")
+def lot_id(new_lot):
+    return new_lot("Shared Lot", 5)
+
+
+@pytest.fixture(scope="module")
+def driver(new_user):
+    return new_user("shared_driver")
+
+
+@pytest.fixture(scope="module")
+def available(driver, lot_id):
+    def available(client):
+        response = client.get("/api/user/lots", headers=driver)
+        lot = next(l for l in response.get_json() if l["id"] == lot_id)
+        return lot["available_spots"], response.headers["X-Cache-Status"]
+    return available
+
+
+def _try_add(path, results):
+    results.put(SQLiteCache(path).add("lock:race", os.getpid(), timeout=30))
+
+
+def test_basic_operations_and_expiry(cache_path):
+    store = SQLiteCache(cache_path)
+    store.set("a", {"x": 1}, timeout=60)
+    store.set_many({"b": [1, 2], "c": "three"}, timeout=60)
+    assert store.get("a") == {"x": 1}
+    assert store.get_many("b", "missing", "c") == [[1, 2], None, "three"]
+    store.set("short", 1, timeout=1)
+    time.sleep(1.1)
+    assert store.get("short") is None and not store.has("short")
+    assert store.add("short", 2, timeout=60) and store.get("short") == 2
+    assert not store.add("short", 3)
+    store.delete_many("a", "b")
+    assert store.get_many("a", "b", "c") == [None, None, "three"]
+    assert store.inc("n") == 1 and store.inc("n", 5) == 6 and store.dec("n") == 5
+
+
+def test_fields_are_set_individually(cache_path):
+    store = SQLiteCache(cache_path)
+    store.set_fields("patches", {"occupied:1": 1, "total:1": 2}, timeout=60)
+    store.set_fields("patches", {"occupied:1": 3}, timeout=60)
+    assert store.get_fields("patches") == {"occupied:1": 3, "total:1": 2}
+    assert store.get_fields("other") == {}
+
+
+def test_add_is_atomic_across_processes(cache_path):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_try_add, args=(cache_path, results)) for _ in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert sorted(results.get(timeout=5) for _ in workers) == [False] * 5 + [True]
+
+
+def test_one_worker_builds_the_listing_for_both(client, client_b, available):
+    client.post("/cache/clear")
+    assert available(client) == (5, "miss")
+    assert available(client_b) == (5, "hit")
+
+
+def test_booking_on_one_worker_is_seen_by_the_other(client, client_b, admin, driver, lot_id, available):
+    available(client_b)
+    client.post("/api/user/book", headers=driver, json={"lot_id": lot_id})
+    assert available(client_b)[0] == 4
+    client_b.put(f"/api/admin/lots/{lot_id}", headers=admin, json={"name": "Shared Lot renamed"})
+    names = {l["name"] for l in client.get("/api/user/lots", headers=driver).get_json()}
+    assert "Shared Lot renamed" in names
@@ -0,0 +1,82 @@
+"""
+Tests for the streamed JSON mode of the large admin listings.
+"""
+import json
+
+import pytest
+
+from app import cache
+from cache_tags import LOTS, lot_tag, tagged_key
+from lot_listing import LISTING_KEY
+from pagination import cached_page
+
+
+@pytest.fixture(scope="module")
+def app(app):
+    app.config["STREAM_JSON_THRESHOLD"] = 100
+    app.config["STREAM_JSON_BATCH_SIZE"] = 16
+    return app
+
+
+@pytest.fixture(scope="module")
+def lots(new_lot):
+    """The big and the small lot"""
+    return new_lot("Big Lot", 250), new_lot("Small Lot", 40)
+
+
+@pytest.fixture(scope="module")
+def get(app, client, admin, lots):
+    def get(url):
+        with app.app_context():
+            cache.clear()
+        return client.get(url, headers=admin)
+    return get
+
+
+def streamed(response):
+    # a buffered jsonify() response knows its length up front, a generator does not
+    return "Content-Length" not in response.headers
+
+
+def test_large_spot_grid_is_streamed(get, lots):
+    big_lot, _ = lots
+    response = get(f"/api/admin/lots/{big_lot}/spots?limit=all")
+    assert streamed(response)
+    body = json.loads(response.get_data())
+    assert body["lot"] == {"id": big_lot, "name": "Big Lot"}
+    assert body["next_cursor"] is None
+    assert [s["spot_number"] for s in body["spots"]] == list(range(1, 251))
+
+
+def test_streamed_grid_matches_paged_grid(get, lots):
+    big_lot, _ = lots
+    full = json.loads(get(f"/api/admin/lots/{big_lot}/spots?limit=all").get_data())["spots"]
+    paged, cursor = [], None
+    while True:
+        page = get(f"/api/admin/lots/{big_lot}/spots?limit=100" + (f"&cursor={cursor}" if cursor else "")).get_json()
+        paged += page["spots"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert full == paged
+
+
+def test_small_listing_is_buffered_and_cached(app, get, lots):
+    _, small_lot = lots
+    response = get(f"/api/admin/lots/{small_lot}/spots?limit=all")
+    assert not streamed(response)
+    assert len(response.get_json()["spots"]) == 40
+    with app.app_context():
+        spots_key = tagged_key(cache, f"admin_spots_{small_lot}", lot_tag(small_lot))
+        assert cached_page(cache, spots_key, "all", None)
+
+
+def test_lot_list_streams_above_threshold(app, get, monkeypatch):
+    assert not streamed(get("/api/admin/lots"))
+
+    monkeypatch.setitem(app.config, "STREAM_JSON_THRESHOLD", 1)
+    response = get("/api/admin/lots")
+    assert streamed(response)
+    assert {l["name"] for l in json.loads(response.get_data())} == {"Big Lot", "Small Lot"}
+    with app.app_context():
+        assert cache.get(tagged_key(cache, LISTING_KEY, LOTS)) is None
@@ -0,0 +1,155 @@
+"""
+Tests for the two-tier (per-worker LRU + shared) cache backend.
+
+Two TwoTierCache instances share one SimpleCache as the "Redis" tier and
+an in-process bus stands in for pub/sub, so the invalidation path between
+workers runs without a Redis server.
+"""
+import gc
+import os
+import time
+
+from flask_caching.backends.simplecache import SimpleCache
+from two_tier_cache import LocalLRU, RedisInvalidationBus, TwoTierCache
+
+
+class InProcessBus:
+    """Delivers every published message to every listener synchronously"""
+
+    def __init__(self):
+        self.listeners = []
+        self.enabled = True
+
+    def publish(self, message):
+        if self.enabled:
+            for callback in self.listeners:
+                callback(message)
+
+    def listen(self, callback, on_reconnect):
+        self.listeners.append(callback)
+
+
+class FakeRedis:
+    """Just enough of a Redis client for RedisInvalidationBus, messages go to a list"""
+
+    def __init__(self):
+        self.messages = []
+        self.subscriptions = 0
+
+    def publish(self, channel, message):
+        self.messages.append({"data": message})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePubSub:
+    def __init__(self, client):
+        self.client = client
+
+    def subscribe(self, channel):
+        self.client.subscriptions += 1
+
+    def get_message(self, timeout=None):
+        time.sleep(0.01)
+        return self.client.messages.pop(0) if self.client.messages else None
+
+    def close(self):
+        self.client.subscriptions -= 1
+
+
+def _workers(count=2, **kwargs):
+    shared, bus = SimpleCache(), InProcessBus()
+    return shared, bus, [TwoTierCache(shared, bus=bus, **kwargs) for _ in range(count)]
+
+
+def test_reads_are_served_locally_after_first_fetch():
+    shared, _, (worker, _) = _workers()
+    shared.set("user_lots", [{"id": 1}])
+    assert worker.get("user_lots") == [{"id": 1}]
+    shared.set("user_lots", "changed behind the cache's back")
+    assert worker.get("user_lots") == [{"id": 1}]
+    stats = worker.stats()
+    assert stats["local"]["hits"] == 1 and stats["remote"]["hits"] == 1
+    assert stats["local"]["hit_ratio"] == 0.5
+
+
+def test_writes_invalidate_other_workers():
+    _, _, (writer, reader) = _workers()
+    writer.set("gen:lots", "a", timeout=0)
+    assert reader.get("gen:lots") == "a"
+    writer.set_many({"gen:lots": "b"}, timeout=0)
+    assert reader.get("gen:lots") == "b"
+    writer.delete("gen:lots")
+    assert reader.get("gen:lots") is None
+
+
+def test_clear_reaches_every_worker():
+    _, _, (writer, reader) = _workers()
+    writer.set("admin_lots", [1])
+    reader.get("admin_lots")
+    writer.clear()
+    assert reader.get("admin_lots") is None and len(reader.local) == 0
+
+
+def test_lost_message_is_bounded_by_local_ttl():
+    _, bus, (writer, reader) = _workers(local_ttl=1)
+    writer.set("user_lots", "old")
+    reader.get("user_lots")
+    bus.enabled = False
+    writer.set("user_lots", "new")
+    assert reader.get("user_lots") == "old"
+    time.sleep(1.1)
+    assert reader.get("user_lots") == "new"
+
+
+def test_read_through_does_not_resurrect_invalidated_value():
+    lru = LocalLRU(max_items=10, ttl=30)
+    seen = lru.invalidations
+    # an invalidation lands while the value is being fetched from the shared tier
+    lru.discard("gen:lots")
+    lru.set("gen:lots", "stale", seen=seen)
+    assert lru.get("gen:lots") == (False, None)
+
+
+def test_lru_is_bounded():
+    lru = LocalLRU(max_items=3, ttl=30)
+    for i in range(5):
+        lru.set(f"k{i}", i)
+    lru.get("k2")
+    lru.set("k5", 5)
+    assert len(lru) == 3
+    assert [lru.get(k)[0] for k in ("k2", "k3", "k4", "k5")] == [True, False, True, True]
+
+
+def test_get_many_mixes_tiers():
+    shared, _, (worker, _) = _workers()
+    worker.set("gen:lot:1", "x")
+    shared.set("gen:lot:2", "y")
+    assert worker.get_many("gen:lot:1", "gen:lot:2", "gen:lot:3") == ["x", "y", None]
+    assert worker.stats()["remote"] == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+def test_one_listener_per_process_and_channel():
+    client, shared = FakeRedis(), SimpleCache()
+    # one cache per create_app() in the same process
+    workers = [TwoTierCache(shared, bus=RedisInvalidationBus(client, "invalidate")) for _ in range(3)]
+    assert [worker.get("gen:lots") for worker in workers] == [None] * 3
+    listener = RedisInvalidationBus._listeners[(os.getpid(), "invalidate")]
+    assert len(listener.subscribers) == 3 and client.subscriptions == 1
+
+    workers[1].set("gen:lots", "a")
+    workers[2].get("gen:lots")
+    workers[0].set("gen:lots", "b")
+    deadline = time.monotonic() + 2
+    while workers[2].get("gen:lots") != "b" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert workers[2].get("gen:lots") == "b"
+
+    # dropping the caches stops the thread
+    del workers
+    gc.collect()
+    listener.thread.join(2)
+    assert not listener.thread.is_alive() and client.subscriptions == 0
+    assert (os.getpid(), "invalidate") not in RedisInvalidationBus._listeners
+
@@ -0,0 +1,351 @@
+"""
+Two-tier cache: a per-worker LRU in front of the shared Redis cache.
+
+Enabled with CACHE_LOCAL_TIER=true (Redis deployments only). Reads are
+served from the worker's own bounded LRU when possible, which saves the
+Redis round trip and the unpickle. On a local miss the read falls
+through to Redis and the result is kept locally.
+
+Every set/delete/clear is published on a Redis pub/sub channel, and each
+worker's listener thread drops those keys from its LRU. There is one
+listener thread per process and channel, shared by every TwoTierCache
+on it (each create_app() builds one). It holds them weakly and stops
+once the last of them has been dropped. Local entries
+also expire after CACHE_LOCAL_TTL seconds, which bounds staleness if a
+message is lost. A value read from Redis is only kept locally if no
+invalidation arrived while it was being fetched.
+
+Locally cached values are shared between requests of a worker, so
+callers must treat what get() returns as read-only.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.rediscache import RedisCache
+
+
+class LocalLRU:
+    """Thread-safe LRU bounded by item count, with a per-entry expiry"""
+
+    def __init__(self, max_items, ttl):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # bumped by every write, discard and clear, see set(seen=...)
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns (found, value)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout=None, seen=None):
+        """
+        Store `value`. A read-through passes `seen` and is dropped if anything
+        was invalidated or written since; a plain write counts as a change.
+        """
+        ttl = self.ttl if not timeout or timeout < 0 else min(self.ttl, timeout)
+        with self._lock:
+            if seen is None:
+                self.invalidations += 1
+            elif seen != self.invalidations:
+                return
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys):
+        with self._lock:
+            self.invalidations += 1
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisInvalidationBus:
+    """Broadcasts invalidation messages between workers over Redis pub/sub"""
+
+    # (pid, channel) -> _ChannelListener, guarded by _lock
+    _listeners = {}
+    _lock = threading.Lock()
+
+    def __init__(self, client, channel):
+        self.client = client
+        self.channel = channel
+
+    def publish(self, message):
+        self.client.publish(self.channel, message)
+
+    def listen(self, callback, on_reconnect):
+        """
+        Call `callback(data)` for each message, and `on_reconnect()` whenever
+        messages may have been missed. Both must be bound methods, they are
+        held weakly.
+        """
+        key = (os.getpid(), self.channel)
+        with self._lock:
+            listener = self._listeners.get(key)
+            start = listener is None
+            if start:
+                listener = self._listeners[key] = _ChannelListener(self, key)
+            listener.subscribers.append((weakref.WeakMethod(callback), weakref.WeakMethod(on_reconnect)))
+        if start:
+            listener.start()
+        return listener.thread
+
+
+class _ChannelListener:
+    """The listener thread of one channel in one process, see RedisInvalidationBus.listen"""
+
+    def __init__(self, bus, key):
+        self.bus = bus
+        self.key = key
+        self.subscribers = []
+        self.thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _live(self):
+        """Live (callback, on_reconnect) pairs. With none left the listener unregisters itself"""
+        with RedisInvalidationBus._lock:
+            pairs = [(callback_ref(), reconnect_ref()) for callback_ref, reconnect_ref in self.subscribers]
+            self.subscribers = [refs for refs, pair in zip(self.subscribers, pairs) if None not in pair]
+            live = [pair for pair in pairs if None not in pair]
+            if not live and RedisInvalidationBus._listeners.get(self.key) is self:
+                del RedisInvalidationBus._listeners[self.key]
+            return live
+
+    # the caches are only referenced strongly inside these two calls, so they can be dropped between polls
+
+    def _reconnected(self):
+        subscribers = self._live()
+        for _, on_reconnect in subscribers:
+            on_reconnect()
+        return bool(subscribers)
+
+    def _deliver(self, message):
+        subscribers = self._live()
+        if message is not None:
+            for callback, _ in subscribers:
+                callback(message["data"])
+        return bool(subscribers)
+
+    def _run(self):
+        client, channel = self.bus.client, self.bus.channel
+        while True:
+            pubsub = None
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                # messages may have been missed while disconnected
+                alive = self._reconnected()
+                while alive:
+                    # polled rather than listen(), which would trip the client's socket timeout when idle
+                    alive = self._deliver(pubsub.get_message(timeout=1.0))
+                pubsub.close()
+                return
+            except Exception as e:
+                print(f"✗ Cache invalidation listener error, reconnecting: {e}")
+                if pubsub is not None:
+                    pubsub.close()
+                if not self._live():
+                    return
+                time.sleep(1)
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, remote, bus=None, max_items=1024, local_ttl=30, default_timeout=300):
+        super().__init__(default_timeout=default_timeout)
+        self.remote = remote
+        self.bus = bus
+        self.local = LocalLRU(max_items, local_ttl)
+        self.origin = uuid.uuid4().hex
+        self.counters = {"local_hits": 0, "local_misses": 0, "remote_hits": 0, "remote_misses": 0}
+        self._counter_lock = threading.Lock()
+        self._listener_pid = None
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        remote = RedisCache.factory(app, config, args, kwargs)
+        bus = RedisInvalidationBus(remote._write_client, f"{remote.key_prefix}invalidate")
+        return cls(
+            remote,
+            bus=bus,
+            max_items=config.get("CACHE_LOCAL_MAX_ITEMS", 1024),
+            local_ttl=config.get("CACHE_LOCAL_TTL", 30),
+            default_timeout=config.get("CACHE_DEFAULT_TIMEOUT", 300),
+        )
+
+    # --- invalidation bus ---
+
+    def _ensure_listener(self):
+        # registered lazily, and again in a forked worker: threads do not survive fork
+        if self.bus is None or self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        self.bus.listen(self._on_message, on_reconnect=self.local.clear)
+
+    def _publish(self, keys=None):
+        if self.bus is None:
+            return
+        message = {"origin": self.origin, "keys": list(keys)} if keys is not None else {"origin": self.origin, "clear": True}
+        try:
+            self.bus.publish(json.dumps(message))
+        except Exception as e:
+            # other workers fall back on the local TTL
+            print(f"✗ Failed to publish cache invalidation: {e}")
+
+    def _on_message(self, data):
+        message = json.loads(data)
+        if message.get("origin") == self.origin:
+            return
+        if message.get("clear"):
+            self.local.clear()
+        else:
+            self.local.discard(*message["keys"])
+
+    def _count(self, name, amount=1):
+        with self._counter_lock:
+            self.counters[name] += amount
+
+    # --- reads ---
+
+    def get(self, key):
+        self._ensure_listener()
+        found, value = self.local.get(key)
+        if found:
+            self._count("local_hits")
+            return value
+        self._count("local_misses")
+        seen = self.local.invalidations
+        value = self.remote.get(key)
+        if value is None:
+            self._count("remote_misses")
+            return None
+        self._count("remote_hits")
+        self.local.set(key, value, seen=seen)
+        return value
+
+    def get_many(self, *keys):
+        self._ensure_listener()
+        values, missing = {}, []
+        for key in keys:
+            found, value = self.local.get(key)
+            if found:
+                values[key] = value
+            else:
+                missing.append(key)
+        self._count("local_hits", len(keys) - len(missing))
+        self._count("local_misses", len(missing))
+        if missing:
+            seen = self.local.invalidations
+            for key, value in zip(missing, self.remote.get_many(*missing)):
+                if value is None:
+                    self._count("remote_misses")
+                    continue
+                self._count("remote_hits")
+                self.local.set(key, value, seen=seen)
+                values[key] = value
+        return [values.get(key) for key in keys]
+
+    def has(self, key):
+        found, _ = self.local.get(key)
+        return found or self.remote.has(key)
+
+    # --- writes ---
+
+    def set(self, key, value, timeout=None):
+        self._ensure_listener()
+        result = self.remote.set(key, value, timeout=timeout)
+        self.local.set(key, value, timeout)
+        self._publish([key])
+        return result
+
+    def add(self, key, value, timeout=None):
+        self._ensure_listener()
+        added = self.remote.add(key, value, timeout=timeout)
+        if added:
+            self.local.set(key, value, timeout)
+            self._publish([key])
+        return added
+
+    def set_many(self, mapping, timeout=None):
+        self._ensure_listener()
+        result = self.remote.set_many(mapping, timeout=timeout)
+        for key, value in mapping.items():
+            self.local.set(key, value, timeout)
+        self._publish(mapping.keys())
+        return result
+
+    def delete(self, key):
+        result = self.remote.delete(key)
+        self.local.discard(key)
+        self._publish([key])
+        return result
+
+    def delete_many(self, *keys):
+        result = self.remote.delete_many(*keys)
+        self.local.discard(*keys)
+        self._publish(keys)
+        return result
+
+    def clear(self):
+        result = self.remote.clear()
+        self.local.clear()
+        self._publish()
+        return result
+
+    def inc(self, key, delta=1):
+        value = self.remote.inc(key, delta=delta)
+        self.local.discard(key)
+        self._publish([key])
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, delta=-delta)
+
+    # --- metrics ---
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self.counters)
+        local_lookups = counters["local_hits"] + counters["local_misses"]
+        remote_lookups = counters["remote_hits"] + counters["remote_misses"]
+        return {
+            "local": {
+                "hits": counters["local_hits"],
+                "misses": counters["local_misses"],
+                "hit_ratio": round(counters["local_hits"] / local_lookups, 4) if local_lookups else None,
+                "items": len(self.local),
+                "max_items": self.local.max_items,
+            },
+            "remote": {
+                "hits": counters["remote_hits"],
+                "misses": counters["remote_misses"],
+                "hit_ratio": round(counters["remote_hits"] / remote_lookups, 4) if remote_lookups else None,
+            },
+        }
@@ -46,9 +46,9 @@ export const userAPI = {
   getLots: () => api.get('/user/lots'),
   bookSpot: (lotId) => api.post('/user/book', { lot_id: lotId }),
   leaveSpot: (reservationId) => api.post('/user/leave', { reservation_id: reservationId }),
-  getMyReservations: () => api.get('/user/my_reservations'),
+  getMyReservations: (params) => api.get('/user/my_reservations', { params }),
   triggerExport: () => api.post('/user/export/trigger'),
-  getExportStatus: () => api.get('/user/export/status'),
+  getExportStatus: (params) => api.get('/user/export/status', { params }),
   downloadExport: (jobId) => api.get(`/user/export/download/${jobId}`, { responseType: 'blob' })
 }
 
@@ -60,7 +60,7 @@ export const adminAPI = {
   createLot: (lotData) => api.post('/admin/lots', lotData),
   updateLot: (lotId, lotData) => api.put(`/admin/lots/${lotId}`, lotData),
   deleteLot: (lotId) => api.delete(`/admin/lots/${lotId}`),
-  getLotSpots: (lotId) => api.get(`/admin/lots/${lotId}/spots`)
+  getLotSpots: (lotId, params) => api.get(`/admin/lots/${lotId}/spots`, { params })
 }
 
 // Cache clearing